@@ -1,79 +1,81 @@
-import openai
 import json
+import asyncio
+import sqlite3
 from dotenv import load_dotenv
 import os
 import sys
-from prompts import CAREER_COACH_INSTRUCTIONS, CAREER_COACH_SYSTEM_PROMPT
-from helpers import create_client, create_assistant, create_thread, call_openAI , contains_json_block
-import regex as re
+from assistant_registry import get_assistant_id
+from helpers import get_async_client, acreate_thread, acall_openAI
+from milestone_plan import MilestonePlan
+from schemas import CAREER_COACH_PLAN
+from structured_output import find_json_block, stream_callback
+from telemetry import traced
+from user_store import get_user_store
 # Add the parent directory to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 
 class CareerCoach: 
-    def __init__(self,thread_id):
-        self.OPENAI_CLIENT = create_client()
-        self.assistant_id = create_assistant(
-            name="Career Coach",
-            instructions=CAREER_COACH_SYSTEM_PROMPT,
-            OPENAI_CLIENT=self.OPENAI_CLIENT
-        )
-        self.thread_id = thread_id
+    def __init__(self):
+        self.OPENAI_CLIENT = get_async_client()
+        self.assistant_id = get_assistant_id("career_coach")
 
-    def create_thread(self):
-        thread = create_thread(self.OPENAI_CLIENT)
-        return thread.id
+    async def create_thread(self):
+        return await acreate_thread(self.OPENAI_CLIENT)
     
-    def chat(self,message):
-        response = call_openAI(
+    @traced("agent.chat", agent="career_coach")
+    async def chat(self, session, message, on_token=None, on_milestone=None, coalesce=False):
+        """
+        on_token is awaited with each streamed text delta and on_milestone with each
+        milestone object as soon as it is complete, before the whole reply has arrived.
+        coalesce=True marks a user message that may be merged into a queued run (see
+        acall_openAI).
+        """
+        response = await acall_openAI(
             assistant_id= self.assistant_id, 
             user_input= message,
-            instructions=CAREER_COACH_INSTRUCTIONS, 
             OPENAI_CLIENT= self.OPENAI_CLIENT , 
-            thread_id=self.thread_id
+            thread_id=session.thread_id,
+            on_delta=stream_callback(on_token, on_milestone),
+            coalesce=coalesce
         )
 
-        if contains_json_block (response_string=response):
-            json_match = re.search(r"```json\s*(\{.*\})\s*```", response, re.DOTALL)
-            if not json_match:
-                # Fallback if markdown fence is not used but plain JSON is present
-                # This regex is more general and tries to find any JSON-like object
-                json_match = re.search(r"(\{[\s\S]*?\})", response, re.DOTALL)
-                if not json_match:
-                    # If JSON still isn't found, report an error but acknowledge 'DONE'
-                    return {
-                        "status": "error",
-                        "message": "Milestones done, but JSON data not found in the assistant's output. Please check the assistant's response format.",
-                        "raw_response": response,
-                        "conversation_ended": True
-                    }
-            json_string = json_match.group(1)
-
-            try:
-                milestones = json.loads(json_string)
-            except json.JSONDecodeError as e:
+        # One pass over the response for the fenced ```json milestones block
+        block = find_json_block(response)
+        if block is not None:
+            json_string = block.raw
+            if block.error:
+                return {
+                    "status": "error",
+                    "message": f"Failed to decode JSON from assistant's response: {block.error}. Raw JSON string: {json_string[:200]}...",
+                    "raw_response": response,
+                    "conversation_ended": True
+                }
+            milestones = block.data
+            errors = CAREER_COACH_PLAN.validate(milestones)
+            if errors:
                 return {
                     "status": "error",
-                    "message": f"Failed to decode JSON from assistant's response: {e}. Raw JSON string: {json_string[:200]}...",
+                    "message": f"Milestone plan does not match its schema: {'; '.join(errors)}. Raw JSON string: {json_string[:200]}...",
                     "raw_response": response,
                     "conversation_ended": True
                 }
-            
-            filename = "user_milestones.json"
+
             try:
-                with open(filename, 'w', encoding='utf-8') as f:
-                    json.dump(milestones, f, indent=4, ensure_ascii=False)
-                
+                await asyncio.to_thread(get_user_store().save_milestones, session.user_id, milestones)
+                if isinstance(milestones, dict) and isinstance(milestones.get("milestones"), list):
+                    session.plan = MilestonePlan.from_data(milestones)
+
                 return {
                     "status": "success",
-                    "message": f"Your milestones have been successfully saved to **{filename}**.",
+                    "message": "Your milestones have been successfully saved.",
                     "data": milestones,
                     "conversation_ended": True
                 }
-            except IOError as e:
+            except sqlite3.Error as e:
                 return {
                     "status": "error",
-                    "message": f"Failed to save data to file {filename}: {e}",
+                    "message": f"Failed to save your milestones: {e}",
                     "raw_response": response,
                     "conversation_ended": True
                 }
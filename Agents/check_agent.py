@@ -1,4 +1,3 @@
-import openai
 import json
 from dotenv import load_dotenv
 import os
@@ -8,32 +7,30 @@ import re # Using standard 're' module for regex
 # Add the parent directory to the Python path for imports like 'prompts' and 'helpers'
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from prompts import REFLECTION_CHECK_IN_INSTRUCTIONS, REFLECTION_CHECK_IN_SYSTEM_PROMPT
-from helpers import create_client, create_assistant, call_openAI
+from assistant_registry import get_assistant_id
+from helpers import get_async_client, acall_openAI
+from structured_output import stream_callback
+from telemetry import traced
 
 
 class ReflectionAndCheckInAgent:
-    def __init__(self, thread_id: str):
+    def __init__(self):
         load_dotenv() # Ensure .env is loaded
-        self.OPENAI_CLIENT = create_client()
-        self.assistant_id = create_assistant(
-            name="Reflection & Check-In",
-            instructions=REFLECTION_CHECK_IN_SYSTEM_PROMPT,
-            OPENAI_CLIENT=self.OPENAI_CLIENT
-        )
-        self.thread_id = thread_id # The shared conversational thread ID
+        self.OPENAI_CLIENT = get_async_client()
+        self.assistant_id = get_assistant_id("reflection_check_in_agent")
 
-    def chat(self, user_input: str):
+    @traced("agent.chat", agent="reflection_check_in_agent")
+    async def chat(self, session, user_input: str, on_token=None):
         """
         Processes a message for reflection and check-in.
         The user_input might be a direct user response or a system-triggered prompt.
         """
-        response = call_openAI(
-            thread_id=self.thread_id,
+        response = await acall_openAI(
+            thread_id=session.thread_id,
             assistant_id=self.assistant_id,
             user_input=user_input, # This input will be the basis for the check-in
-            instructions=REFLECTION_CHECK_IN_INSTRUCTIONS,
-            OPENAI_CLIENT=self.OPENAI_CLIENT
+            OPENAI_CLIENT=self.OPENAI_CLIENT,
+            on_delta=stream_callback(on_token)
         )
 
         # The Reflection & Check-In Agent primarily provides conversational output.
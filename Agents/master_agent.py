@@ -1,53 +1,122 @@
-import openai
 import json
+import asyncio
+import dataclasses
 from dotenv import load_dotenv
 import os
 import sys
-import re
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from prompts import MASTER_AI_AGENT_SYSTEM_PROMPT, MASTER_AI_AGENT_INSTRUCTIONS
-from helpers import create_client, create_assistant, call_openAI, get_current_user_state
+from assistant_registry import get_assistant_id
+from helpers import (
+    get_async_client, acall_openAI, acreate_thread, afetch_messages_after, _format_text_messages
+)
+from context_snapshot import ContextSnapshot
+from memory import MEMORY
+from run_scheduler import RUN_SCHEDULER
+from thread_reaper import THREAD_REAPER
+from telemetry import traced, set_attribute
+from user_store import get_user_store
+from intent_router import IntentRouter, log_routing_decision
+from assistant_registry import registry_key
+from response_cache import RESPONSE_CACHE
+from schemas import MASTER_DECISION
 
 # Import all specialist agent classes
-from career_coach_agent import CareerCoach
-from check_agent import ReflectionAndCheckInAgent # Assuming this is ReflectionAndCheckInAgent
-from milestone_generator import MilestoneGeneratorAgent
-from onboarding_agent import OnboardingAgent
-from skill_gap_analyzer_agent import SkillGapAnalyzerAgent
+from Agents.career_coach_agent import CareerCoach
+from Agents.check_agent import ReflectionAndCheckInAgent # Assuming this is ReflectionAndCheckInAgent
+from Agents.milestone_generator import MilestoneGeneratorAgent
+from Agents.onboarding_agent import OnboardingAgent
+from Agents.skill_gap_analyzer_agent import SkillGapAnalyzerAgent
+
+# Specialist classes by the name the Master routes to
+SPECIALISTS = {
+    "onboarding_agent": OnboardingAgent,
+    "career_coach": CareerCoach,
+    "milestone_generator": MilestoneGeneratorAgent,
+    "skill_gap_analyzer": SkillGapAnalyzerAgent,
+    "reflection_check_in_agent": ReflectionAndCheckInAgent,
+    # Add other agents here if any
+}
+
+
+class LazyAgents(dict):
+    """
+    The specialists by name, each constructed the first time the Master routes to it,
+    so a worker only builds (and looks up assistants for) the agents it actually uses.
+    """
+
+    def __init__(self, classes: dict):
+        super().__init__()
+        self._classes = classes
+
+    def __missing__(self, name):
+        agent = self[name] = self._classes[name]()
+        return agent
+
+    def __contains__(self, name):
+        return name in self._classes
+
+    def __iter__(self):
+        return iter(self._classes)
+
+    def __len__(self):
+        return len(self._classes)
+
+    def keys(self):
+        return self._classes.keys()
+
+    def values(self):
+        return [self[name] for name in self._classes]
+
+    def items(self):
+        return [(name, self[name]) for name in self._classes]
+
+    def get(self, name, default=None):
+        return self[name] if name in self._classes else default
+
 
 class MasterAIAgent:
-    def __init__(self, thread_id: str):
+    def __init__(self):
         load_dotenv()
-        self.OPENAI_CLIENT = create_client()
-        self.assistant_id = create_assistant(
-            name="Master AI Agent Orchestrator",
-            instructions=MASTER_AI_AGENT_SYSTEM_PROMPT,
-            OPENAI_CLIENT=self.OPENAI_CLIENT
-        )
-        self.thread_id = thread_id
-
-        # Store agents in a dictionary for easier dynamic calling
-        self.agents = {
-            "onboarding_agent": OnboardingAgent(thread_id=self.thread_id),
-            "career_coach": CareerCoach(thread_id=self.thread_id),
-            "milestone_generator": MilestoneGeneratorAgent(thread_id=self.thread_id),
-            "skill_gap_analyzer": SkillGapAnalyzerAgent(thread_id=self.thread_id),
-            "reflection_check_in_agent": ReflectionAndCheckInAgent(thread_id=self.thread_id),
-            # Add other agents here if any
-        }
-        self.expected_decision_keys = ["action", "agent_to_call", "message_for_agent", "direct_response_message", "transition_phase_to"]
+        self.OPENAI_CLIENT = get_async_client()
+        self.assistant_id = get_assistant_id("master_ai_agent")
+
+        # Store agents in a dictionary for easier dynamic calling; built on first use
+        self.agents = LazyAgents(SPECIALISTS)
+        # Local classifier that answers confident routing decisions without an LLM run
+        self.router = IntentRouter.from_file()
+
+
+    def _context(self, session) -> ContextSnapshot:
+        # Seeded from storage once per session, then kept up to date in memory
+        if session.context is None:
+            session.context = ContextSnapshot.from_store(get_user_store(), session.user_id)
+        return session.context
 
+    def _apply_to_context(self, session, agent_name: str, specialist_response: dict):
+        """Folds a specialist's returned data into the session's context snapshot."""
+        context = self._context(session)
+        context.record_agent(agent_name)
+        data = specialist_response.get("data")
+        if specialist_response.get("status") != "success" or not isinstance(data, dict):
+            return
+        if agent_name == "onboarding_agent":
+            context.update_profile(data)
+        elif "milestones" in data or "milestone" in data:
+            context.update_milestones(data)
 
-    def _get_master_decision(self, user_input: str) -> dict:
+    @traced("master.decision", agent="master_ai_agent")
+    async def _get_master_decision(self, session, user_input: str, use_local_router: bool = True, use_cache: bool = True) -> dict:
         """
-        Internal method to get the routing decision from the Master AI Agent LLM.
+        Internal method to get the routing decision, from the local intent router when it
+        is confident, then from the response cache, and from the Master AI Agent LLM otherwise.
         Returns a dictionary with "status", "decision" (if success), or "message" (if error).
         """
         try:
-            context_str = get_current_user_state(thread_id=self.thread_id)
+            context = self._context(session)
+            context_str = context.phase
         except Exception as e:
             print(f"Master Agent: Error getting current user state: {e}")
             return {
@@ -57,59 +126,160 @@ class MasterAIAgent:
                 "conversation_ended": True
             }
 
+        if use_local_router:
+            local_decision = self.router.route(user_input, user_state=context_str)
+            if local_decision:
+                print(f"Master Agent: Routed locally to {local_decision['agent_to_call']} (confidence {local_decision['confidence']:.2f})")
+                set_attribute("route", "local")
+                return {"status": "success", "decision": local_decision, "agent_type": "master_ai_agent"}
+
+        # The decision's message_for_agent is written from this context, so it keys the cache
+        cache_key = RESPONSE_CACHE.make_key("master_ai_agent", registry_key("master_ai_agent"), f"{context.fingerprint()}\n{user_input}")
+        if use_cache:
+            cached_decision = RESPONSE_CACHE.get(cache_key)
+            if cached_decision is not None:
+                set_attribute("route", "cache")
+                return {"status": "success", "decision": dict(cached_decision), "agent_type": "master_ai_agent"}
+
+        set_attribute("route", "llm")
+        context_text, delivery = context.encode_for_master()
         full_message_for_master = (
             f"User's Latest Message: '{user_input}'\n\n"
-            f"Current System Context:\n{context_str}\n\n"
+            f"Current System Context:\n{context_text}\n\n"
             "Based on the user's message and the current system context, "
             "determine the appropriate action and output the decision as a JSON object "
             "according to the provided schema in MASTER_AI_AGENT_INSTRUCTIONS."
         )
 
-        response_text = call_openAI(
-            thread_id=self.thread_id,
+        response_text = await acall_openAI(
+            thread_id=session.thread_id,
             assistant_id=self.assistant_id,
             user_input=full_message_for_master,
-            instructions=MASTER_AI_AGENT_INSTRUCTIONS,
             OPENAI_CLIENT=self.OPENAI_CLIENT
         )
 
-        json_block_pattern = re.compile(r"```json\s*\n(?P<json_string>\{[\s\S]*?\})\s*\n```", re.DOTALL | re.MULTILINE)
-        json_match = json_block_pattern.search(response_text)
-        
-        raw_json_string = None
-        if json_match:
-            raw_json_string = json_match.group("json_string")
-        else: # Fallback: try to parse the whole response if no markdown block
-            raw_json_string = response_text.strip()
-            if not (raw_json_string.startswith('{') and raw_json_string.endswith('}')): # Basic check if it could be JSON
-                print(f"Master Agent: LLM response is not a JSON block nor a direct JSON object. Response: {response_text}")
-                return {"status": "error", "message": "Master Agent LLM response format error (no JSON).", "agent_type": "master_ai_agent", "conversation_ended": False}
+        # One pass: the whole response is the decision under structured outputs; otherwise a
+        # fenced ```json block or a bare JSON object. Missing nullable fields are filled with None.
+        json_block, errors = MASTER_DECISION.find(response_text, allow_unfenced=True)
+        if json_block is None:
+            print(f"Master Agent: LLM response is not a JSON block nor a direct JSON object. Response: {response_text}")
+            return {"status": "error", "message": "Master Agent LLM response format error (no JSON).", "agent_type": "master_ai_agent", "conversation_ended": False}
+        if errors:
+            print(f"Master Agent: Failed to decode/validate JSON from LLM: {'; '.join(errors)}. JSON string: {json_block.raw[:300]}")
+            return {"status": "error", "message": "Master Agent LLM response processing error.", "agent_type": "master_ai_agent", "conversation_ended": False}
+
+        decision_data = json_block.data
+        context.mark_delivered(delivery)  # only now: a failed turn sends the same changes again
+        log_routing_decision(user_input, context_str, decision_data)
+        if use_cache:
+            RESPONSE_CACHE.set(cache_key, dict(decision_data))
+        return {"status": "success", "decision": decision_data, "agent_type": "master_ai_agent"}
+
 
+    @staticmethod
+    def _stream_kwargs(agent_name: str, on_token=None, on_milestone=None) -> dict:
+        stream_kwargs = {"on_token": on_token} if on_token else {}
+        if on_milestone and agent_name == "milestone_generator":
+            stream_kwargs["on_milestone"] = on_milestone
+        return stream_kwargs
+
+    async def _call_specialist(self, session, agent_name: str, message: str, stream_kwargs: dict) -> dict:
+        """
+        Runs one specialist and folds its data into the context. Returns its agent_type,
+        status, message, output_json and conversation_ended; errors become a message.
+        """
+        print(f"Master Agent: Routing to {agent_name} with message: '{message}'")
         try:
-            decision_data = json.loads(raw_json_string)
-            # Validate core structure
-            if not all(k in decision_data for k in self.expected_decision_keys):
-                # If some expected keys are missing, fill them with None if 'action' is present,
-                # otherwise, it's a malformed essential structure.
-                if "action" in decision_data:
-                    print(f"Master Agent: LLM decision JSON missing some optional fields. Filling with None. Original: {raw_json_string}")
-                    for k in self.expected_decision_keys:
-                        decision_data.setdefault(k, None)
-                else:
-                    raise ValueError("Master Agent JSON from LLM missing 'action' or other core fields.")
-            
-            return {"status": "success", "decision": decision_data, "agent_type": "master_ai_agent"}
-        except (json.JSONDecodeError, ValueError) as e:
-            print(f"Master Agent: Failed to decode/validate JSON from LLM: {e}. JSON string: {raw_json_string[:300]}")
-            return {"status": "error", "message": "Master Agent LLM response processing error.", "agent_type": "master_ai_agent", "conversation_ended": False}
+            specialist_response = await self.agents[agent_name].chat(session, message, **stream_kwargs)
+        except Exception as e:
+            print(f"Master Agent: Exception occurred while calling {agent_name}.chat(): {e}")
+            return {
+                "agent_type": "master_ai_agent", # Error handled at Master level
+                "status": "error",
+                "message": f"I'm sorry, an unexpected error occurred while consulting the {agent_name.replace('_', ' ')}.",
+                "output_json": None,
+                "conversation_ended": False,
+            }
+        self._apply_to_context(session, agent_name, specialist_response)
 
+        final_message = specialist_response.get("message", f"The {agent_name.replace('_', ' ')} processed your request but provided no textual response.")
+        if specialist_response.get("status") == "error":
+            print(f"Master Agent: Specialist agent {agent_name} reported an error: {final_message}")
+        return {
+            "agent_type": specialist_response.get("agent_type", agent_name), # Prefer specialist's self-reported type
+            "status": specialist_response.get("status", "success"),
+            "message": final_message,
+            # Specialists return their parsed JSON as 'data'
+            "output_json": specialist_response.get("output_json", specialist_response.get("data")),
+            "conversation_ended": specialist_response.get("conversation_ended", False),
+        }
 
-    def chat(self, user_input: str) -> dict:
+    async def _fork(self, session):
+        """
+        A session on a new thread seeded with the user's profile, path and plan, for a
+        specialist that runs alongside another one: a thread takes one run at a time.
+        """
+        context = self._context(session)
+        profile = session.data.get("user_onboarding_data") or get_user_store().get_profile(session.user_id)
+        seed = {
+            "user_onboarding_data": profile,
+            "selected_career_path": context.fields["selected_career_path"],
+            "current_milestones": context.fields["current_milestones"],
+        }
+        thread_id = await acreate_thread(self.OPENAI_CLIENT)
+        seed_message = await self.OPENAI_CLIENT.beta.threads.messages.create(
+            thread_id=thread_id, role="user", content=f"Context for the next request: {json.dumps(seed, ensure_ascii=False)}"
+        )
+        return dataclasses.replace(session, thread_id=thread_id, pending=None), seed_message.id
+
+    async def _fan_out(self, session, calls: list, on_token=None, on_milestone=None) -> list:
+        """
+        Runs independent specialist calls concurrently: the first on the session's
+        thread, each other one on a forked thread. Only the first streams tokens. The
+        forks' exchanges are then copied to the session's thread in call order (so the
+        conversation history stays complete) and the forks are deleted.
+        """
+        plan = session.plan
+        forks = await asyncio.gather(*(self._fork(session) for _ in calls[1:]))
+        sessions = [session] + [fork for fork, _ in forks]
+        results = await asyncio.gather(*(
+            self._call_specialist(
+                run_session, name, message,
+                self._stream_kwargs(name, on_token if index == 0 else None, on_milestone),
+            )
+            for index, (run_session, (name, message)) in enumerate(zip(sessions, calls))
+        ))
+
+        for fork, seed_message_id in forks:
+            if fork.plan is not plan:
+                session.plan = fork.plan  # a forked milestone_generator changed the plan
+            try:
+                exchange = _format_text_messages(await afetch_messages_after(fork.thread_id, seed_message_id, self.OPENAI_CLIENT))
+                async with RUN_SCHEDULER.exclusive(session.thread_id):
+                    for message in exchange:
+                        await self.OPENAI_CLIENT.beta.threads.messages.create(
+                            thread_id=session.thread_id, role=message["role"], content=message["content"]
+                        )
+            except Exception as e:
+                print(f"Master Agent: Error copying {fork.thread_id} to the session thread: {e}")
+            THREAD_REAPER.schedule(fork.thread_id, self.OPENAI_CLIENT)
+        return list(results)
+
+    @traced("agent.chat", agent="master_ai_agent")
+    async def chat(self, session, user_input: str, on_token=None, on_milestone=None) -> dict:
         """
         Processes user input, gets a decision from Master LLM, calls a specialist agent if needed,
         and returns a consolidated response for the user/orchestrator.
+        on_token / on_milestone are handed to the specialist so its reply streams to the UI;
+        the Master's own routing JSON is never streamed.
         """
-        master_decision_result = self._get_master_decision(user_input)
+        try:
+            # Keep the shared thread within the user's token budget before any run on it
+            await MEMORY.prepare(session)
+        except Exception as e:
+            print(f"Master Agent: Error compacting conversation memory: {e}")
+
+        master_decision_result = await self._get_master_decision(session, user_input)
 
         if master_decision_result["status"] == "error":
             return master_decision_result # Propagate error (already a dict)
@@ -120,6 +290,8 @@ class MasterAIAgent:
         final_agent_type = decision_data.get("agent_to_call") or "master_ai_agent"
         conversation_ended = False
         output_json_from_specialist = None
+        specialist_results = None
+        specialist_failed = False
         action_taken_by_master = decision_data.get("action")
 
         if action_taken_by_master == "call_agent":
@@ -127,31 +299,38 @@ class MasterAIAgent:
             message_for_specialist = decision_data.get("message_for_agent", user_input) # Fallback to user_input if no specific message
 
             if agent_name_to_call and agent_name_to_call in self.agents:
-                specialist_agent = self.agents[agent_name_to_call]
-                print(f"Master Agent: Routing to {agent_name_to_call} with message: '{message_for_specialist}'")
-                try:
-                    # Assuming specialist_agent.chat() returns a dict as specified
-                    specialist_response = specialist_agent.chat(user_input=message_for_specialist)
-
-                    final_message_to_user = specialist_response.get("message", f"The {agent_name_to_call.replace('_', ' ')} processed your request but provided no textual response.")
-                    output_json_from_specialist = specialist_response.get("output_json")
-                    conversation_ended = specialist_response.get("conversation_ended", False)
-                    final_agent_type = specialist_response.get("agent_type", agent_name_to_call) # Prefer specialist's self-reported type
-
-                    if specialist_response.get("status") == "error":
-                        print(f"Master Agent: Specialist agent {agent_name_to_call} reported an error: {final_message_to_user}")
-                        # final_message_to_user might already be an error message.
-                        # Could prepend: "There was an issue with the {agent_name_to_call.replace('_', ' ')}: "
-                except Exception as e:
-                    print(f"Master Agent: Exception occurred while calling {agent_name_to_call}.chat(): {e}")
-                    final_message_to_user = f"I'm sorry, an unexpected error occurred while consulting the {agent_name_to_call.replace('_', ' ')}."
-                    final_agent_type = "master_ai_agent" # Error handled at Master level
-                    conversation_ended = False # Or True if it's a critical failure
+                result = await self._call_specialist(
+                    session, agent_name_to_call, message_for_specialist, self._stream_kwargs(agent_name_to_call, on_token, on_milestone)
+                )
+                final_message_to_user = result["message"]
+                output_json_from_specialist = result["output_json"]
+                conversation_ended = result["conversation_ended"]
+                final_agent_type = result["agent_type"]
+                specialist_failed = result["status"] == "error"
             else:
                 print(f"Master Agent: Decision to call unknown or unspecified agent: '{agent_name_to_call}'")
                 final_message_to_user = "I'm not sure how to handle that request due to an internal routing issue. Please try rephrasing."
                 final_agent_type = "master_ai_agent"
 
+        elif action_taken_by_master == "call_agents":
+            calls = [
+                (call.get("agent_to_call"), call.get("message_for_agent") or user_input)
+                for call in decision_data.get("agent_calls") or [] if isinstance(call, dict)
+            ]
+            unknown = [name for name, _ in calls if name not in self.agents]
+            if calls and not unknown:
+                specialist_results = await self._fan_out(session, calls, on_token, on_milestone)
+                final_message_to_user = "\n\n".join(result["message"] for result in specialist_results)
+                # Keyed by agent, so one turn can return e.g. a milestone plan and a skill gap analysis
+                output_json_from_specialist = {name: result["output_json"] for (name, _), result in zip(calls, specialist_results)}
+                conversation_ended = any(result["conversation_ended"] for result in specialist_results)
+                final_agent_type = specialist_results[0]["agent_type"]
+                specialist_failed = any(result["status"] == "error" for result in specialist_results)
+            else:
+                print(f"Master Agent: Decision to call unknown or unspecified agents: {unknown or calls}")
+                final_message_to_user = "I'm not sure how to handle that request due to an internal routing issue. Please try rephrasing."
+                final_agent_type = "master_ai_agent"
+
         elif action_taken_by_master == "respond_directly":
             final_message_to_user = decision_data.get("direct_response_message", "I'm ready to help, but I don't have a specific response for that.")
             final_agent_type = "master_ai_agent"
@@ -165,11 +344,14 @@ class MasterAIAgent:
 
         # Prepare the final structured response
         response_payload = {
-            "status": "success", # Assuming the Master Agent's orchestration part succeeded
+            # The orchestration succeeded; a failed specialist still fails the turn
+            "status": "error" if specialist_failed else "success",
             "agent_type": final_agent_type,
             "message": final_message_to_user,
             "output_json": output_json_from_specialist, # This could be a string or a dict
             "conversation_ended": conversation_ended,
             "master_decision_details": decision_data # For logging or external state updates (e.g., transition_phase_to)
         }
+        if specialist_results is not None:
+            response_payload["results"] = specialist_results # One entry per agent of a call_agents decision
         return response_payload
\ No newline at end of file
@@ -1,63 +1,140 @@
-import openai
 import json
+import asyncio
+import sqlite3
 from dotenv import load_dotenv
 import os
 import sys
-import re # Using standard 're' module for regex
 
 # Add the parent directory to the Python path for imports like 'prompts' and 'helpers'
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from prompts import MILESTONE_GENERATOR_INSTRUCTIONS, MILESTONE_GENERATOR_SYSTEM_PROMPT
-from helpers import create_client, create_assistant, call_openAI, contains_json_block
+from assistant_registry import get_assistant_id, registry_key
+from helpers import get_async_client, acall_openAI, aappend_exchange
+from milestone_plan import MilestonePlan
+from path_catalogue import PATH_SHORTLIST_ENABLED, shortlist_note
+from response_cache import RESPONSE_CACHE, PROFILE_CACHE
+from schemas import milestone_schema
+from structured_output import find_json_block, stream_callback
+from telemetry import traced
+from user_store import get_user_store
 
 
 class MilestoneGeneratorAgent:
-    def __init__(self, thread_id: str):
+    def __init__(self):
         load_dotenv() # Ensure .env is loaded
-        self.OPENAI_CLIENT = create_client()
-        self.assistant_id = create_assistant(
-            name="Milestone Generator",
-            instructions=MILESTONE_GENERATOR_SYSTEM_PROMPT,
-            OPENAI_CLIENT=self.OPENAI_CLIENT
-        )
-        self.thread_id = thread_id # The shared conversational thread ID
-
-    def chat(self, user_input: str):
-        response = call_openAI(
-            thread_id=self.thread_id,
-            assistant_id=self.assistant_id,
-            user_input=user_input,
-            instructions=MILESTONE_GENERATOR_INSTRUCTIONS, # Use specific instructions for the run
-            OPENAI_CLIENT=self.OPENAI_CLIENT
-        )
-
-        json_block_pattern = re.compile(
-            r"```json\s*\n"                    
-            r"(?P<json_string>\{[\s\S]*?\})\s*\n" 
-            r"```",                             
-            re.DOTALL | re.MULTILINE
-        )
-        json_match = json_block_pattern.search(response)
-
-        if json_match:
-            json_string = json_match.group("json_string")
-            try:
-                milestone_data = json.loads(json_string)
+        self.OPENAI_CLIENT = get_async_client()
+        self.assistant_id = get_assistant_id("milestone_generator")
+
+    @staticmethod
+    def _plan(session):
+        if session.plan is None:
+            session.plan = get_user_store().get_milestone_plan(session.user_id)
+        return session.plan
+
+    async def _save(self, session, milestone_data: dict):
+        """
+        Keeps the session's plan and the user store in step with the output: an initial
+        plan is stored whole, a regenerated milestone is applied in place and logged
+        as a single edit.
+        """
+        store = get_user_store()
+        try:
+            if milestone_data.get("type") == "initial_generation":
+                session.plan = MilestonePlan.from_data(milestone_data)
+                await asyncio.to_thread(store.save_milestones, session.user_id, milestone_data)
+            elif self._plan(session) is not None and session.plan.apply(milestone_data):
+                session.plan.version = await asyncio.to_thread(
+                    store.append_milestone_edit, session.user_id, milestone_data
+                )
+        except sqlite3.Error as e:
+            print(f"Milestone Generator: Failed to save milestones: {e}")
+
+    @traced("agent.chat", agent="milestone_generator")
+    async def chat(self, session, user_input: str, use_cache: bool = True, on_token=None, on_milestone=None):
+        """
+        Generates paths or milestones. Replies are cached per prompt version, keyed by
+        the user's profile plus the message; initial plans can also be reused for
+        near-identical profiles. Pass use_cache=False to force a fresh run.
+
+        on_token / on_milestone receive streamed text deltas and each completed
+        milestone object while the reply is generated (all at once on a cache hit).
+
+        A message asking to regenerate a milestone of the user's plan by its id (e.g.
+        "regenerate M3", see MilestonePlan.find_target) is sent with that milestone and
+        its neighbours rather than the whole plan, and the regenerated milestone
+        replaces it in place; any other message is sent unchanged. Until the user has a
+        plan, messages carry the shortlist of catalogue paths closest to their profile
+        (Scenario 1).
+        """
+        plan = self._plan(session)
+        target = plan.find_target(user_input) if plan else None
+        profile = session.data.get("user_onboarding_data")
+        if target:
+            user_input = plan.regeneration_request(target, user_input)
+        elif plan is None and profile and PATH_SHORTLIST_ENABLED:
+            user_input = f"{user_input}\n\n{await asyncio.to_thread(shortlist_note, profile)}"
+
+        version = registry_key("milestone_generator")
+        cache_input = f"{json.dumps(profile, sort_keys=True)}\n{user_input}" if profile else user_input
+        cache_key = RESPONSE_CACHE.make_key("milestone_generator", version, cache_input)
+
+        response = None
+        if use_cache:
+            response = RESPONSE_CACHE.get(cache_key)
+            if response is None and profile:
+                response = PROFILE_CACHE.get(version, cache_input)
+        from_cache = response is not None
+        on_delta = stream_callback(on_token, on_milestone)
+        if from_cache:
+            await aappend_exchange(session.thread_id, user_input, response, self.OPENAI_CLIENT)
+            if on_delta is not None:
+                await on_delta(response)
+        else:
+            response = await acall_openAI(
+                thread_id=session.thread_id,
+                assistant_id=self.assistant_id,
+                user_input=user_input,
+                OPENAI_CLIENT=self.OPENAI_CLIENT,
+                on_delta=on_delta
+            )
+
+        json_block = find_json_block(response)
+
+        if json_block:
+            json_string = json_block.raw
+            # A full plan or a single milestone, validated (and repaired) in one pass
+            schema = milestone_schema(json_block.data)
+            errors = schema.validate(json_block.data) if json_block.error is None else []
+            if json_block.error is None and errors:
+                return {
+                    "status": "error",
+                    "message": f"Milestone Generator: Output does not match the {schema.name} schema: {'; '.join(errors)}. Raw JSON part: {json_string[:200]}...",
+                    "raw_response": response,
+                    "conversation_ended": False
+                }
+            if json_block.error is None:
+                milestone_data = json_block.data
                 
                 # Determine status based on the type of output
                 status_message = "Milestones generated successfully!" if milestone_data.get("type") == "initial_generation" else "Milestone regenerated successfully!"
 
+                await self._save(session, milestone_data)
+
+                if use_cache and not from_cache:
+                    RESPONSE_CACHE.set(cache_key, response)
+                    if profile and milestone_data.get("type") == "initial_generation":
+                        PROFILE_CACHE.set(version, cache_input, response)
+
                 return {
                     "status": "success",
                     "message": status_message,
                     "data": milestone_data, # Contains either full milestones or regenerated single milestone
                     "conversation_ended": False # The agent's task is done, but the overall conversation continues
                 }
-            except json.JSONDecodeError as e:
+            else:
                 return {
                     "status": "error",
-                    "message": f"Milestone Generator: Failed to decode JSON output: {e}. Raw JSON part: {json_string[:200]}...",
+                    "message": f"Milestone Generator: Failed to decode JSON output: {json_block.error}. Raw JSON part: {json_string[:200]}...",
                     "raw_response": response,
                     "conversation_ended": False
                 }
@@ -1,80 +1,115 @@
-import openai
 import json
+import asyncio
+import sqlite3
 from dotenv import load_dotenv
 import os
 import sys
-from prompts import ONBOARDING_AGENT_SYSTEM_PROMPT,ONBOARDING_AGENT_INSTRUCTIONS
-from helpers import create_client, create_assistant, create_thread, call_openAI
-import regex as re
+from assistant_registry import get_assistant_id, registry_key
+from helpers import get_async_client, acreate_thread, acall_openAI, aappend_exchange
+from schemas import ONBOARDING_PROFILE
+from structured_output import stream_callback
+from telemetry import traced
+from user_store import get_user_store
 # Add the parent directory to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+OPENING_MESSAGE = "Hello, I'm ready to start my career onboarding."
+
+# Opening greeting per onboarding prompt version, so new sessions can show it instantly
+GREETING_CACHE_FILE = os.getenv("GREETING_CACHE_FILE", ".greeting_cache.json")
+
+
 class OnboardingAgent:
-    def __init__(self,thread_id):
-        self.OPENAI_CLIENT = create_client()
-        self.assistant_id =  create_assistant(
-            name="Onboarding Agent",
-            instructions= ONBOARDING_AGENT_SYSTEM_PROMPT,
-            OPENAI_CLIENT=self.OPENAI_CLIENT
-        )
-        self.thread_id = thread_id
-        self.responses ={}
+    def __init__(self):
+        self.OPENAI_CLIENT = get_async_client()
+        self.assistant_id = get_assistant_id("onboarding_agent")
 
-    def create_thread(self):
-        thread = create_thread(self.OPENAI_CLIENT)
-        return thread.id
+    async def create_thread(self):
+        return await acreate_thread(self.OPENAI_CLIENT)
 
-    def chat(self,message): 
-        response = call_openAI(
-            thread_id=self.thread_id,
+    @traced("agent.start", agent="onboarding_agent")
+    async def start(self, session, on_token=None):
+        """
+        Opens the onboarding conversation. If a greeting is cached for the current
+        prompt version it is returned immediately and written to the thread in the
+        background (see Session.wait_ready); otherwise a real run produces it and the
+        result is cached for the next session.
+        """
+        version = registry_key("onboarding_agent")
+        greetings = _load_greetings()
+        greeting = greetings.get(version)
+
+        if greeting is None:
+            result = await self.chat(session, OPENING_MESSAGE, on_token=on_token)
+            if result["status"] == "continue":
+                greetings[version] = result["message"]
+                _save_greetings(greetings)
+            return result
+
+        # Leave the thread exactly as a real opening run would have
+        session.pending = asyncio.create_task(
+            aappend_exchange(session.thread_id, OPENING_MESSAGE, greeting, self.OPENAI_CLIENT)
+        )
+        return {
+            "status": "continue",
+            "message": greeting,
+            "conversation_ended": False
+        }
+
+    @traced("agent.chat", agent="onboarding_agent")
+    async def chat(self, session, message, on_token=None, coalesce=False):
+        """coalesce=True marks a user message that may be merged into a queued run (see acall_openAI)."""
+        response = await acall_openAI(
+            thread_id=session.thread_id,
             assistant_id=self.assistant_id, 
             user_input=message, 
-            instructions= ONBOARDING_AGENT_INSTRUCTIONS,
-            OPENAI_CLIENT= self.OPENAI_CLIENT
+            OPENAI_CLIENT= self.OPENAI_CLIENT,
+            on_delta=stream_callback(on_token),
+            coalesce=coalesce
         )
-        filename="user_onboarding_data.json"
         if "DONE" in response:
-            # Check for JSON block using regex
-            json_match = re.search(r"```json\s*(\{.*\})\s*```", response, re.DOTALL)
-            if not json_match:
-                # Fallback if markdown fence is not used but plain JSON is present
-                # This regex is more general and tries to find any JSON-like object
-                json_match = re.search(r"(\{[\s\S]*?\})", response, re.DOTALL)
-                if not json_match:
-                    # If JSON still isn't found, report an error but acknowledge 'DONE'
-                    return {
-                        "status": "error",
-                        "message": "Onboarding done, but JSON data not found in the assistant's output. Please check the assistant's response format.",
-                        "raw_response": response,
-                        "conversation_ended": True
-                    }
-
-            json_string = json_match.group(1)
+            # One pass over the response: fenced ```json block first, bare JSON object as a
+            # fallback, validated against the profile schema before anything is saved
+            block, errors = ONBOARDING_PROFILE.find(response, allow_unfenced=True)
+            if block is None:
+                # If JSON isn't found, report an error but acknowledge 'DONE'
+                return {
+                    "status": "error",
+                    "message": "Onboarding done, but JSON data not found in the assistant's output. Please check the assistant's response format.",
+                    "raw_response": response,
+                    "conversation_ended": True
+                }
 
-            try:
-                user_onboarding_data = json.loads(json_string)
-            except json.JSONDecodeError as e:
+            json_string = block.raw
+            if block.error:
                 return {
                     "status": "error",
-                    "message": f"Failed to decode JSON from assistant's response: {e}. Raw JSON string: {json_string[:200]}...",
+                    "message": f"Failed to decode JSON from assistant's response: {block.error}. Raw JSON string: {json_string[:200]}...",
                     "raw_response": response,
                     "conversation_ended": True
                 }
+            if errors:
+                return {
+                    "status": "error",
+                    "message": f"Onboarding profile does not match its schema: {'; '.join(errors)}. Raw JSON string: {json_string[:200]}...",
+                    "raw_response": response,
+                    "conversation_ended": True
+                }
+            user_onboarding_data = block.data
 
             try:
-                with open(filename, 'w', encoding='utf-8') as f:
-                    json.dump(user_onboarding_data, f, indent=4, ensure_ascii=False)
-                
+                await asyncio.to_thread(get_user_store().save_profile, session.user_id, user_onboarding_data)
+
                 return {
                     "status": "success",
-                    "message": f"Your onboarding data has been successfully saved to **{filename}**. Your onboarding is complete!",
+                    "message": "Your onboarding data has been successfully saved. Your onboarding is complete!",
                     "data": user_onboarding_data,
                     "conversation_ended": True
                 }
-            except IOError as e:
+            except sqlite3.Error as e:
                 return {
                     "status": "error",
-                    "message": f"Failed to save data to file {filename}: {e}",
+                    "message": f"Failed to save your onboarding data: {e}",
                     "raw_response": response,
                     "conversation_ended": True
                 }
@@ -84,4 +119,25 @@ class OnboardingAgent:
                 "status": "continue",
                 "message": response, # This is the assistant's next question/statement
                 "conversation_ended": False
-            }
\ No newline at end of file
+            }
+
+
+_greetings = None  # in-memory copy of GREETING_CACHE_FILE
+
+
+def _load_greetings() -> dict:
+    global _greetings
+    if _greetings is None:
+        _greetings = {}
+        if os.path.exists(GREETING_CACHE_FILE):
+            with open(GREETING_CACHE_FILE, "r", encoding="utf-8") as f:
+                _greetings = json.load(f)
+    return _greetings
+
+
+@traced("file.greeting_cache")
+def _save_greetings(greetings: dict):
+    tmp_path = f"{GREETING_CACHE_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(greetings, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, GREETING_CACHE_FILE)
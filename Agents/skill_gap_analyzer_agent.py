@@ -1,67 +1,125 @@
-import openai
 import json
 from dotenv import load_dotenv
 import os
 import sys
-import re # Using standard 're' module for regex
 
 # Add the parent directory to the Python path for imports like 'prompts' and 'helpers'
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from prompts import SKILL_GAP_ANALYZER_INSTRUCTIONS, SKILL_GAP_ANALYZER_SYSTEM_PROMPT
-from helpers import create_client, create_assistant, call_openAI, contains_json_block
+from assistant_registry import get_assistant_id
+from helpers import get_async_client, acall_openAI
+from prompts import SKILL_GAP_ENRICH_INSTRUCTIONS, SKILL_GAP_ENRICH_REQUEST
+from schemas import SKILL_GAP_ANALYSIS, SKILL_GAP_ENRICHMENT
+from skill_taxonomy import get_skill_taxonomy
+from structured_output import stream_callback
+from telemetry import traced
+
+# Compute the gaps from the skill taxonomy when the career path is in it, and only ask
+# the model to write about them (false: the model works out the whole analysis)
+SKILL_GAP_PRECOMPUTE = os.getenv("SKILL_GAP_PRECOMPUTE", "true").lower() == "true"
 
 
 class SkillGapAnalyzerAgent:
-    def __init__(self, thread_id: str):
+    def __init__(self):
         load_dotenv() # Ensure .env is loaded
-        self.OPENAI_CLIENT = create_client()
-        self.assistant_id = create_assistant(
-            name="Skill Gap Analyzer",
-            instructions=SKILL_GAP_ANALYZER_SYSTEM_PROMPT,
-            OPENAI_CLIENT=self.OPENAI_CLIENT
-        )
-        self.thread_id = thread_id # The shared conversational thread ID
+        self.OPENAI_CLIENT = get_async_client()
+        self.assistant_id = get_assistant_id("skill_gap_analyzer")
+
+    @staticmethod
+    @traced("skill_gap.precompute", agent="skill_gap_analyzer")
+    def precompute(session, user_input: str):
+        """
+        The analysis worked out from the skill taxonomy, without descriptions or
+        resources, or None when the career path (named in the message, else the one
+        the user selected, else the one their plan is for) isn't in the taxonomy.
+        The skills held are the profile's current_skills, less any it also lists under
+        skills_to_improve; the message only picks the path, since the skills it names
+        may be ones the user lacks or asks about.
+        """
+        taxonomy = get_skill_taxonomy()
+        paths, _ = taxonomy.scan(user_input)
+        path = paths[0] if paths else None
+        if path is None and session.context is not None:
+            path = taxonomy.find_path(session.context.fields["selected_career_path"])
+        if path is None and session.plan is not None:
+            path = taxonomy.find_path(session.plan.header.get("career_path"))
+        if path is None:
+            return None
+        profile = session.data.get("user_onboarding_data") or {}
+        _, held = taxonomy.scan(str(profile.get("current_skills", "")))
+        _, wanted = taxonomy.scan(str(profile.get("skills_to_improve", "")))
+        return taxonomy.gap(path, [i for i in held if i not in wanted])
 
-    def chat(self, user_input: str):
+    @traced("agent.chat", agent="skill_gap_analyzer")
+    async def chat(self, session, user_input: str, on_token=None, enrich: bool = True):
         """
         Processes a user message related to skill gap analysis.
         The user_input should typically contain the user's current skills
         and the target career path requirements.
+
+        For a career path in the skill taxonomy the gaps are computed locally and the
+        model only writes their descriptions and resources, from a much shorter prompt;
+        with enrich=False the computed analysis is returned without a run.
         """
-        response = call_openAI(
-            thread_id=self.thread_id,
-            assistant_id=self.assistant_id,
-            user_input=user_input, # This input should convey relevant context for analysis
-            instructions=SKILL_GAP_ANALYZER_INSTRUCTIONS,
-            OPENAI_CLIENT=self.OPENAI_CLIENT
-        )
+        analysis = self.precompute(session, user_input) if SKILL_GAP_PRECOMPUTE else None
+        if analysis is not None and not enrich:
+            return {
+                "status": "success",
+                "message": "Skill gap analysis computed from the skill taxonomy.",
+                "data": analysis,
+                "conversation_ended": False
+            }
 
-        # Attempt to extract the structured JSON output
-        # It expects a heading "### Skill Gap Analysis" followed by ```json ... ```
-        json_block_pattern = re.compile(
-            r"###\s*Skill Gap Analysis\s*\n"   # Specific heading
-            r"```json\s*\n"                     # Match ```json and newline
-            r"(?P<json_string>\{[\s\S]*?\})\s*\n" # Capture JSON string (non-greedy)
-            r"```",                             # Match closing ```
-            re.DOTALL | re.MULTILINE
-        )
-        json_match = json_block_pattern.search(response)
+        if analysis is None:
+            response = await acall_openAI(
+                thread_id=session.thread_id,
+                assistant_id=self.assistant_id,
+                user_input=user_input, # This input should convey relevant context for analysis
+                OPENAI_CLIENT=self.OPENAI_CLIENT,
+                on_delta=stream_callback(on_token)
+            )
+            # Attempt to extract the structured JSON output
+            # It expects a heading "### Skill Gap Analysis" followed by ```json ... ```
+            json_block, errors = SKILL_GAP_ANALYSIS.find(response, heading="Skill Gap Analysis")
+        else:
+            computed = {
+                "career_path_selected": analysis["career_path_selected"],
+                "user_current_skills": analysis["user_current_skills"],
+                "missing_skills": [gap["skill_name"] for gap in analysis["skill_gaps_identified"]],
+            }
+            response = await acall_openAI(
+                thread_id=session.thread_id,
+                assistant_id=self.assistant_id,
+                user_input=SKILL_GAP_ENRICH_REQUEST.format(message=user_input, analysis=json.dumps(computed, ensure_ascii=False)),
+                instructions=SKILL_GAP_ENRICH_INSTRUCTIONS,
+                OPENAI_CLIENT=self.OPENAI_CLIENT,
+                on_delta=stream_callback(on_token)
+            )
+            json_block, errors = SKILL_GAP_ENRICHMENT.find(response, heading="Skill Gap Analysis")
 
-        if json_match:
-            json_string = json_match.group("json_string")
-            try:
-                skill_gap_analysis_data = json.loads(json_string)
+        if json_block:
+            json_string = json_block.raw
+            if json_block.error is None and errors:
+                return {
+                    "status": "error",
+                    "message": f"Skill Gap Analyzer: Output does not match its schema: {'; '.join(errors)}. Raw JSON part: {json_string[:200]}...",
+                    "raw_response": response,
+                    "conversation_ended": False
+                }
+            if json_block.error is None:
+                skill_gap_analysis_data = json_block.data
+                if analysis is not None:
+                    skill_gap_analysis_data = get_skill_taxonomy().enrich(analysis, json_block.data)
                 return {
                     "status": "success",
                     "message": "Skill gap analysis complete and data extracted.",
                     "data": skill_gap_analysis_data,
                     "conversation_ended": False # Analysis might lead to further discussion
                 }
-            except json.JSONDecodeError as e:
+            else:
                 return {
                     "status": "error",
-                    "message": f"Skill Gap Analyzer: Failed to decode JSON output: {e}. Raw JSON part: {json_string[:200]}...",
+                    "message": f"Skill Gap Analyzer: Failed to decode JSON output: {json_block.error}. Raw JSON part: {json_string[:200]}...",
                     "raw_response": response,
                     "conversation_ended": False
                 }
@@ -0,0 +1,265 @@
+import os
+import re
+import time
+import heapq
+import asyncio
+import itertools
+import contextvars
+from collections import deque
+
+# Gate runs on the account's rate limits; when off, or before any limit is known, runs go straight out
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# Account limits when known up front (0 = learn them from the x-ratelimit-* response headers)
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "0"))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "0"))
+# Share of each limit this worker dispatches, leaving room for retries and other workers
+ADMISSION_HEADROOM = float(os.getenv("ADMISSION_HEADROOM", "0.9"))
+# Tokens assumed for a run's thread context and reply on top of its new message; corrected
+# from the run's usage once it completes
+ADMISSION_RUN_TOKENS = int(os.getenv("ADMISSION_RUN_TOKENS", "1500"))
+# API requests one run makes: message create, run create, reply fetch
+ADMISSION_RUN_REQUESTS = 3
+# Seconds admissions pause after a 429 that names no retry time
+ADMISSION_DEFAULT_BACKOFF = 1.0
+
+# Share of dispatch capacity per class while all of them are waiting
+ADMISSION_WEIGHTS = {
+    "premium": int(os.getenv("ADMISSION_WEIGHT_PREMIUM", "4")),
+    "free": int(os.getenv("ADMISSION_WEIGHT_FREE", "2")),
+    "background": int(os.getenv("ADMISSION_WEIGHT_BACKGROUND", "1")),
+}
+# Recent queue waits kept per class for percentiles
+ADMISSION_WAIT_SAMPLES = 2048
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+# Class of the runs started from the current task: the session's tier for user turns
+_priority = contextvars.ContextVar("admission_priority", default="background")
+
+
+class RateLimited(Exception):
+    """A run the API refused or failed for exceeding the account's rate limits."""
+
+
+def set_priority(priority: str):
+    """Dispatch class ('premium', 'free' or 'background') of runs started from this task."""
+    _priority.set(priority if priority in ADMISSION_WEIGHTS else "free")
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+def parse_duration(value) -> float:
+    """Seconds in a rate-limit reset header: '1s', '6m0s', '250ms', or plain seconds."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts) if parts else None
+
+
+class TokenBucket:
+    """Capacity refilled at capacity per minute. The level may go negative when usage is corrected."""
+
+    def __init__(self, per_minute: float, clock=time.monotonic):
+        self.clock = clock
+        self.capacity = per_minute
+        self.level = per_minute
+        self._updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until `amount` (at most the capacity) is available."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return missing * 60 / self.capacity if missing > 0 else 0.0
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+    def adapt(self, limit: float, remaining: float):
+        """Follows the API's view of the limit and of what is left of it."""
+        self._refill()
+        self.capacity = limit * ADMISSION_HEADROOM
+        self.level = min(self.level, remaining - limit * (1 - ADMISSION_HEADROOM))
+
+
+class _Waiter:
+    __slots__ = ("start", "seq", "priority", "requests", "tokens", "future", "queued_at")
+
+    def __init__(self, start, seq, priority, requests, tokens, future, queued_at):
+        self.start = start
+        self.seq = seq
+        self.priority = priority
+        self.requests = requests
+        self.tokens = tokens
+        self.future = future
+        self.queued_at = queued_at
+
+    def __lt__(self, other):
+        return (self.start, self.seq) < (other.start, other.seq)
+
+
+class Ticket:
+    """An admitted run; settle() corrects the token estimate with the run's usage."""
+
+    __slots__ = ("controller", "tokens")
+
+    def __init__(self, controller, tokens):
+        self.controller = controller
+        self.tokens = tokens
+
+    def settle(self, total_tokens):
+        if total_tokens is not None and self.controller.tokens is not None:
+            self.controller.tokens.take(total_tokens - self.tokens)
+
+
+class AdmissionController:
+    """
+    Process-wide gate in front of every run. Token buckets for requests and tokens
+    per minute hold back runs the account's limits would reject; their capacity and
+    level follow the x-ratelimit-* headers of every API response (observe_response),
+    and a 429 pauses admissions until its retry time.
+
+    Waiting runs are dispatched by start-time fair queueing over the classes in
+    ADMISSION_WEIGHTS: while several classes wait, each gets capacity in proportion
+    to its weight, so premium turns go out ahead of free ones and both ahead of
+    background work, and none of them starves.
+    """
+
+    def __init__(self, rpm: int = OPENAI_RPM_LIMIT, tpm: int = OPENAI_TPM_LIMIT, weights: dict = None,
+                 enabled: bool = ADMISSION_ENABLED, clock=time.monotonic):
+        self.enabled = enabled
+        self.clock = clock
+        self.weights = weights or ADMISSION_WEIGHTS
+        self.requests = TokenBucket(rpm * ADMISSION_HEADROOM, clock) if rpm else None
+        self.tokens = TokenBucket(tpm * ADMISSION_HEADROOM, clock) if tpm else None
+        self._paused_until = 0.0
+        self._queue = []  # heap of _Waiter
+        self._seq = itertools.count()
+        self._virtual = 0.0  # start tag of the last dispatched run
+        self._finish = {}  # priority -> finish tag of its last queued run
+        self._wake = None
+        self._dispatcher = None
+        self._waits = {name: deque(maxlen=ADMISSION_WAIT_SAMPLES) for name in self.weights}
+        self.admitted = dict.fromkeys(self.weights, 0)
+        self.rate_limited = 0
+
+    def _delay(self, requests, tokens) -> float:
+        delay = self._paused_until - self.clock()
+        if self.requests is not None:
+            delay = max(delay, self.requests.delay(requests))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.delay(tokens))
+        return delay
+
+    def _admit(self, priority, requests, tokens, waited) -> Ticket:
+        if self.requests is not None:
+            self.requests.take(requests)
+        if self.tokens is not None:
+            self.tokens.take(tokens)
+        self._waits[priority].append(waited)
+        self.admitted[priority] += 1
+        return Ticket(self, tokens)
+
+    async def acquire(self, priority: str, tokens: int, requests: int = ADMISSION_RUN_REQUESTS) -> Ticket:
+        """Waits until a run of about `tokens` tokens may start, in its class's turn."""
+        if priority not in self.weights:
+            priority = "free"
+        limited = self.requests is not None or self.tokens is not None or self._paused_until > self.clock()
+        if not self.enabled or not limited:
+            return Ticket(self, tokens)
+        if not self._queue and self._delay(requests, tokens) <= 0:
+            return self._admit(priority, requests, tokens, 0.0)
+
+        start = max(self._virtual, self._finish.get(priority, 0.0))
+        self._finish[priority] = start + tokens / self.weights[priority]
+        waiter = _Waiter(start, next(self._seq), priority, requests, tokens,
+                         asyncio.get_running_loop().create_future(), self.clock())
+        heapq.heappush(self._queue, waiter)
+        loop = waiter.future.get_loop()
+        if self._dispatcher is None or self._dispatcher.done() or self._dispatcher.get_loop() is not loop:
+            # Waiters left from a closed event loop (e.g. an earlier asyncio.run) never resume
+            self._queue = [item for item in self._queue if item.future.get_loop() is loop]
+            heapq.heapify(self._queue)
+            self._wake = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        self._wake.set()
+        return await waiter.future
+
+    async def _dispatch(self):
+        while self._queue:
+            head = self._queue[0]
+            if head.future.done():  # the caller gave up
+                heapq.heappop(self._queue)
+                continue
+            delay = self._delay(head.requests, head.tokens)
+            if delay <= 0:
+                heapq.heappop(self._queue)
+                self._virtual = head.start
+                head.future.set_result(self._admit(head.priority, head.requests, head.tokens, self.clock() - head.queued_at))
+                continue
+            self._wake.clear()
+            try:  # a new arrival may belong ahead of the head
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def observe_response(self, status_code: int, headers):
+        """Adapts the buckets to an API response's rate-limit headers; a 429 pauses admissions."""
+        for bucket_name, kind in (("requests", "requests"), ("tokens", "tokens")):
+            limit = headers.get(f"x-ratelimit-limit-{kind}")
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if limit is None or remaining is None:
+                continue
+            try:
+                limit, remaining = float(limit), float(remaining)
+            except ValueError:
+                continue
+            bucket = getattr(self, bucket_name)
+            if bucket is None:
+                bucket = TokenBucket(limit * ADMISSION_HEADROOM, self.clock)
+                setattr(self, bucket_name, bucket)
+            bucket.adapt(limit, remaining)
+        if status_code == 429:
+            retry_after = headers.get("retry-after-ms")
+            retry_after = float(retry_after) / 1000 if retry_after else parse_duration(headers.get("retry-after"))
+            self.note_rate_limited(retry_after)
+
+    def note_rate_limited(self, retry_after: float = None):
+        """Pauses admissions after a rate-limit error (429, or a run failed with rate_limit_exceeded)."""
+        self.rate_limited += 1
+        self._paused_until = max(self._paused_until, self.clock() + (retry_after or ADMISSION_DEFAULT_BACKOFF))
+        if self._wake is not None:
+            self._wake.set()
+
+    def stats(self) -> dict:
+        """Per-class admissions and queue wait percentiles, plus the buckets' state."""
+        result = {"rate_limited": self.rate_limited, "queued": len(self._queue)}
+        for name, samples in self._waits.items():
+            waits = sorted(samples)
+            percentile = lambda q: round(waits[min(len(waits) - 1, int(q * len(waits)))] * 1000, 1) if waits else 0.0
+            result[name] = {"admitted": self.admitted[name], "wait_p50_ms": percentile(0.5), "wait_p95_ms": percentile(0.95)}
+        for bucket_name in ("requests", "tokens"):
+            bucket = getattr(self, bucket_name)
+            if bucket is not None:
+                result[f"{bucket_name}_per_minute"] = round(bucket.capacity)
+        return result
+
+
+ADMISSION = AdmissionController()
+
+
+async def on_response(response):
+    """httpx response hook installed on the shared clients (see helpers.create_async_client)."""
+    ADMISSION.observe_response(response.status_code, response.headers)
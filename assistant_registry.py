@@ -0,0 +1,159 @@
+import os
+import json
+import asyncio
+import hashlib
+
+from prompts import (
+    ONBOARDING_AGENT_SYSTEM_PROMPT, ONBOARDING_AGENT_INSTRUCTIONS,
+    CAREER_COACH_SYSTEM_PROMPT, CAREER_COACH_INSTRUCTIONS,
+    SKILL_GAP_ANALYZER_SYSTEM_PROMPT, SKILL_GAP_ANALYZER_INSTRUCTIONS,
+    REFLECTION_CHECK_IN_SYSTEM_PROMPT, REFLECTION_CHECK_IN_INSTRUCTIONS,
+    MILESTONE_GENERATOR_SYSTEM_PROMPT, MILESTONE_GENERATOR_INSTRUCTIONS,
+    MASTER_AI_AGENT_SYSTEM_PROMPT, MASTER_AI_AGENT_INSTRUCTIONS,
+)
+from helpers import get_client, get_async_client
+from schemas import MASTER_DECISION, STRICT_SCHEMAS
+
+# Maps "<agent>:<spec hash>" to the assistant id provisioned for that exact spec
+ASSISTANT_REGISTRY_FILE = os.getenv("ASSISTANT_REGISTRY_FILE", ".assistant_registry.json")
+
+DEFAULT_MODEL = os.getenv("OPENAI_ASSISTANT_MODEL", "gpt-4o")
+CODE_INTERPRETER = {"type": "code_interpreter"}
+
+# One entry per agent. The run instructions are baked into the assistant once,
+# so runs no longer resend them; tools are opt-in per agent. An agent that answers with
+# JSON only also gets its schema as a strict response_format (see schemas.py).
+AGENT_SPECS = {
+    "onboarding_agent": {
+        "name": "Onboarding Agent",
+        "system_prompt": ONBOARDING_AGENT_SYSTEM_PROMPT,
+        "instructions": ONBOARDING_AGENT_INSTRUCTIONS,
+        "model": DEFAULT_MODEL,
+        "tools": [CODE_INTERPRETER],  # reads files the user uploads during onboarding
+    },
+    "career_coach": {
+        "name": "Career Coach",
+        "system_prompt": CAREER_COACH_SYSTEM_PROMPT,
+        "instructions": CAREER_COACH_INSTRUCTIONS,
+        "model": DEFAULT_MODEL,
+        "tools": [],
+    },
+    "milestone_generator": {
+        "name": "Milestone Generator",
+        "system_prompt": MILESTONE_GENERATOR_SYSTEM_PROMPT,
+        "instructions": MILESTONE_GENERATOR_INSTRUCTIONS,
+        "model": DEFAULT_MODEL,
+        "tools": [],
+    },
+    "skill_gap_analyzer": {
+        "name": "Skill Gap Analyzer",
+        "system_prompt": SKILL_GAP_ANALYZER_SYSTEM_PROMPT,
+        "instructions": SKILL_GAP_ANALYZER_INSTRUCTIONS,
+        "model": DEFAULT_MODEL,
+        "tools": [],
+    },
+    "reflection_check_in_agent": {
+        "name": "Reflection & Check-In",
+        "system_prompt": REFLECTION_CHECK_IN_SYSTEM_PROMPT,
+        "instructions": REFLECTION_CHECK_IN_INSTRUCTIONS,
+        "model": DEFAULT_MODEL,
+        "tools": [],
+    },
+    "master_ai_agent": {
+        "name": "Master AI Agent Orchestrator",
+        "system_prompt": MASTER_AI_AGENT_SYSTEM_PROMPT,
+        "instructions": MASTER_AI_AGENT_INSTRUCTIONS,
+        "model": DEFAULT_MODEL,
+        "tools": [],
+        "response_format": MASTER_DECISION.response_format() if STRICT_SCHEMAS else None,
+    },
+}
+
+_registry = None  # loaded lazily from ASSISTANT_REGISTRY_FILE
+
+
+def spec_version(spec) -> str:
+    """Short hash of everything that defines an assistant's behaviour."""
+    fields = [spec["name"], spec["system_prompt"], spec["instructions"], spec["model"], spec["tools"]]
+    if spec.get("response_format"):
+        fields.append(spec["response_format"])
+    payload = json.dumps(fields, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def registry_key(agent_key: str) -> str:
+    return f"{agent_key}:{spec_version(AGENT_SPECS[agent_key])}"
+
+
+def _assistant_kwargs(spec) -> dict:
+    kwargs = {
+        "name": spec["name"],
+        "instructions": f"{spec['system_prompt'].strip()}\n\n{spec['instructions'].strip()}",
+        "tools": spec["tools"],
+        "model": spec["model"],
+    }
+    if spec.get("response_format"):
+        kwargs["response_format"] = spec["response_format"]
+    return kwargs
+
+
+def _load_registry() -> dict:
+    global _registry
+    if _registry is None:
+        _registry = {}
+        if os.path.exists(ASSISTANT_REGISTRY_FILE):
+            with open(ASSISTANT_REGISTRY_FILE, "r") as f:
+                _registry = json.load(f)
+    return _registry
+
+
+def _save_registry():
+    # Write-then-rename so a crash never leaves a truncated registry behind
+    tmp_path = f"{ASSISTANT_REGISTRY_FILE}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(_registry, f, indent=4, sort_keys=True)
+    os.replace(tmp_path, ASSISTANT_REGISTRY_FILE)
+
+
+def get_assistant_id(agent_key: str) -> str:
+    """
+    Returns the assistant id for the agent's current spec. Normally answered from the
+    registry populated by provision_assistants(); an unprovisioned spec is created
+    synchronously as a fallback.
+    """
+    registry = _load_registry()
+    key = registry_key(agent_key)
+    if key not in registry:
+        assistant = get_client().beta.assistants.create(**_assistant_kwargs(AGENT_SPECS[agent_key]))
+        registry[key] = assistant.id
+        _save_registry()
+    return registry[key]
+
+
+async def provision_assistants(agent_keys=None, OPENAI_CLIENT=None) -> dict:
+    """
+    Creates every missing assistant concurrently and records them in the registry.
+
+    Args:
+        agent_keys: Agents to provision; defaults to all of AGENT_SPECS.
+        OPENAI_CLIENT: Async client to use; defaults to the shared one.
+
+    Returns:
+        dict: agent key -> assistant id for the requested agents.
+    """
+    OPENAI_CLIENT = OPENAI_CLIENT or get_async_client()
+    registry = _load_registry()
+    agent_keys = list(agent_keys or AGENT_SPECS)
+    missing = [agent_key for agent_key in agent_keys if registry_key(agent_key) not in registry]
+
+    if missing:
+        assistants = await asyncio.gather(*(
+            OPENAI_CLIENT.beta.assistants.create(**_assistant_kwargs(AGENT_SPECS[agent_key]))
+            for agent_key in missing
+        ))
+        for agent_key, assistant in zip(missing, assistants):
+            registry[registry_key(agent_key)] = assistant.id
+        _save_registry()
+        print(f"Provisioned assistants: {', '.join(missing)}")
+
+    return {agent_key: registry[registry_key(agent_key)] for agent_key in agent_keys}
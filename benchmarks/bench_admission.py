@@ -0,0 +1,136 @@
+"""
+Load test of admission control against fake_server.py enforcing per-minute limits
+(--rpm, --tpm), in its own process, through the real openai client.
+
+Premium, free and background sessions each loop over runs (helpers.acall_openAI)
+for --duration seconds, far more than the limits allow. Reported per class, over the
+runs that completed within the duration: runs per second, run latency, time spent
+waiting for admission, and runs that failed on rate limits (429s the SDK's own
+retries did not get past). Runs still queued at the end are drained, not counted.
+
+    --admission on   admission.ADMISSION as shipped: buckets learned from the
+                     x-ratelimit-* headers, weighted fair queueing across classes
+    --admission off  every session sends as soon as it can (the SDK still retries 429s)
+
+    python benchmarks/bench_admission.py --duration 30
+    python benchmarks/bench_admission.py --duration 30 --admission off
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import isolate_environment
+
+isolate_environment()
+
+import admission
+import helpers
+from admission import ADMISSION
+from helpers import acreate_thread
+
+CLASSES = ("premium", "free", "background")
+MESSAGE = "Please review my progress on this week's milestone and suggest the next step. " * 4
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def session_loop(priority, deadline, think_time, rng, results):
+    admission.set_priority(priority)
+    client = helpers.get_async_client()
+    thread_id = await acreate_thread(client)
+    while time.perf_counter() < deadline:
+        began = time.perf_counter()
+        try:
+            await helpers.acall_openAI(thread_id, "asst_load", MESSAGE, OPENAI_CLIENT=client)
+            if time.perf_counter() <= deadline:
+                results[priority]["latencies"].append(time.perf_counter() - began)
+        except admission.RateLimited:
+            results[priority]["rate_limited"] += 1
+        except Exception as e:
+            results[priority]["errors"].append(str(e))
+        await asyncio.sleep(rng.expovariate(1 / think_time))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--admission", choices=["on", "off"], default="on")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--premium", type=int, default=10, help="premium sessions")
+    parser.add_argument("--free", type=int, default=30, help="free sessions")
+    parser.add_argument("--background", type=int, default=10, help="background jobs")
+    parser.add_argument("--rpm", type=int, default=1200, help="requests per minute the fake API allows")
+    parser.add_argument("--tpm", type=int, default=150_000, help="tokens per minute the fake API allows")
+    parser.add_argument("--run-latency", type=float, default=0.3)
+    parser.add_argument("--think-time", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(__file__), "fake_server.py"), "--port", str(port),
+         "--run-latency", str(args.run_latency), "--rpm", str(args.rpm), "--tpm", str(args.tpm), "--seed", str(args.seed)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(100):  # wait for the server to listen
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+        ADMISSION.enabled = args.admission == "on"
+
+        rng = random.Random(args.seed)
+        results = {name: {"latencies": [], "rate_limited": 0, "errors": []} for name in CLASSES}
+        counts = {"premium": args.premium, "free": args.free, "background": args.background}
+        began = time.perf_counter()
+        deadline = began + args.duration
+        with contextlib.redirect_stdout(io.StringIO()):  # helpers log failed deletes and retries
+            await asyncio.gather(*(
+                session_loop(name, deadline, args.think_time, rng, results)
+                for name in CLASSES for _ in range(counts[name])
+            ))
+        wall = args.duration
+    finally:
+        server.terminate()
+        server.wait()
+
+    stats = ADMISSION.stats()
+    print(f"admission {args.admission}: {args.premium} premium / {args.free} free / {args.background} background "
+          f"sessions for {args.duration:g} s; limits {args.rpm} requests and {args.tpm} tokens per minute")
+    print(f"{'class':<12}{'runs':>7}{'runs/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'wait p50':>10}{'wait p95':>10}{'limited':>9}")
+    for name in CLASSES:
+        latencies = results[name]["latencies"]
+        waits = stats[name] if args.admission == "on" else {"wait_p50_ms": 0.0, "wait_p95_ms": 0.0}
+        print(f"{name:<12}{len(latencies):>7}{len(latencies) / wall:>9.2f}"
+              f"{percentile(latencies, 0.5) * 1000:>9.0f}{percentile(latencies, 0.95) * 1000:>9.0f}"
+              f"{waits['wait_p50_ms']:>10.0f}{waits['wait_p95_ms']:>10.0f}{results[name]['rate_limited']:>9}")
+    total = sum(len(results[name]["latencies"]) for name in CLASSES)
+    print(f"total {total} runs, {total / wall:.2f}/s; {stats['rate_limited']} rate-limit responses seen "
+          f"(429s and rate-limited runs, before the SDK's retries)")
+    errors = [error for name in CLASSES for error in results[name]["errors"]]
+    if errors:
+        print(f"{len(errors)} other errors, e.g. {errors[0]}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
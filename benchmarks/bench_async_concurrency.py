@@ -0,0 +1,65 @@
+"""
+Concurrency check for the async agent path.
+
+Runs N onboarding conversations at once against FakeAsyncOpenAI and compares the
+wall-clock time with a single conversation. With the event loop unblocked, N
+sessions should finish in roughly the time of one.
+
+    python benchmarks/bench_async_concurrency.py --sessions 50 --run-latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import FakeAsyncOpenAI, isolate_environment
+
+isolate_environment()
+
+from assistant_registry import provision_assistants
+from helpers import acreate_thread
+from Agents.onboarding_agent import OnboardingAgent
+from session import Session
+
+
+async def run_session(agent, session):
+    result = await agent.chat(session, "Hello, I'm ready to start my career onboarding.")
+    assert result["status"] == "continue", result
+
+
+async def timed(agent, sessions):
+    sessions = [Session(thread_id=await acreate_thread(agent.OPENAI_CLIENT)) for _ in range(sessions)]
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(agent, session) for session in sessions))
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--run-latency", type=float, default=0.5)
+    parser.add_argument("--max-ratio", type=float, default=1.5,
+                        help="fail if N sessions take longer than this multiple of one session")
+    args = parser.parse_args()
+
+    client = FakeAsyncOpenAI(run_latency=args.run_latency)
+    await provision_assistants(OPENAI_CLIENT=client)
+    agent = OnboardingAgent()
+    agent.OPENAI_CLIENT = client
+    single = await timed(agent, 1)
+    concurrent = await timed(agent, args.sessions)
+    ratio = concurrent / single
+
+    print(f"1 session:   {single:.3f}s")
+    print(f"{args.sessions} sessions: {concurrent:.3f}s  (ratio {ratio:.2f}x, sequential would be ~{single * args.sessions:.1f}s)")
+    if ratio > args.max_ratio:
+        print(f"FAIL: concurrent sessions took {ratio:.2f}x a single session (limit {args.max_ratio}x)")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Time-to-first-message when a chat session starts.
+
+    legacy   create a thread, then run the onboarding agent on the opening message
+    cold     pooled thread, but no greeting cached yet for this prompt version
+    warm     pooled thread and cached greeting (every session after the first)
+
+    python benchmarks/bench_chat_start.py --sessions 20 --run-latency 2.0 --request-latency 0.08
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import FakeAsyncOpenAI, isolate_environment
+
+isolate_environment()
+
+from assistant_registry import provision_assistants
+from helpers import acreate_thread
+from session import Session
+from thread_pool import ThreadPool
+from Agents.onboarding_agent import OnboardingAgent, OPENING_MESSAGE
+
+
+async def legacy_start(agent, pool):
+    session = Session(thread_id=await acreate_thread(agent.OPENAI_CLIENT))
+    return session, await agent.chat(session, OPENING_MESSAGE)
+
+
+async def pooled_start(agent, pool):
+    session = Session(thread_id=await pool.acquire())
+    return session, await agent.start(session)
+
+
+async def measure(start_fn, agent, pool, sessions):
+    latencies = []
+    for _ in range(sessions):
+        began = time.perf_counter()
+        session, result = await start_fn(agent, pool)
+        latencies.append(time.perf_counter() - began)
+        assert result["status"] == "continue", result
+        await session.wait_ready()
+        await asyncio.sleep(0.2)  # let the pool refill, as it would between real arrivals
+    return latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--run-latency", type=float, default=2.0)
+    parser.add_argument("--request-latency", type=float, default=0.08)
+    args = parser.parse_args()
+
+    client = FakeAsyncOpenAI(run_latency=args.run_latency, request_latency=args.request_latency)
+    await provision_assistants(OPENAI_CLIENT=client)
+    agent = OnboardingAgent()
+    agent.OPENAI_CLIENT = client
+    pool = ThreadPool(OPENAI_CLIENT=client)
+    await pool.start()
+    await asyncio.sleep(0.5)
+
+    legacy = await measure(legacy_start, agent, pool, args.sessions)
+    cold = await measure(pooled_start, agent, pool, 1)  # populates the greeting cache
+    warm = await measure(pooled_start, agent, pool, args.sessions)
+    await pool.close()
+
+    print(f"{'scenario':<10}{'p50 (ms)':>12}{'max (ms)':>12}")
+    for name, latencies in (("legacy", legacy), ("cold", cold), ("warm", warm)):
+        print(f"{name:<10}{statistics.median(latencies) * 1000:>12.1f}{max(latencies) * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
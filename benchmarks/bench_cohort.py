@@ -0,0 +1,182 @@
+"""
+Throughput of cohort.py (batch career paths and milestone plans) against the
+in-process fake API, at several concurrency levels.
+
+A synthetic cohort of --users onboarding profiles is written to a JSONL file, a share
+of them (--duplicates) repeating an earlier profile up to case and whitespace. Each
+level plans the whole cohort from scratch (fresh output file and caches) and reports
+users per second, runs sent to the API and the p50 / p95 time to plan one profile.
+
+--resume-check interrupts one run after half the users and resumes it, checking that
+every user ends with exactly one plan and no profile is planned twice.
+
+    python benchmarks/bench_cohort.py --users 500 --levels 1,4,16,64
+    python benchmarks/bench_cohort.py --users 200 --levels 16 --resume-check
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import FakeAsyncOpenAI, isolate_environment
+
+isolate_environment()
+
+import cohort
+import helpers
+from assistant_registry import get_assistant_id, provision_assistants
+from response_cache import ResponseCache, NearDuplicateCache
+from scripted_conversation import script_responder
+import Agents.milestone_generator as milestone_generator
+
+GOALS = ["data scientist", "cloud architect", "product manager", "UX researcher", "security engineer",
+         "machine learning engineer", "backend developer", "data engineer", "technical writer", "SRE"]
+AVOID = ["sales", "night shifts", "heavy travel", "pure management", "agency work", "call centres"]
+ENVIRONMENTS = ["remote", "hybrid", "small team", "large company", "research lab", "public sector", "startup"]
+SKILLS = ["Python", "SQL", "Kubernetes", "statistics", "public speaking", "Figma", "Rust", "TensorFlow",
+          "Terraform", "negotiation", "system design", "Go", "Spark", "writing", "leadership"]
+PATHS = ["Machine Learning Engineer", "Applied Research Engineer", "ML Platform Engineer"]
+
+
+class Stop(Exception):
+    """Raised from on_result to simulate a crash in the middle of a cohort."""
+
+
+def make_profiles(count: int, duplicates: float, rng: random.Random) -> list:
+    profiles = []
+    for index in range(count):
+        if profiles and rng.random() < duplicates:
+            original = rng.choice(profiles)
+            # Same profile up to case and whitespace: dedupe must catch it
+            copy = {key: f"  {value.upper()} " if isinstance(value, str) else value for key, value in original.items()}
+            profiles.append(dict(copy, user_id=f"user-{index}"))
+            continue
+        goal = rng.choice(GOALS)
+        profiles.append({
+            "user_id": f"user-{index}",
+            "career_goals": f"Become a {goal} within {rng.randint(1, 5)} years, ideally in {rng.choice(ENVIRONMENTS)} teams.",
+            "roles_to_avoid": f"No {rng.choice(AVOID)} or {rng.choice(AVOID)}; cohort member {index}.",
+            "short_long_term_vision": f"Short-term: junior {goal} by month {rng.randint(3, 24)}. Long-term: lead {rng.randint(2, 40)} people.",
+            "preferred_work_environment": f"{rng.choice(ENVIRONMENTS)}, {rng.choice(ENVIRONMENTS)}, {rng.randint(2, 5)} office days at most.",
+            "skills_to_improve": ", ".join(rng.sample(SKILLS, 4)),
+        })
+    return profiles
+
+
+def cohort_responder():
+    """
+    script_responder, with the Milestone Generator answering the cohort's path request
+    as JSON. respond.runs counts the runs answered (the fake drops runs with their thread).
+    """
+    scripted = script_responder([])
+    generator_id = get_assistant_id("milestone_generator")
+
+    def respond(thread_messages, assistant_id, instructions):
+        respond.runs += 1
+        last_user = next(m for m in reversed(thread_messages) if m.role == "user").content[0].text.value
+        if assistant_id == generator_id and "### Career Paths" in last_user:
+            data = {"career_paths": [{"title": path, "reason": "Fits the goals in the profile."} for path in PATHS]}
+            return f"Here are three paths.\n\n### Career Paths\n```json\n{json.dumps(data, indent=2)}\n```"
+        return scripted(thread_messages, assistant_id, instructions)
+
+    respond.runs = 0
+    return respond
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def read_output(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def run_level(fake, input_path, output_path, concurrency, on_result=None):
+    # Fresh caches so each level generates every distinct profile
+    milestone_generator.RESPONSE_CACHE = ResponseCache()
+    milestone_generator.PROFILE_CACHE = NearDuplicateCache()
+    runs_before = fake.responder.runs
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = await cohort.plan_cohort(input_path, output_path, concurrency, OPENAI_CLIENT=fake, on_result=on_result)
+    return stats, fake.responder.runs - runs_before
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--duplicates", type=float, default=0.1, help="share of users repeating an earlier profile")
+    parser.add_argument("--levels", default="1,4,16,64", help="comma-separated concurrency levels")
+    parser.add_argument("--run-latency", type=float, default=0.3)
+    parser.add_argument("--request-latency", type=float, default=0.01)
+    parser.add_argument("--resume-check", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    scratch = tempfile.mkdtemp(prefix="bluetide-cohort-")
+    input_path = os.path.join(scratch, "profiles.jsonl")
+    with open(input_path, "w", encoding="utf-8") as f:
+        for profile in make_profiles(args.users, args.duplicates, rng):
+            f.write(json.dumps(profile) + "\n")
+
+    fake = FakeAsyncOpenAI(run_latency=args.run_latency, request_latency=args.request_latency, seed=args.seed)
+    # The fake deletes threads as fast as it is asked; don't pace the reaper at the live rate
+    cohort.THREAD_REAPER.rate = 1000
+    helpers._SHARED_ASYNC_CLIENT = fake
+    await provision_assistants(OPENAI_CLIENT=fake)
+    fake.responder = cohort_responder()
+
+    print(f"{args.users} users, {args.duplicates:.0%} duplicate profiles; runs ~{args.run_latency * 1000:.0f} ms, "
+          f"requests ~{args.request_latency * 1000:.0f} ms")
+    print(f"{'concurrency':>11}{'users/s':>9}{'seconds':>9}{'planned':>9}{'copied':>8}{'failed':>8}"
+          f"{'runs':>7}{'p50 ms':>8}{'p95 ms':>8}")
+    for level in [int(value) for value in args.levels.split(",")]:
+        output_path = os.path.join(scratch, f"plans-{level}.jsonl")
+        stats, runs = await run_level(fake, input_path, output_path, level)
+        planned = [record["seconds"] for record in read_output(output_path) if record.get("outcome") == "planned"]
+        print(f"{level:>11}{(stats['planned'] + stats['copied']) / stats['seconds']:>9.1f}{stats['seconds']:>9.1f}"
+              f"{stats['planned']:>9}{stats['copied']:>8}{stats['failed']:>8}{runs:>7}"
+              f"{percentile(planned, 0.5) * 1000:>8.0f}{percentile(planned, 0.95) * 1000:>8.0f}")
+
+    if args.resume_check:
+        level = int(args.levels.split(",")[-1])
+        output_path = os.path.join(scratch, "plans-resumed.jsonl")
+        written = 0
+
+        def crash_halfway(record):
+            nonlocal written
+            written += 1
+            if written == args.users // 2:
+                raise Stop()
+
+        try:
+            await run_level(fake, input_path, output_path, level, on_result=crash_halfway)
+        except Stop:
+            pass
+        first = len(read_output(output_path))
+        with open(output_path, "a", encoding="utf-8") as f:
+            f.write('{"user_id": "user-cut-sh')  # a line cut short by the crash
+        stats, runs = await run_level(fake, input_path, output_path, level)
+        records = read_output(output_path)
+        successes = {}
+        for record in records:
+            if record["status"] == "success":
+                successes[record["user_id"]] = successes.get(record["user_id"], 0) + 1
+        replanned = len(records) - len({record["user_id"] for record in records})
+        ok = len(successes) == args.users and all(count == 1 for count in successes.values()) and replanned == 0
+        print(f"\nresume: crashed after {first} of {args.users} users; the second run skipped {stats['resumed']}, "
+              f"planned {stats['planned']} and copied {stats['copied']} in {runs} runs; "
+              f"{'every user has exactly one plan' if ok else 'MISMATCH'}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
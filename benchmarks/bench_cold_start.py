@@ -0,0 +1,186 @@
+"""
+Cold start of a worker: import time and time to ready, each measured in a fresh
+interpreter against fake_server.py running in its own process.
+
+    chainlit  import chainlit.py, run on_app_startup, then on_chat_start for the
+              first chat (the greeting is cached, as after any restart)
+    master    import Agents.master_agent, construct MasterAIAgent, then route a
+              first message to a specialist
+
+Reported per stage (median of --repeats): milliseconds, network connections opened,
+and whether openai / regex were loaded by then. The first, unmeasured run provisions
+the assistants and caches the greeting. --history appends the results, with the
+git commit, to a JSONL file so they can be tracked over time:
+
+    python benchmarks/bench_cold_start.py --repeats 5 --history benchmarks/data/cold_start.jsonl
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HEAVY_MODULES = ("openai", "regex")
+
+
+def _child(target):
+    """Runs in the measured interpreter; prints one JSON line of stage timings."""
+    began = time.perf_counter()
+    connections = [0]
+    connect = socket.socket.connect
+
+    def counting_connect(self, address):
+        connections[0] += 1
+        return connect(self, address)
+
+    socket.socket.connect = counting_connect
+    stages = {}
+
+    def mark(stage):
+        stages[stage] = {
+            "ms": round((time.perf_counter() - began) * 1000, 1),
+            "connections": connections[0],
+            "loaded": [name for name in HEAVY_MODULES if name in sys.modules],
+        }
+
+    sys.path.append(ROOT)
+    sys.path.append(os.path.dirname(__file__))
+    if target == "chainlit":
+        import importlib.util
+        import chainlit as cl
+        from chainlit.context import init_http_context
+        spec = importlib.util.spec_from_file_location("bluetide_app", os.path.join(ROOT, "chainlit.py"))
+        app = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(app)
+        mark("import")
+
+        async def start():
+            await app.on_app_startup()
+            mark("startup")
+            init_http_context(user=cl.User(identifier="cold-start", metadata={}))
+            await app.on_chat_start()
+            await cl.user_session.get("session").wait_ready()
+            mark("first_chat")
+            await app.on_app_shutdown()
+    else:
+        from Agents.master_agent import MasterAIAgent
+        from helpers import acreate_thread, get_async_client
+        from session import Session
+        mark("import")
+
+        async def start():
+            master = MasterAIAgent()
+            mark("construct")
+            session = Session(thread_id=await acreate_thread(get_async_client()), user_id="cold-start")
+            await master.chat(session, "Which skills am I missing to become a data engineer?")
+            mark("first_turn")
+            stages["first_turn"]["agents_built"] = dict.__len__(master.agents)  # constructed so far
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(start())
+    print(json.dumps(stages))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure(target, env):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", target],
+        env=env, cwd=ROOT, capture_output=True, text=True, timeout=300,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "child failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", choices=["chainlit", "master"], default=["chainlit", "master"])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--run-latency", type=float, default=0.05, help="median seconds per fake run")
+    parser.add_argument("--history", help="append results to this JSONL file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return _child(args.child)
+
+    sys.path.append(os.path.dirname(__file__))
+    from fake_openai import isolate_environment
+    isolate_environment()
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(__file__), "fake_server.py"),
+         "--port", str(port), "--run-latency", str(args.run_latency), "--seed", "1"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    env = dict(os.environ, OPENAI_BASE_URL=f"http://127.0.0.1:{port}/v1", THREAD_POOL_SIZE="2")
+    try:
+        for _ in range(100):  # wait for the server to listen
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        results = {}
+        for target in args.targets:
+            measure(target, env)  # provisions assistants, caches the greeting
+            runs = [measure(target, env) for _ in range(args.repeats)]
+            results[target] = {
+                stage: {
+                    "ms": statistics.median(run[stage]["ms"] for run in runs),
+                    "connections": runs[-1][stage]["connections"],
+                    "loaded": runs[-1][stage]["loaded"],
+                    **({"agents_built": runs[-1][stage]["agents_built"]} if "agents_built" in runs[-1][stage] else {}),
+                }
+                for stage in runs[0]
+            }
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"Cold start, median of {args.repeats} fresh interpreters (ms since the child's first line)")
+    print(f"{'target':<10}{'stage':<12}{'ms':>9}{'connections':>13}  loaded")
+    for target, stages in results.items():
+        for stage, row in stages.items():
+            extra = f" ({row['agents_built']} of 5 specialists built)" if "agents_built" in row else ""
+            print(f"{target:<10}{stage:<12}{row['ms']:>9.0f}{row['connections']:>13}  {', '.join(row['loaded']) or '-'}{extra}")
+
+    if args.history:
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "commit": git_commit(),
+                "repeats": args.repeats,
+                "results": results,
+            }) + "\n")
+        with open(args.history, encoding="utf-8") as f:
+            history = [json.loads(line) for line in f if line.strip()]
+        print(f"\nhistory ({args.history}, last 5): import / ready ms")
+        for entry in history[-5:]:
+            cells = []
+            for target, stages in entry["results"].items():
+                names = list(stages)
+                cells.append(f"{target} {stages[names[0]]['ms']:.0f} / {stages[names[-1]]['ms']:.0f}")
+            print(f"  {entry['created_at']}  {entry['commit'] or '?':<9}  " + "   ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Wall-clock of a multi-intent turn ("I pick this path, and what am I missing?").
+
+    sequential  two routed turns, as before: Milestone Generator, then Skill Gap Analyzer
+    fan-out     one call_agents decision; MasterAIAgent runs both specialists at once,
+                the second on a forked thread, and merges their output_json
+
+The fake server allows one active run per thread, like the API, so a collision on
+the shared thread would fail the turn. The local router is bypassed.
+
+    python benchmarks/bench_fan_out.py --runs 10 --run-latency 0.5 --request-latency 0.02
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import FakeAsyncOpenAI, isolate_environment
+
+isolate_environment()
+
+from assistant_registry import get_assistant_id, provision_assistants
+from helpers import acreate_thread
+from memory import MemoryManager
+from response_cache import ResponseCache
+from session import Session
+from thread_history import ThreadHistoryCache
+from thread_reaper import THREAD_REAPER
+from Agents import master_agent
+from Agents.master_agent import MasterAIAgent
+from scripted_conversation import PROFILE, script_responder
+
+PICK = "I pick Machine Learning Engineer"
+GAPS = "Which skills am I missing for that path?"
+COMBINED = f"{PICK}, and which skills am I missing for it?"
+
+
+def fan_out_responder(run_index):
+    """script_responder, with the Master answering COMBINED by a call_agents decision."""
+    pick, gaps = f"{PICK} (run {run_index})", f"{GAPS} (run {run_index})"
+    scripted = script_responder([(pick, "milestone_generator"), (gaps, "skill_gap_analyzer")])
+    master_id = get_assistant_id("master_ai_agent")
+
+    def respond(thread_messages, assistant_id, instructions):
+        last_user = next(m for m in reversed(thread_messages) if m.role == "user").content[0].text.value
+        if assistant_id == master_id and f"'{COMBINED}'" in last_user:
+            decision = {
+                "action": "call_agents",
+                "agent_to_call": None,
+                "message_for_agent": None,
+                "agent_calls": [
+                    {"agent_to_call": "milestone_generator", "message_for_agent": pick},
+                    {"agent_to_call": "skill_gap_analyzer", "message_for_agent": gaps},
+                ],
+                "direct_response_message": None,
+                "transition_phase_to": None,
+            }
+            return f"```json\n{json.dumps(decision)}\n```"
+        return scripted(thread_messages, assistant_id, instructions)
+
+    return respond
+
+
+async def new_session(client, master, run_index):
+    client.responder = fan_out_responder(run_index)
+    master_agent.RESPONSE_CACHE = ResponseCache()
+    session = Session(thread_id=await acreate_thread(client), user_id=f"user-{run_index}")
+    session.data["user_onboarding_data"] = PROFILE
+    master._context(session).update_profile(PROFILE)
+    return session
+
+
+async def sequential(client, master, run_index):
+    session = await new_session(client, master, run_index)
+    began = time.perf_counter()
+    first = await master.chat(session, f"{PICK} (run {run_index})")
+    second = await master.chat(session, f"{GAPS} (run {run_index})")
+    elapsed = time.perf_counter() - began
+    ok = first["agent_type"] == "milestone_generator" and second["agent_type"] == "skill_gap_analyzer"
+    return elapsed, ok, len(client._threads[session.thread_id])
+
+
+async def fan_out(client, master, run_index):
+    session = await new_session(client, master, run_index)
+    began = time.perf_counter()
+    result = await master.chat(session, COMBINED)
+    elapsed = time.perf_counter() - began
+    output = result["output_json"] or {}
+    ok = (
+        [r["status"] for r in result.get("results", [])] == ["success", "success"]
+        and output.get("milestone_generator", {}).get("type") == "initial_generation"
+        and "skill_gaps_identified" in output.get("skill_gap_analyzer", {})
+    )
+    await THREAD_REAPER.close()  # forks are deleted in the background
+    return elapsed, ok, len(client._threads[session.thread_id])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--run-latency", type=float, default=0.5)
+    parser.add_argument("--request-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    client = FakeAsyncOpenAI(run_latency=args.run_latency, request_latency=args.request_latency)
+    await provision_assistants(OPENAI_CLIENT=client)
+    master = MasterAIAgent()
+    for agent in [master, *master.agents.values()]:
+        agent.OPENAI_CLIENT = client
+    # Memory compaction reads threads through the fake client too
+    master_agent.MEMORY = MemoryManager(history=ThreadHistoryCache(OPENAI_CLIENT=client), OPENAI_CLIENT=client)
+    master.router.route = lambda *args, **kwargs: None
+
+    print(f"{args.runs} turns each, {args.run_latency * 1000:.0f} ms per run, {args.request_latency * 1000:.0f} ms per request")
+    print(f"{'mode':<12}{'p50 ms':>10}{'max ms':>10}{'thread messages':>17}{'ok':>6}")
+    all_ok = True
+    for name, turn in (("sequential", sequential), ("fan-out", fan_out)):
+        samples, oks, lengths = [], [], []
+        for run_index in range(args.runs):
+            with contextlib.redirect_stdout(io.StringIO()):  # the Master logs every routing decision
+                elapsed, ok, length = await turn(client, master, f"{name}-{run_index}")
+            samples.append(elapsed)
+            oks.append(ok)
+            lengths.append(length)
+        all_ok &= all(oks)
+        print(f"{name:<12}{statistics.median(samples) * 1000:>10.0f}{max(samples) * 1000:>10.0f}"
+              f"{statistics.median(lengths):>17.0f}{sum(oks):>4}/{len(oks)}")
+    if not all_ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+"""
+Throughput of structured_output versus the per-agent regex chains it replaced.
+
+Each case runs the old extraction path of one agent and the shared single-pass
+extractor over the same response and checks that they agree where the old path
+succeeds. "adversarial" responses contain many unterminated ```json fences and
+unbalanced braces, which make the backtracking patterns scan quadratically.
+
+    python benchmarks/bench_json_extraction.py --repeat 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import regex as re
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from structured_output import find_json_block, extract_blocks
+
+# The patterns the agents used before structured_output
+GREEDY_FENCE = re.compile(r"```json\s*(\{.*\})\s*```", re.DOTALL)
+ANY_OBJECT = re.compile(r"(\{[\s\S]*?\})", re.DOTALL)
+FENCE_NEWLINES = re.compile(r"```json\s*\n(?P<json_string>\{[\s\S]*?\})\s*\n```", re.DOTALL | re.MULTILINE)
+HEADED_FENCE = re.compile(
+    r"###\s*(?P<heading>[^\n]+)\s*\n```json\s*\n(?P<json_string>\{[\s\S]*?\})\s*\n```", re.DOTALL | re.MULTILINE
+)
+SKILL_GAP_FENCE = re.compile(
+    r"###\s*Skill Gap Analysis\s*\n```json\s*\n(?P<json_string>\{[\s\S]*?\})\s*\n```", re.DOTALL | re.MULTILINE
+)
+
+
+def old_onboarding(text):
+    match = GREEDY_FENCE.search(text) or ANY_OBJECT.search(text)
+    if match:
+        try:
+            return json.loads(match.group(1))
+        except json.JSONDecodeError:
+            return None
+
+
+def old_pattern(pattern):
+    def extract(text):
+        match = pattern.search(text)
+        if match:
+            try:
+                return json.loads(match.group("json_string"))
+            except json.JSONDecodeError:
+                return None
+    return extract
+
+
+def new_first(text):
+    block = find_json_block(text, allow_unfenced=True)
+    return block.data if block else None
+
+
+def new_headed(heading=None):
+    def extract(text):
+        for block in extract_blocks(text):
+            if block.language == "json" and block.heading and (heading is None or heading.lower() in block.heading.lower()):
+                return block.data
+    return extract
+
+
+def plan(milestones):
+    return {
+        "type": "initial_generation",
+        "career_path": "Data Scientist",
+        "milestones": [
+            {"id": f"M{i}", "title": f"Milestone {i}", "description": "Learn {things} and \"quote\" them.",
+             "sub_steps": ["Step one", "Step two"], "estimated_time_weeks": 4, "status": "pending"}
+            for i in range(milestones)
+        ],
+    }
+
+
+def make_cases():
+    small = json.dumps(plan(6), indent=2)
+    large = json.dumps(plan(400), indent=2)
+    prose = "Here is some context about your journey. " * 50
+    return {
+        "typical": f"{prose}\n### Career Milestones Plan\n```json\n{small}\n```\nYour dashboard is being set up.",
+        "skill_gap": f"{prose}\n### Skill Gap Analysis\n```json\n{small}\n```\n",
+        "large": f"{prose * 20}\n### Career Milestones Plan\n```json\n{large}\n```\n{prose * 20}\n```python\nprint('x')\n```",
+        "adversarial": ("```json\n{ \"a\": [ {\n" + "some { text " * 5) * 400 + "\nno closing fence",
+    }
+
+
+COMPARISONS = [
+    ("onboarding/career_coach", old_onboarding, new_first, ("typical", "large", "adversarial")),
+    ("master", old_pattern(FENCE_NEWLINES), new_first, ("typical", "large", "adversarial")),
+    ("chainlit heading", old_pattern(HEADED_FENCE), new_headed(), ("typical", "large", "adversarial")),
+    ("skill_gap", old_pattern(SKILL_GAP_FENCE), new_headed("Skill Gap Analysis"), ("skill_gap", "adversarial")),
+]
+
+
+def timed(fn, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(text)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    cases = make_cases()
+    print(f"{'extractor':<26}{'case':<13}{'KiB':>8}{'old ms':>10}{'new ms':>10}{'new MB/s':>10}{'speedup':>9}  agree")
+    for name, old, new, case_names in COMPARISONS:
+        for case in case_names:
+            text = cases[case]
+            old_s, old_result = timed(old, text, args.repeat)
+            new_s, new_result = timed(new, text, args.repeat)
+            agree = "yes" if old_result is None or old_result == new_result else "NO"
+            print(f"{name:<26}{case:<13}{len(text) / 1024:>8.1f}{old_s * 1000:>10.3f}{new_s * 1000:>10.3f}"
+                  f"{len(text) / new_s / 1e6:>10.1f}{old_s / new_s:>8.1f}x  {agree}")
+
+
+if __name__ == "__main__":
+    main()
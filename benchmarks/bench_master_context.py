@@ -0,0 +1,134 @@
+"""
+Prompt tokens the Master agent is sent per routing turn on a scripted conversation.
+
+    rebuilt   the full current_context rebuilt every turn, with the complete profile
+              and milestone objects (what MASTER_AI_AGENT_INSTRUCTIONS describes)
+    snapshot  the materialized ContextSnapshot, sent in full every turn
+    delta     ContextSnapshot.encode_for_master: full once, then only what changed
+
+Also compares the Career Coach hand-off message that chainlit.py sends on onboarding
+completion (profile pasted again vs referenced). The local router is bypassed so
+every turn reaches the Master LLM.
+
+    python benchmarks/bench_master_context.py --turns 20
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import FakeAsyncOpenAI, isolate_environment
+
+isolate_environment()
+
+from assistant_registry import provision_assistants
+from context_snapshot import ContextSnapshot
+import helpers
+from helpers import acreate_thread, count_tokens
+from prompts import CAREER_COACH_HANDOFF_MESSAGE
+from memory import MemoryManager
+from response_cache import ResponseCache
+from session import Session
+from thread_history import ThreadHistoryCache
+from Agents import master_agent
+from Agents.master_agent import MasterAIAgent
+from scripted_conversation import PROFILE, script, script_responder
+
+
+class RebuiltContext(ContextSnapshot):
+    """Every turn re-serializes the whole context with the full stored objects."""
+
+    def __init__(self):
+        super().__init__()
+        self.profile = None
+        self.plan = None
+
+    def update_profile(self, profile):
+        super().update_profile(profile)
+        self.profile = profile
+
+    def update_milestones(self, data):
+        super().update_milestones(data)
+        if isinstance(data.get("milestones"), list):
+            self.plan = json.loads(json.dumps(data["milestones"]))
+        elif isinstance(data.get("milestone"), dict) and self.plan:
+            self.plan = [data["milestone"] if m.get("id") == data["milestone"].get("id") else m for m in self.plan]
+
+    def encode_for_master(self):
+        context = dict(self.fields, current_milestones=self.plan, user_onboarding_data=self.profile)
+        return json.dumps(context, indent=2), None
+
+    def mark_delivered(self, delivery):
+        pass
+
+
+class FullSnapshot(ContextSnapshot):
+    def encode_for_master(self):
+        self._sent_once = False  # never send a delta
+        return super().encode_for_master()
+
+
+async def run(context_cls, turns, client):
+    conversation = script(turns)
+    client.responder = script_responder(conversation)
+    master = MasterAIAgent()
+    for agent in [master, *master.agents.values()]:
+        agent.OPENAI_CLIENT = client
+    # No compaction: it would move the session to new threads mid-measurement
+    master_agent.MEMORY = MemoryManager(
+        budgets={"free": 10 ** 9, "premium": 10 ** 9}, history=ThreadHistoryCache(OPENAI_CLIENT=client), OPENAI_CLIENT=client
+    )
+    master.router.route = lambda *args, **kwargs: None  # every turn goes to the Master LLM
+    master_agent.RESPONSE_CACHE = ResponseCache()  # no decisions cached from an earlier run
+
+    session = Session(thread_id=await acreate_thread(client))
+    session.context = context_cls()
+    per_turn = []
+    for message, expected_agent in conversation:
+        before = len(client._threads[session.thread_id])
+        with contextlib.redirect_stdout(io.StringIO()):  # the Master logs every routing decision
+            result = await master.chat(session, message)
+        assert result["agent_type"] == expected_agent, (message, result)
+        sent = [
+            m.content[0].text.value for m in client._threads[session.thread_id][before:]
+            if m.role == "user" and m.content[0].text.value.startswith("User's Latest Message")
+        ]
+        per_turn.append(sum(count_tokens(text) for text in sent))
+    return per_turn
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+
+    client = FakeAsyncOpenAI(run_latency=0.0)
+    await provision_assistants(OPENAI_CLIENT=client)
+
+    results = {}
+    for name, context_cls in (("rebuilt", RebuiltContext), ("snapshot", FullSnapshot), ("delta", ContextSnapshot)):
+        results[name] = await run(context_cls, args.turns, client)
+
+    tokenizer = "tiktoken" if helpers._TOKEN_ENCODING else "estimated, ~4 chars/token"
+    print(f"Master prompt tokens per turn ({tokenizer})")
+    print(f"{'turn':>4}  {'agent':<26}" + "".join(f"{name:>10}" for name in results))
+    for index, (message, agent) in enumerate(script(args.turns)):
+        print(f"{index + 1:>4}  {agent:<26}" + "".join(f"{results[name][index]:>10}" for name in results))
+    print(f"{'total':>4}  {'':<26}" + "".join(f"{sum(values):>10}" for values in results.values()))
+    print(f"{'mean':>4}  {'':<26}" + "".join(f"{sum(values) / len(values):>10.1f}" for values in results.values()))
+
+    pasted = (
+        f"User has completed onboarding. Their data is: {json.dumps(PROFILE)}. "
+        "Please suggest 3 career paths based on this data, as per your instructions."
+    )
+    print(f"\nCareer Coach hand-off: pasted profile {count_tokens(pasted)} tokens, "
+          f"referenced {count_tokens(CAREER_COACH_HANDOFF_MESSAGE)} tokens")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
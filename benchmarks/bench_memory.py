@@ -0,0 +1,130 @@
+"""
+Thread tokens and turn latency versus turn count on a long scripted conversation.
+
+    unbounded  no compaction: every run re-reads the whole thread
+    free       memory.MemoryManager with the free tier budget
+    premium    memory.MemoryManager with the premium tier budget
+
+Tokens are counted on the session's thread when the turn starts, i.e. the prompt
+each of that turn's runs re-reads. The fake server adds --prefill-ms per 1000
+characters on the thread to every run, so latency follows prompt size. The local
+router is bypassed so every turn reaches the Master LLM.
+
+    python benchmarks/bench_memory.py --turns 150 --every 10 --csv memory.csv
+"""
+import argparse
+import asyncio
+import contextlib
+import csv
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import FakeAsyncOpenAI, isolate_environment
+
+isolate_environment()
+
+from assistant_registry import provision_assistants
+import helpers
+from helpers import acreate_thread, count_tokens
+from memory import TIER_TOKEN_BUDGETS, MemoryManager
+from thread_reaper import THREAD_REAPER
+from response_cache import ResponseCache
+from session import Session
+from thread_history import ThreadHistoryCache
+from Agents import master_agent
+from Agents.master_agent import MasterAIAgent
+from scripted_conversation import script, script_responder
+
+VARIANTS = {
+    "unbounded": ("premium", {"free": 10 ** 9, "premium": 10 ** 9}),
+    "free": ("free", TIER_TOKEN_BUDGETS),
+    "premium": ("premium", TIER_TOKEN_BUDGETS),
+}
+
+
+async def run(tier, budgets, turns, client):
+    conversation = script(turns)
+    client.responder = script_responder(conversation)
+    master = MasterAIAgent()
+    for agent in [master, *master.agents.values()]:
+        agent.OPENAI_CLIENT = client
+    master.router.route = lambda *args, **kwargs: None  # every turn goes to the Master LLM
+    master_agent.RESPONSE_CACHE = ResponseCache()
+    manager = MemoryManager(budgets=budgets, history=ThreadHistoryCache(OPENAI_CLIENT=client), OPENAI_CLIENT=client)
+    master_agent.MEMORY = manager
+
+    session = Session(thread_id=await acreate_thread(client), tier=tier)
+    tokens, latencies = [], []
+    for message, expected_agent in conversation:
+        began = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # the Master logs every routing decision
+            await manager.prepare(session)  # what master.chat does first, measured here
+            tokens.append(sum(count_tokens(m.content[0].text.value) for m in client._threads[session.thread_id]))
+            result = await master.chat(session, message)
+        latencies.append(time.perf_counter() - began)
+        assert result["agent_type"] == expected_agent, (message, result)
+    await THREAD_REAPER.close()  # the replaced threads are deleted in the background
+    return tokens, latencies, manager.compactions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=150)
+    parser.add_argument("--every", type=int, default=10, help="print one row per this many turns")
+    parser.add_argument("--run-latency", type=float, default=0.005)
+    parser.add_argument("--prefill-ms", type=float, default=0.5, help="run latency per 1000 thread characters")
+    parser.add_argument("--csv", help="write per-turn tokens and latency for plotting")
+    args = parser.parse_args()
+
+    client = FakeAsyncOpenAI(run_latency=args.run_latency, prefill_latency_per_kchar=args.prefill_ms / 1000)
+    await provision_assistants(OPENAI_CLIENT=client)
+
+    results = {}
+    for name, (tier, budgets) in VARIANTS.items():
+        results[name] = await run(tier, budgets, args.turns, client)
+
+    tokenizer = "tiktoken" if helpers._TOKEN_ENCODING else "estimated, ~4 chars/token"
+    print(f"Thread tokens at turn start ({tokenizer}) and turn latency in ms; "
+          f"budgets free {TIER_TOKEN_BUDGETS['free']}, premium {TIER_TOKEN_BUDGETS['premium']}")
+    print(f"{'turn':>5}" + "".join(f"{name + ' tok':>16}{'ms':>8}" for name in results))
+    for index in range(args.every - 1, args.turns, args.every):
+        print(f"{index + 1:>5}" + "".join(
+            f"{tokens[index]:>16}{latencies[index] * 1000:>8.1f}" for tokens, latencies, _ in results.values()
+        ))
+    print(f"{'max':>5}" + "".join(
+        f"{max(tokens):>16}{max(latencies) * 1000:>8.1f}" for tokens, latencies, _ in results.values()
+    ))
+    last = slice(-args.every, None)
+    print(f"{'p50*':>5}" + "".join(
+        f"{statistics.median(tokens[last]):>16.0f}{statistics.median(latencies[last]) * 1000:>8.1f}"
+        for tokens, latencies, _ in results.values()
+    ))
+    print(f"* median over the last {args.every} turns; compactions: "
+          + ", ".join(f"{name} {compactions}" for name, (_, _, compactions) in results.items()))
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["turn"] + [f"{name}_{column}" for name in results for column in ("tokens", "ms")])
+            for index in range(args.turns):
+                writer.writerow([index + 1] + [
+                    value for tokens, latencies, _ in results.values()
+                    for value in (tokens[index], round(latencies[index] * 1000, 2))
+                ])
+
+    # Bounded variants stay near their budget; one turn may add a few replies on top
+    for name in ("free", "premium"):
+        tokens, _, _ = results[name]
+        budget = TIER_TOKEN_BUDGETS[VARIANTS[name][0]]
+        if max(tokens) > budget * 2:
+            print(f"{name}: thread grew to {max(tokens)} tokens, over twice its budget")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
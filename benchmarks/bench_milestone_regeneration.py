@@ -0,0 +1,146 @@
+"""
+Cost of regenerating one milestone, the most frequent plan edit.
+
+    full   the regeneration request carries the complete plan JSON (what the prompt
+           used to ask for) and the whole plan is saved again after every edit
+    patch  MilestonePlan.regeneration_request: the target milestone plus its
+           neighbours' outline; the edit is applied in place and appended to the
+           user store's edit log (UserStore.append_milestone_edit)
+
+Reports prompt tokens per request, bytes written and save / read latency per edit,
+and checks both stores end with the same plan.
+
+    python benchmarks/bench_milestone_regeneration.py --sizes 5 7 12 --edits 200
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import isolate_environment
+
+isolate_environment()
+
+import helpers
+from helpers import count_tokens
+from milestone_plan import MilestonePlan
+from user_store import UserStore
+
+REQUEST = "Can you regenerate milestone {mid} with more focus on MLOps?"
+
+
+def milestone(number, focus="core machine learning engineering"):
+    return {
+        "id": f"M{number}",
+        "title": f"Milestone {number}: deepen {focus}",
+        "description": f"Build depth in {focus} through a course, a project and a short write-up.",
+        "sub_steps": [
+            f"Finish a structured course on {focus}",
+            "Ship a small portfolio project and document it",
+            "Share a write-up and ask a mentor for feedback",
+        ],
+        "estimated_time_weeks": 4,
+        "status": "pending",
+    }
+
+
+def initial_plan(size):
+    return {
+        "type": "initial_generation",
+        "career_path": "Machine Learning Engineer",
+        "milestones": [milestone(n) for n in range(1, size + 1)],
+    }
+
+
+class RewriteStore(UserStore):
+    """The plan row rewritten whole on every save, as before the edit log."""
+
+    def save_milestones(self, user_id, milestones):
+        with self._connection() as conn:
+            self._checkpoint(conn, user_id, milestones)
+
+
+def run(size, edits, directory):
+    rng = random.Random(size)
+    plan = MilestonePlan.from_data(initial_plan(size))
+    full_store = RewriteStore(os.path.join(directory, f"full-{size}.db"))
+    patch_store = UserStore(os.path.join(directory, f"patch-{size}.db"))
+    full_store.save_milestones("user", plan.to_data())
+    patch_store.save_milestones("user", plan.to_data())
+
+    tokens = {"full": [], "patch": []}
+    written = {"full": 0, "patch": 0}
+    saves = {"full": [], "patch": []}
+    for edit in range(edits):
+        mid = f"M{rng.randint(1, size)}"
+        request = REQUEST.format(mid=mid)
+        tokens["full"].append(count_tokens(
+            f"{request}\n\nCurrent milestones:\n{json.dumps(plan.to_data(), indent=4)}"
+        ))
+        assert plan.find_target(request) == mid
+        tokens["patch"].append(count_tokens(plan.regeneration_request(mid, request)))
+
+        regenerated = {"type": "milestone_regeneration", "milestone": milestone(int(mid[1:]), f"MLOps, revision {edit}")}
+        plan.apply(regenerated)
+
+        began = time.perf_counter()
+        full_store.save_milestones("user", plan.to_data())
+        saves["full"].append(time.perf_counter() - began)
+        written["full"] += len(json.dumps(plan.to_data(), ensure_ascii=False))
+
+        began = time.perf_counter()
+        patch_store.append_milestone_edit("user", regenerated)
+        saves["patch"].append(time.perf_counter() - began)
+        written["patch"] += len(json.dumps(regenerated, ensure_ascii=False))
+
+    reads = {}
+    for name, store in (("full", full_store), ("patch", patch_store)):
+        samples = []
+        for _ in range(200):
+            began = time.perf_counter()
+            store.get_milestones("user")
+            samples.append(time.perf_counter() - began)
+        reads[name] = samples
+
+    same = full_store.get_milestones("user") == patch_store.get_milestones("user") == plan.to_data()
+    full_store.close()
+    patch_store.close()
+    return tokens, written, saves, reads, same
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 7, 12], help="milestones per plan")
+    parser.add_argument("--edits", type=int, default=200)
+    args = parser.parse_args()
+
+    directory = os.path.dirname(os.environ["USER_STORE_PATH"])
+    tokenizer = "tiktoken" if helpers._TOKEN_ENCODING else "estimated, ~4 chars/token"
+    print(f"{args.edits} regenerations of a random milestone per plan size (tokens {tokenizer})")
+    print(f"{'size':>4}  {'mode':<6}{'prompt tok':>11}{'bytes/edit':>12}{'save p50 ms':>13}{'read p50 ms':>13}")
+    all_same = True
+    for size in args.sizes:
+        try:
+            tokens, written, saves, reads, same = run(size, args.edits, directory)
+        except sqlite3.Error as e:
+            print(f"size {size}: store error {e}")
+            sys.exit(1)
+        all_same &= same
+        for name in ("full", "patch"):
+            print(
+                f"{size:>4}  {name:<6}{statistics.mean(tokens[name]):>11.0f}{written[name] / args.edits:>12.0f}"
+                f"{statistics.median(saves[name]) * 1000:>13.3f}{statistics.median(reads[name]) * 1000:>13.3f}"
+            )
+    print("final plans identical" if all_same else "FINAL PLANS DIFFER")
+    if not all_same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
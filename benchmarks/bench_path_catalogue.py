@@ -0,0 +1,153 @@
+"""
+Query latency of the career-path vector index (path_catalogue.py).
+
+First the shipped catalogue (career_paths.jsonl) is built into a scratch directory
+and timed end to end: build, load, and one profile's shortlist (embedding plus
+search), with the size of the note it adds to a path-suggestion request.
+
+Then synthetic catalogues of each --sizes entry count are written as memory-mapped
+.npy matrices: variants of the shipped paths ("Senior Data Engineer, healthcare")
+embedded with the same vectorizer, repeated with a little noise beyond the first
+10k rows. Batches of profile queries are searched against each, after one warm-up
+pass (the matrix then sits in the page cache), and the top-k scores are checked against
+an exact full sort on the smallest catalogue.
+
+    python benchmarks/bench_path_catalogue.py --sizes 10000,1000000 --batches 1,16,256
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from helpers import count_tokens
+from path_catalogue import (
+    PATH_CATALOGUE_SOURCE, PATH_SHORTLIST_SIZE, PATH_VECTOR_DIM, PathCatalogue, embed, path_text, profile_queries,
+)
+from prompts import PATH_SHORTLIST_NOTE
+
+SENIORITY = ["Junior", "Senior", "Lead", "Principal", "Associate", "Staff", ""]
+DOMAINS = ["healthcare", "finance", "retail", "public sector", "gaming", "energy", "education", "logistics",
+           "media", "biotech", "telecoms", "insurance", "travel", "automotive", "non-profit"]
+GOALS = ["Become a {title} within {years} years.", "I enjoy {skill} and {skill2} and want to grow in {domain}.",
+         "Move into {domain} as a {title}, focusing on {skill}."]
+# Rows embedded for the synthetic catalogues; larger sizes repeat them with noise
+BASE_ROWS = 10000
+
+
+def load_entries() -> list:
+    with open(PATH_CATALOGUE_SOURCE, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def synthetic_base(entries: list, count: int, dim: int, rng: random.Random):
+    texts = []
+    for _ in range(count):
+        entry = rng.choice(entries)
+        title = f"{rng.choice(SENIORITY)} {entry['title']}, {rng.choice(DOMAINS)}".strip()
+        skills = rng.sample(entry["skills"], max(1, len(entry["skills"]) - 1))
+        texts.append(path_text({"title": title, "description": entry["description"], "skills": skills}))
+    return embed(texts, dim)
+
+
+def write_catalogue(path: str, base, size: int, rng: np.random.Generator, chunk: int = 100000):
+    """(size, dim) float32 .npy: the base rows, then base rows with noise, written chunk by chunk."""
+    matrix = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(size, base.shape[1]))
+    for start in range(0, size, chunk):
+        rows = min(chunk, size - start)
+        if start + rows <= len(base):
+            block = base[start:start + rows]
+        else:
+            block = base[rng.integers(0, len(base), rows)] + rng.normal(0, 0.02, (rows, base.shape[1])).astype(np.float32)
+            block /= np.linalg.norm(block, axis=1, keepdims=True)
+        matrix[start:start + rows] = block
+    matrix.flush()
+    del matrix
+
+
+def make_profiles(entries: list, count: int, rng: random.Random) -> list:
+    profiles = []
+    for _ in range(count):
+        entry = rng.choice(entries)
+        skill, skill2 = rng.sample(entry["skills"], 2)
+        goal = rng.choice(GOALS).format(title=entry["title"].lower(), years=rng.randint(1, 5), skill=skill,
+                                        skill2=skill2, domain=rng.choice(DOMAINS))
+        profiles.append({"career_goals": goal, "skills_to_improve": ", ".join(rng.sample(entry["skills"], 2)),
+                         "roles_to_avoid": rng.choice(["sales", "management", "night shifts", "travel"])})
+    return profiles
+
+
+def time_ms(function, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - began)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,1000000", help="comma-separated catalogue sizes")
+    parser.add_argument("--batches", default="1,16,256", help="comma-separated query batch sizes")
+    parser.add_argument("--k", type=int, default=PATH_SHORTLIST_SIZE)
+    parser.add_argument("--dim", type=int, default=PATH_VECTOR_DIM)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    entries = load_entries()
+    scratch = tempfile.mkdtemp(prefix="bluetide-paths-")
+    try:
+        path = os.path.join(scratch, "path_catalogue.npy")
+        build_ms = time_ms(lambda: PathCatalogue.build(PATH_CATALOGUE_SOURCE, path, args.dim), 1)
+        load_ms = time_ms(lambda: PathCatalogue.load(path), args.repeat)
+        catalogue = PathCatalogue.load(path)
+        profiles = make_profiles(entries, 200, rng)
+        shortlist_ms = statistics.median(
+            time_ms(lambda profile=profile: catalogue.shortlist([profile], args.k), 1) for profile in profiles
+        )
+        same = all(catalogue.shortlist([profile], args.k) == catalogue.shortlist([profile], args.k) for profile in profiles)
+        note = PATH_SHORTLIST_NOTE.format(paths="\n".join(
+            f"- {path['title']}: {path['description']}" for path in catalogue.shortlist(profiles[:1], args.k)[0]
+        ))
+        print(f"shipped catalogue: {len(entries)} paths, {args.dim} dims; build {build_ms:.1f} ms, "
+              f"load {load_ms:.2f} ms, one profile's shortlist {shortlist_ms:.2f} ms; "
+              f"{'same shortlist on every call' if same else 'SHORTLISTS DIFFER'}; "
+              f"note adds {count_tokens(note)} tokens for {args.k} paths")
+
+        sizes = [int(value) for value in args.sizes.split(",")]
+        batches = [int(value) for value in args.batches.split(",")]
+        base = synthetic_base(entries, min(BASE_ROWS, max(sizes)), args.dim, rng)
+        queries = profile_queries(make_profiles(entries, max(batches), rng), args.dim)
+        print(f"\n{'entries':>9}{'MB':>7}{'batch':>7}{'ms/batch':>10}{'us/query':>10}")
+        for size in sizes:
+            matrix_path = os.path.join(scratch, f"synthetic-{size}.npy")
+            write_catalogue(matrix_path, base, size, np.random.default_rng(args.seed))
+            synthetic = PathCatalogue(np.load(matrix_path, mmap_mode="r"), entries=None)
+            if size == min(sizes):
+                _, scores = synthetic.search(queries, args.k)
+                exact = -np.sort(-(queries @ np.asarray(synthetic.matrix).T), axis=1)[:, :args.k]
+                matches = np.allclose(scores, exact, atol=1e-5)  # scores, as duplicate rows tie
+            synthetic.search(queries, args.k)  # warm-up: pages the matrix in
+            for batch in batches:
+                ms = time_ms(lambda: synthetic.search(queries[:batch], args.k), args.repeat)
+                print(f"{size:>9}{os.path.getsize(matrix_path) / 1e6:>7.0f}{batch:>7}{ms:>10.2f}{ms * 1000 / batch:>10.1f}")
+            del synthetic
+            os.remove(matrix_path)
+        print(f"\ntop-{args.k} on {min(sizes)} entries {'matches' if matches else 'DIFFERS FROM'} an exact full sort (scores)")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Per-run latency and API request count for the ways call_openAI can wait on a run.
+
+    legacy  fixed one-second polling, then a full-thread messages.list (the old helper)
+    poll    adaptive backoff polling, then a messages.list filtered to the run
+    stream  server-sent run events, no polling and no extra list call
+
+Server-side run durations are drawn from a log-normal distribution around a short
+routing answer, so the difference between modes is pure client-side overhead.
+
+    python benchmarks/bench_run_completion.py --runs 40 --median-latency 0.6
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import FakeAsyncOpenAI, isolate_environment
+
+isolate_environment()
+
+from helpers import acall_openAI, acreate_thread
+
+
+async def legacy_call_openAI(thread_id, assistant_id, user_input, instructions, OPENAI_CLIENT):
+    # Verbatim behaviour of the helper before adaptive polling and streaming
+    await OPENAI_CLIENT.beta.threads.messages.create(thread_id=thread_id, role="user", content=user_input)
+    run = await OPENAI_CLIENT.beta.threads.runs.create(
+        thread_id=thread_id, assistant_id=assistant_id, instructions=instructions
+    )
+    while True:
+        run_status = await OPENAI_CLIENT.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+        if run_status.status == "completed":
+            break
+        await asyncio.sleep(1)
+    messages = await OPENAI_CLIENT.beta.threads.messages.list(thread_id=thread_id)
+    return messages.data[0].content[0].text.value
+
+
+async def measure(mode, runs, sample_latency):
+    client = FakeAsyncOpenAI(run_latency=sample_latency)
+    thread_id = await acreate_thread(client)
+    latencies, requests = [], []
+    for i in range(runs):
+        before = client.request_count
+        start = time.perf_counter()
+        if mode == "legacy":
+            await legacy_call_openAI(thread_id, "asst_bench", f"turn {i}", None, client)
+        else:
+            await acall_openAI(thread_id, "asst_bench", f"turn {i}", None, client, run_mode=mode)
+        latencies.append(time.perf_counter() - start)
+        requests.append(client.request_count - before)
+    return latencies, requests
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=40)
+    parser.add_argument("--median-latency", type=float, default=0.6, help="median server-side run time in seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8}{'p50 (s)':>10}{'mean (s)':>10}{'req/run':>10}")
+    for mode in ("legacy", "poll", "stream"):
+        rng = random.Random(args.seed)  # same run durations for every mode
+        latencies, requests = await measure(
+            mode, args.runs, lambda: rng.lognormvariate(0, 0.5) * args.median_latency
+        )
+        print(f"{mode:<8}{statistics.median(latencies):>10.3f}{statistics.mean(latencies):>10.3f}"
+              f"{statistics.mean(requests):>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
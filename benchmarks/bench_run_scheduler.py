@@ -0,0 +1,100 @@
+"""
+Concurrent calls on one thread, with and without run_scheduler.RUN_SCHEDULER.
+
+The fake server rejects a message or run on a thread that has an active run, as
+the API does.
+
+    direct     N calls at once, bypassing the scheduler (what acall_openAI used to do)
+    scheduled  N calls at once through acall_openAI: queued, one run at a time
+    coalesced  one user message, then N more sent while its reply is being written,
+               through acall_openAI(coalesce=True): the queued ones share one run
+    threads    T threads with N calls each: queues are per thread, so the wall-clock
+               is that of one thread, not of all the calls in a row
+
+    python benchmarks/bench_run_scheduler.py --calls 5 --threads 50 --run-latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import FakeAsyncOpenAI, isolate_environment
+
+isolate_environment()
+
+import helpers
+from helpers import acreate_thread, acall_openAI
+from run_scheduler import RunCoalesced, RunScheduler
+
+
+async def direct(client, calls):
+    thread_id = await acreate_thread(client)
+    results = await asyncio.gather(*(
+        helpers._arun(thread_id, "asst_fake", f"message {n}", None, client, "stream", None) for n in range(calls)
+    ), return_exceptions=True)
+    return sum(not isinstance(r, Exception) for r in results), 0
+
+
+async def scheduled(client, calls):
+    thread_id = await acreate_thread(client)
+    results = await asyncio.gather(*(
+        acall_openAI(thread_id, "asst_fake", f"message {n}", OPENAI_CLIENT=client) for n in range(calls)
+    ), return_exceptions=True)
+    return sum(not isinstance(r, Exception) for r in results), 0
+
+
+async def coalesced(client, calls):
+    thread_id = await acreate_thread(client)
+    first = asyncio.create_task(acall_openAI(thread_id, "asst_fake", "message 0", OPENAI_CLIENT=client, coalesce=True))
+    await asyncio.sleep(0.01)  # the first run is under way when the others arrive
+    results = await asyncio.gather(first, *(
+        acall_openAI(thread_id, "asst_fake", f"message {n}", OPENAI_CLIENT=client, coalesce=True)
+        for n in range(1, calls)
+    ), return_exceptions=True)
+    answered = sum(isinstance(r, str) for r in results)
+    merged = sum(isinstance(r, RunCoalesced) for r in results)
+    return answered + merged, merged
+
+
+async def threads(client, calls, thread_count):
+    totals = await asyncio.gather(*(scheduled(client, calls) for _ in range(thread_count)))
+    return sum(ok for ok, _ in totals), 0
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5, help="concurrent calls per thread")
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--run-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    client = FakeAsyncOpenAI(run_latency=args.run_latency, request_latency=0.005)
+    scenarios = [
+        ("direct", lambda: direct(client, args.calls), args.calls),
+        ("scheduled", lambda: scheduled(client, args.calls), args.calls),
+        ("coalesced", lambda: coalesced(client, args.calls), args.calls),
+        ("threads", lambda: threads(client, args.calls, args.threads), args.calls * args.threads),
+    ]
+    print(f"{args.calls} concurrent calls per thread, {args.run_latency * 1000:.0f} ms per run")
+    print(f"{'scenario':<10}{'calls':>7}{'ok':>7}{'merged':>8}{'runs':>6}{'wall ms':>9}"
+          f"{'wait p50':>10}{'wait p95':>10}{'max depth':>11}")
+    failed = False
+    for name, scenario, total in scenarios:
+        helpers.RUN_SCHEDULER = scheduler = RunScheduler()  # fresh counters per scenario
+        runs_before = len(client._runs)
+        began = time.perf_counter()
+        ok, merged = await scenario()
+        wall = time.perf_counter() - began
+        stats = scheduler.stats()
+        print(f"{name:<10}{total:>7}{ok:>7}{merged:>8}{len(client._runs) - runs_before:>6}{wall * 1000:>9.0f}"
+              f"{stats['wait_p50_ms']:>10.0f}{stats['wait_p95_ms']:>10.0f}{stats['max_depth']:>11}")
+        failed |= name != "direct" and ok != total
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
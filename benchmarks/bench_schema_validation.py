@@ -0,0 +1,155 @@
+"""
+Agent output contracts (schemas.py) against the checks they replaced, over a corpus of
+recorded good and bad responses (benchmarks/data/structured_responses.jsonl).
+
+For every response it runs the agent's old extraction (find_json_block, plus the
+Master's setdefault patching) and the new one (the agent's Schema: parse, validate and
+repair in one pass). Reported per agent:
+
+    old failed     turns the old path turned into an error (no JSON, decode error, no action)
+    passed on      responses the old path accepted although they break the contract,
+                   so bad data reached the store or the next agent
+    new failed     turns rejected by the schema, with the offending paths in the message
+    repaired       responses accepted after filling defaults / converting numeric strings
+    parse us       mean time per response, old and new
+
+It also times the Master's decisions that arrive as structured outputs (the whole
+response is the JSON value, as with the strict response_format), which the schema
+path parses directly instead of scanning for a block.
+
+Each corpus entry is labelled valid, repairable or invalid; any response the new path
+classifies differently is listed.
+
+    python benchmarks/bench_schema_validation.py --repeat 2000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from structured_output import find_json_block
+from schemas import (
+    MASTER_DECISION, ONBOARDING_PROFILE, CAREER_COACH_PLAN, SKILL_GAP_ANALYSIS, milestone_schema,
+)
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "structured_responses.jsonl")
+AGENTS = ("master_ai_agent", "onboarding_agent", "milestone_generator", "career_coach", "skill_gap_analyzer")
+MASTER_KEYS = ["action", "agent_to_call", "message_for_agent", "direct_response_message", "transition_phase_to"]
+
+
+def old_extract(agent, text):
+    """The agent's pre-schema path: parsed data, or None when the turn failed."""
+    if agent == "master_ai_agent":
+        block = find_json_block(text, allow_unfenced=True)
+        if block is None or block.error or not isinstance(block.data, dict):
+            return None
+        if not all(key in block.data for key in MASTER_KEYS):
+            if "action" not in block.data:
+                return None
+            for key in MASTER_KEYS:
+                block.data.setdefault(key, None)
+        return block.data
+    if agent == "onboarding_agent":
+        block = find_json_block(text, allow_unfenced=True)
+    elif agent == "skill_gap_analyzer":
+        block = find_json_block(text, heading="Skill Gap Analysis")
+    else:
+        block = find_json_block(text)
+    return None if block is None or block.error else block.data
+
+
+def new_extract(agent, text):
+    """The agent's schema path: (data, errors); data is None when there is no JSON."""
+    if agent == "master_ai_agent":
+        block, errors = MASTER_DECISION.find(text, allow_unfenced=True)
+    elif agent == "onboarding_agent":
+        block, errors = ONBOARDING_PROFILE.find(text, allow_unfenced=True)
+    elif agent == "skill_gap_analyzer":
+        block, errors = SKILL_GAP_ANALYSIS.find(text, heading="Skill Gap Analysis")
+    else:
+        block = find_json_block(text)
+        if block is None or block.error:
+            return None, ["no JSON" if block is None else block.error]
+        schema = milestone_schema(block.data) if agent == "milestone_generator" else CAREER_COACH_PLAN
+        errors = schema.validate(block.data)
+    return (block.data if block is not None else None), errors
+
+
+def classify(agent, text) -> str:
+    """'valid', 'repairable' or 'invalid', as the new path sees the response."""
+    before = find_json_block(text, allow_unfenced=True)
+    data, errors = new_extract(agent, text)
+    if data is None or errors:
+        return "invalid"
+    return "valid" if before is not None and before.data == data else "repairable"
+
+
+def mean_us(function, agent, responses, repeat) -> float:
+    began = time.perf_counter()
+    for _ in range(repeat):
+        for text in responses:
+            function(agent, text)
+    return (time.perf_counter() - began) / (repeat * len(responses)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--corpus", default=CORPUS)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    print(f"{len(corpus)} recorded responses, {args.repeat} passes for timing")
+    print(f"{'agent':<22}{'responses':>10}{'old failed':>12}{'passed on':>11}{'new failed':>12}"
+          f"{'repaired':>10}{'old us':>9}{'new us':>9}")
+    mismatches = []
+    totals = dict.fromkeys(("responses", "old_failed", "passed_on", "new_failed", "repaired"), 0)
+    for agent in AGENTS:
+        rows = [row for row in corpus if row["agent"] == agent]
+        if not rows:
+            continue
+        counts = dict.fromkeys(totals, 0)
+        counts["responses"] = len(rows)
+        for row in rows:
+            verdict = classify(agent, row["response"])
+            if verdict != row["expect"]:
+                mismatches.append((agent, row["note"], row["expect"], verdict))
+            old = old_extract(agent, row["response"])
+            if old is None:
+                counts["old_failed"] += 1
+            elif verdict != "valid":
+                counts["passed_on"] += 1
+            counts["new_failed"] += verdict == "invalid"
+            counts["repaired"] += verdict == "repairable"
+        responses = [row["response"] for row in rows]
+        old_us = mean_us(old_extract, agent, responses, args.repeat)
+        new_us = mean_us(new_extract, agent, responses, args.repeat)
+        for key in totals:
+            totals[key] += counts[key]
+        print(f"{agent:<22}{counts['responses']:>10}{counts['old_failed']:>12}{counts['passed_on']:>11}"
+              f"{counts['new_failed']:>12}{counts['repaired']:>10}{old_us:>9.1f}{new_us:>9.1f}")
+    print(f"{'total':<22}{totals['responses']:>10}{totals['old_failed']:>12}{totals['passed_on']:>11}"
+          f"{totals['new_failed']:>12}{totals['repaired']:>10}")
+
+    structured = [row["response"] for row in corpus
+                  if row["agent"] == "master_ai_agent" and row["response"].lstrip().startswith("{")]
+    if structured:
+        print(f"\nmaster decisions as structured outputs ({len(structured)}): "
+              f"old {mean_us(old_extract, 'master_ai_agent', structured, args.repeat):.1f} us, "
+              f"new {mean_us(new_extract, 'master_ai_agent', structured, args.repeat):.1f} us")
+
+    old_bad = totals["old_failed"] + totals["passed_on"]
+    print(f"unusable turns (failed, or bad data passed on): old {old_bad}, new {totals['new_failed']}")
+    if mismatches:
+        print(f"{len(mismatches)} responses classified differently from their label:")
+        for agent, note, expected, verdict in mismatches:
+            print(f"  {agent}: {note} (labelled {expected}, got {verdict})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Per-session memory and connection-pool footprint, before and after shared clients.
+
+    per_agent   what on_chat_start used to do: a new OnboardingAgent and CareerCoach,
+                each holding its own openai client (and HTTP connection pool), per session
+    flyweight   shared agent singletons on the process-wide client, one Session per chat
+
+Each scenario runs in a fresh interpreter so RSS deltas are not polluted by the
+other. Every client owns a separate pool, so the pool count is also a lower bound on
+the TLS handshakes the sessions will perform once they start talking to the API.
+
+    python benchmarks/bench_session_footprint.py --sizes 1 100 1000
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import FakeAsyncOpenAI, isolate_environment
+
+isolate_environment()
+
+
+def rss_kib():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def count_clients():
+    import openai
+    return sum(isinstance(o, (openai.OpenAI, openai.AsyncOpenAI)) for o in gc.get_objects())
+
+
+def child(scenario, sessions):
+    import asyncio
+    import openai
+    from assistant_registry import provision_assistants
+    from helpers import get_async_client
+    from session import Session
+    from Agents.career_coach_agent import CareerCoach
+    from Agents.onboarding_agent import OnboardingAgent
+
+    asyncio.run(provision_assistants(OPENAI_CLIENT=FakeAsyncOpenAI()))
+    gc.collect()
+    baseline = rss_kib()
+    start = time.perf_counter()
+    keep = []
+    if scenario == "per_agent":
+        for i in range(sessions):
+            # Two agents per chat session, each with its own client, as before
+            keep.append((openai.AsyncOpenAI(), openai.AsyncOpenAI(), f"thread_{i}"))
+    else:
+        keep.append((OnboardingAgent(), CareerCoach()))
+        client = get_async_client()
+        for i in range(sessions):
+            keep.append(Session(thread_id=f"thread_{i}"))
+        assert all(agent.OPENAI_CLIENT is client for agent in keep[0])
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    print(json.dumps({
+        "rss_delta_kib": rss_kib() - baseline,
+        "clients": count_clients(),
+        "setup_s": elapsed,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--child", nargs=2, metavar=("SCENARIO", "SESSIONS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], int(args.child[1]))
+        return
+
+    print(f"{'scenario':<12}{'sessions':>10}{'RSS delta (MiB)':>18}{'KiB/session':>14}{'pools':>8}{'setup (s)':>12}")
+    for sessions in args.sizes:
+        for scenario in ("per_agent", "flyweight"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", scenario, str(sessions)],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip().splitlines()[-1]
+            result = json.loads(out)
+            print(f"{scenario:<12}{sessions:>10}{result['rss_delta_kib'] / 1024:>18.1f}"
+                  f"{result['rss_delta_kib'] / sessions:>14.1f}{result['clients']:>8}{result['setup_s']:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
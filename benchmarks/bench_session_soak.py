@@ -0,0 +1,201 @@
+"""
+Soak test of session churn through chainlit.py's handlers: conversations keep
+arriving, chat for a few turns, then either disconnect (on_chat_end, after which
+Chainlit drops its session dict) or leave their tab open and go idle. A share of the
+idle tabs come back after their session was evicted and send one more message.
+
+    --lifecycle on   session_lifecycle as shipped: idle sessions are evicted after
+                     --idle-ttl, ended ones at once, threads deleted by the reaper
+    --lifecycle off  nothing is reclaimed (the app before session_lifecycle)
+
+Every --report-every seconds it prints the sessions held in memory (Session objects
+alive), remote threads still existing on the fake API, cached thread histories and
+the traced Python heap. With the lifecycle on they level off; off, they grow with the
+number of conversations started. What the heap still gains with it on is Chainlit's
+own per-tab session objects for the tabs left open, and this script's task list.
+
+    python benchmarks/bench_session_soak.py --duration 60 --arrival-rate 20
+    python benchmarks/bench_session_soak.py --duration 60 --arrival-rate 20 --lifecycle off
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import importlib.util
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import FakeAsyncOpenAI, isolate_environment
+
+isolate_environment()
+
+import chainlit as cl
+from chainlit.context import init_http_context
+from chainlit.chat_context import chat_contexts
+from chainlit.user_session import user_sessions
+
+import helpers
+from session import Session
+from session_lifecycle import SessionLifecycle
+from thread_history import HISTORY_CACHE
+from thread_reaper import ThreadReaper
+from scripted_conversation import script, script_responder
+
+APP_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'chainlit.py'))
+
+
+class NoLifecycle:
+    """Stands in for SESSIONS in the off mode: sessions are tracked by nobody."""
+
+    def __init__(self, reaper):
+        self.reaper = reaper
+
+    def track(self, key, session, on_evict=None):
+        pass
+
+    def touch(self, key):
+        pass
+
+    async def end(self, key):
+        pass
+
+    async def restore(self, key, session):
+        return False
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+    def stats(self):
+        return {}
+
+
+def load_app():
+    # By path: from the repo root `import chainlit` finds the app, not the package
+    spec = importlib.util.spec_from_file_location("bluetide_app", APP_PATH)
+    app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app)
+    return app
+
+
+def sample(fake, began, started) -> dict:
+    return {
+        "t": time.perf_counter() - began,
+        "started": started,
+        "sessions": sum(1 for o in gc.get_objects() if type(o) is Session),  # type(): lazy proxies resolve on isinstance
+        "threads": len(fake._threads),
+        "histories": len(HISTORY_CACHE._threads),
+        "heap_mb": tracemalloc.get_traced_memory()[0] / 2**20,
+    }
+
+
+def print_row(row):
+    print(f"{row['t']:>7.0f}{row['started']:>10}{row['sessions']:>10}{row['threads']:>10}"
+          f"{row['histories']:>11}{row['heap_mb']:>10.1f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lifecycle", choices=["on", "off"], default="on")
+    parser.add_argument("--duration", type=float, default=60, help="seconds of arrivals")
+    parser.add_argument("--arrival-rate", type=float, default=20, help="new conversations per second")
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--think-time", type=float, default=0.2, help="mean seconds between messages")
+    parser.add_argument("--abandon", type=float, default=0.5, help="share of tabs left open instead of closed")
+    parser.add_argument("--return-rate", type=float, default=0.2, help="share of open tabs that come back later")
+    parser.add_argument("--idle-ttl", type=float, default=3.0)
+    parser.add_argument("--sweep-interval", type=float, default=0.5)
+    parser.add_argument("--delete-rate", type=float, default=100, help="thread deletions per second")
+    parser.add_argument("--run-latency", type=float, default=0.02)
+    parser.add_argument("--report-every", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    fake = FakeAsyncOpenAI(run_latency=args.run_latency)
+    helpers._SHARED_ASYNC_CLIENT = fake
+    conversation_script = script(args.turns)
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = load_app()
+        reaper = ThreadReaper(rate=args.delete_rate)
+        if args.lifecycle == "on":
+            app.SESSIONS = SessionLifecycle(idle_ttl=args.idle_ttl, sweep_interval=args.sweep_interval, reaper=reaper)
+        else:
+            app.SESSIONS = NoLifecycle(reaper)
+        await app.on_app_startup()
+    fake.responder = script_responder(conversation_script)
+    rng = random.Random(args.seed)
+    returned = []
+
+    async def conversation(index):
+        init_http_context(user=cl.User(identifier=f"soak-{index}", metadata={"tier": "free"}))
+        chat_id = cl.user_session.get("id")
+        await app.on_chat_start()
+        for message, _ in conversation_script:
+            await asyncio.sleep(rng.expovariate(1 / args.think_time))
+            await app.on_message(cl.Message(content=message))
+        if rng.random() < args.abandon:
+            if rng.random() < args.return_rate:  # back after the session was evicted
+                await asyncio.sleep(args.idle_ttl + 2 * args.sweep_interval)
+                await app.on_message(cl.Message(content="I'm back, where were we?"))
+                returned.append(index)
+            return  # the tab stays open: Chainlit keeps its session dict
+        await app.on_chat_end()
+        user_sessions.pop(chat_id, None)  # what Chainlit does once the socket is gone
+        chat_contexts.pop(chat_id, None)
+
+    print(f"lifecycle {args.lifecycle}: {args.arrival_rate:g} conversations/s for {args.duration:g} s, "
+          f"{args.turns} turns, {args.abandon:.0%} left open, idle TTL {args.idle_ttl:g} s")
+    print(f"{'t (s)':>7}{'started':>10}{'sessions':>10}{'threads':>10}{'histories':>11}{'heap MB':>10}")
+    began = time.perf_counter()
+    tasks, rows = [], []
+    next_report = args.report_every
+    with contextlib.redirect_stdout(io.StringIO()) as log:
+        while time.perf_counter() - began < args.duration:
+            tasks.append(asyncio.create_task(conversation(len(tasks))))
+            await asyncio.sleep(rng.expovariate(args.arrival_rate))
+            if time.perf_counter() - began >= next_report:
+                next_report += args.report_every
+                rows.append(sample(fake, began, len(tasks)))
+                with contextlib.redirect_stdout(sys.__stdout__):
+                    print_row(rows[-1])
+                log.seek(0)
+                log.truncate()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # Let the last idle sessions expire and the reaper catch up
+        await asyncio.sleep(args.idle_ttl + 2 * args.sweep_interval)
+        while reaper.pending():
+            await asyncio.sleep(0.1)
+        gc.collect()
+        settled = sample(fake, began, len(tasks))
+    print_row(settled)
+    print("(last row: after arrivals stopped and idle sessions expired)")
+
+    failures = [r for r in results if isinstance(r, Exception)]
+    print(f"\n{len(tasks)} conversations, {len(failures)} failed, {len(returned)} came back after eviction")
+    for failure in failures[:3]:
+        print(f"  {type(failure).__name__}: {failure}")
+    if args.lifecycle == "on":
+        print(f"lifecycle: {app.SESSIONS.stats()}")
+    if len(rows) >= 2:
+        half = rows[(len(rows) - 1) // 2]
+        per_s = lambda key: (rows[-1][key] - half[key]) / (rows[-1]["t"] - half["t"])
+        print(f"growth over the second half: {per_s('sessions'):+.1f} sessions/s, {per_s('threads'):+.1f} threads/s, "
+              f"{per_s('heap_mb') * 60:+.2f} MB/min")
+    with contextlib.redirect_stdout(io.StringIO()):
+        await app.on_app_shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
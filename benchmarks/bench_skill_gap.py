@@ -0,0 +1,178 @@
+"""
+Skill gap analysis computed from the skill taxonomy (skill_taxonomy.py) against the
+model working it out from scratch, over many profile / career path pairs.
+
+Each pair is a message naming a path (by name or alias), with a profile whose
+current_skills names a few skills the user has and skills_to_improve names others.
+Reported:
+
+    compute       time to scan the message and compute the gap, per pair (p50 / p99),
+                  and whether every pass gave the same result
+    prompt        instructions plus message sent to the model, old and new, in tokens
+    reply         the JSON the model has to write, old (the whole analysis) and new
+                  (descriptions and resources for the given gaps), in tokens
+    agent         SkillGapAnalyzerAgent.chat end to end against the in-process fake:
+                  precompute off, on, and on with enrich=False (no run at all)
+
+The fake's run latency does not depend on prompt or reply size, so the agent rows
+show the local overhead; the token columns are what a real run would save.
+
+    python benchmarks/bench_skill_gap.py --pairs 5000 --agent-pairs 50
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import FakeAsyncOpenAI, isolate_environment
+
+isolate_environment()
+
+import helpers
+from helpers import count_tokens
+from assistant_registry import provision_assistants
+from prompts import (
+    SKILL_GAP_ANALYZER_SYSTEM_PROMPT, SKILL_GAP_ANALYZER_INSTRUCTIONS, SKILL_GAP_ENRICH_INSTRUCTIONS,
+    SKILL_GAP_ENRICH_REQUEST,
+)
+from scripted_conversation import script_responder, _skill_gap, _fenced
+from session import Session
+from skill_taxonomy import SKILL_TAXONOMY_FILE, get_skill_taxonomy
+import Agents.skill_gap_analyzer_agent as skill_gap_analyzer_agent
+from Agents.skill_gap_analyzer_agent import SkillGapAnalyzerAgent
+
+
+def make_pairs(count: int, rng: random.Random) -> list:
+    """(message, profile) pairs over every path of the taxonomy, named by name or alias."""
+    with open(SKILL_TAXONOMY_FILE, encoding="utf-8") as f:
+        data = json.load(f)
+    paths = [[path["name"], *path["aliases"]] for path in data["career_paths"].values()]
+    skills = [[skill["name"], *skill["aliases"]] if skill.get("match_name", True) else skill["aliases"]
+              for skill in data["skills"].values()]
+    pairs = []
+    for _ in range(count):
+        known = [rng.choice(names) for names in rng.sample(skills, rng.randint(0, 6))]
+        wanted = [rng.choice(names) for names in rng.sample(skills, rng.randint(1, 3))]
+        message = f"Which skills am I missing to become a {rng.choice(rng.choice(paths))}?"
+        pairs.append((message, {"current_skills": ", ".join(known),
+                                "skills_to_improve": f"I want to get better at {' and '.join(wanted)}."}))
+    return pairs
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def old_prompt(message: str) -> str:
+    return f"{SKILL_GAP_ANALYZER_SYSTEM_PROMPT.strip()}\n\n{SKILL_GAP_ANALYZER_INSTRUCTIONS.strip()}\n{message}"
+
+
+def new_prompt(message: str, analysis: dict) -> str:
+    computed = {
+        "career_path_selected": analysis["career_path_selected"],
+        "user_current_skills": analysis["user_current_skills"],
+        "missing_skills": [gap["skill_name"] for gap in analysis["skill_gaps_identified"]],
+    }
+    request = SKILL_GAP_ENRICH_REQUEST.format(message=message, analysis=json.dumps(computed, ensure_ascii=False))
+    return f"{SKILL_GAP_ENRICH_INSTRUCTIONS.strip()}\n{request}"
+
+
+def replies(analysis: dict):
+    """The JSON a model writes for this analysis: the whole of it (old) or the enrichment (new)."""
+    gaps = [_skill_gap(gap["skill_name"]) for gap in analysis["skill_gaps_identified"]]
+    recommendation = "Start with the first skill listed."
+    old = dict(analysis, skill_gaps_identified=gaps, overall_recommendation=recommendation)
+    new = {"skill_gaps_identified": gaps, "overall_recommendation": recommendation}
+    return _fenced("Skill Gap Analysis", old), _fenced("Skill Gap Analysis", new)
+
+
+def bench_compute(pairs: list, repeat: int):
+    sessions = [Session(thread_id="bench", data={"user_onboarding_data": profile}) for _, profile in pairs]
+    timings, results, same = [], None, True
+    for _ in range(repeat):
+        current = []
+        for (message, _), session in zip(pairs, sessions):
+            began = time.perf_counter()
+            current.append(SkillGapAnalyzerAgent.precompute(session, message))
+            timings.append(time.perf_counter() - began)
+        same = same and (results is None or current == results)
+        results = current
+    return timings, results, same
+
+
+async def bench_agent(pairs: list, run_latency: float):
+    fake = FakeAsyncOpenAI(run_latency=run_latency, request_latency=0.005)
+    helpers._SHARED_ASYNC_CLIENT = fake
+    await provision_assistants(OPENAI_CLIENT=fake)
+    fake.responder = script_responder([])
+    agent = SkillGapAnalyzerAgent()
+    rows = []
+    for label, precompute, enrich in (("precompute off", False, True), ("precompute on", True, True),
+                                      ("precompute on, enrich=False", True, False)):
+        skill_gap_analyzer_agent.SKILL_GAP_PRECOMPUTE = precompute
+        latencies, ok = [], 0
+        for message, profile in pairs:
+            session = Session(thread_id=await helpers.acreate_thread(fake), data={"user_onboarding_data": profile})
+            began = time.perf_counter()
+            result = await agent.chat(session, message, enrich=enrich)
+            latencies.append(time.perf_counter() - began)
+            ok += result["status"] == "success"
+        rows.append((label, statistics.mean(latencies), ok))
+    skill_gap_analyzer_agent.SKILL_GAP_PRECOMPUTE = True
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the pairs for the compute timings")
+    parser.add_argument("--agent-pairs", type=int, default=50)
+    parser.add_argument("--run-latency", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    began = time.perf_counter()
+    taxonomy = get_skill_taxonomy()
+    load_ms = (time.perf_counter() - began) * 1000
+    pairs = make_pairs(args.pairs, rng)
+    print(f"taxonomy: {len(taxonomy.names)} skills, {len(taxonomy.path_names)} career paths, loaded in {load_ms:.1f} ms")
+
+    timings, results, same = bench_compute(pairs, args.repeat)
+    unknown = sum(result is None for result in results)
+    gaps = [len(result["skill_gaps_identified"]) for result in results if result]
+    print(f"\ncompute: {args.pairs} pairs x {args.repeat} passes, p50 {percentile(timings, 0.5) * 1e6:.1f} us, "
+          f"p99 {percentile(timings, 0.99) * 1e6:.1f} us; {statistics.mean(gaps):.1f} gaps per pair, "
+          f"{unknown} paths not found; {'identical results every pass' if same else 'RESULTS DIFFER'}")
+
+    prompts_old, prompts_new, replies_old, replies_new = [], [], [], []
+    for (message, _), analysis in zip(pairs, results):
+        if analysis is None:
+            continue
+        prompts_old.append(count_tokens(old_prompt(message)))
+        prompts_new.append(count_tokens(new_prompt(message, analysis)))
+        old, new = replies(analysis)
+        replies_old.append(count_tokens(old))
+        replies_new.append(count_tokens(new))
+    print(f"prompt tokens: old {statistics.mean(prompts_old):.0f}, new {statistics.mean(prompts_new):.0f}; "
+          f"reply tokens: old {statistics.mean(replies_old):.0f}, new {statistics.mean(replies_new):.0f}")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = asyncio.run(bench_agent(pairs[:args.agent_pairs], args.run_latency))
+    print(f"\nagent, {args.agent_pairs} pairs, runs ~{args.run_latency * 1000:.0f} ms:")
+    print(f"{'mode':<30}{'mean ms':>9}{'success':>9}")
+    for label, mean, ok in rows:
+        print(f"{label:<30}{mean * 1000:>9.1f}{ok:>9}")
+
+
+if __name__ == "__main__":
+    main()
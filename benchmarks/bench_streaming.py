@@ -0,0 +1,113 @@
+"""
+Time until the user sees something while a milestone plan is being generated.
+
+    blocking  chat() without callbacks: nothing renders until the whole reply is in
+    streamed  chat() with on_token / on_milestone, as chainlit.py wires it up
+
+Reports time to first token, time to first milestone card, time until every
+milestone is rendered and total time, against the fake server streaming deltas at a
+fixed rate after the first token.
+
+    python benchmarks/bench_streaming.py --runs 5 --first-token 0.4 --run-latency 4.0
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import FakeAsyncOpenAI, isolate_environment
+
+isolate_environment()
+
+from assistant_registry import provision_assistants
+from helpers import acreate_thread
+from session import Session
+from Agents.career_coach_agent import CareerCoach
+from Agents.milestone_generator import MilestoneGeneratorAgent
+
+MILESTONES = 6
+
+
+def plan_responder(thread_messages, assistant_id, instructions):
+    plan = {
+        "type": "initial_generation",
+        "career_path": "Data Scientist",
+        "milestones": [
+            {
+                "id": f"M{i}",
+                "title": f"Milestone {i}: build the next layer of data science skills",
+                "description": "Work through a focused set of courses and a small portfolio project.",
+                "sub_steps": [f"Complete course {i}.{n} and publish notes" for n in range(1, 4)],
+                "estimated_time_weeks": 4,
+                "status": "pending",
+            }
+            for i in range(1, MILESTONES + 1)
+        ],
+    }
+    return (
+        "Great choice! Here is a plan tailored to your profile.\n\n"
+        "### Career Milestones Plan\n```json\n" + json.dumps(plan, indent=2) + "\n```\n"
+        "Your career dashboard is being set up with these milestones."
+    )
+
+
+async def measure(agent, client, streamed):
+    session = Session(thread_id=await acreate_thread(client))
+    marks = {"first_token": None, "milestones": []}
+    began = time.perf_counter()
+
+    async def on_token(text):
+        if marks["first_token"] is None:
+            marks["first_token"] = time.perf_counter() - began
+
+    async def on_milestone(milestone):
+        marks["milestones"].append(time.perf_counter() - began)
+
+    callbacks = {"on_token": on_token, "on_milestone": on_milestone} if streamed else {}
+    if isinstance(agent, MilestoneGeneratorAgent):
+        callbacks["use_cache"] = False
+    result = await agent.chat(session, "I pick Data Scientist", **callbacks)
+    total = time.perf_counter() - began
+    assert result["status"] == "success", result
+
+    if not streamed:
+        # Without streaming everything appears at once, when chat() returns
+        return total, total, total, total
+    assert len(marks["milestones"]) == MILESTONES, marks
+    return marks["first_token"], marks["milestones"][0], marks["milestones"][-1], total
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--first-token", type=float, default=0.4)
+    parser.add_argument("--run-latency", type=float, default=4.0)
+    args = parser.parse_args()
+    # The agents may save files to the working directory; keep them out of the project
+    os.chdir(tempfile.mkdtemp(prefix="bluetide-streaming-"))
+
+    client = FakeAsyncOpenAI(
+        run_latency=args.run_latency, responder=plan_responder, first_token_latency=args.first_token
+    )
+    await provision_assistants(OPENAI_CLIENT=client)
+    agents = {"career_coach": CareerCoach(), "milestone_generator": MilestoneGeneratorAgent()}
+    for agent in agents.values():
+        agent.OPENAI_CLIENT = client
+
+    print(f"{'agent':<22}{'mode':<10}{'first token':>13}{'1st milestone':>15}{'all milestones':>16}{'total':>9}  (p50 ms)")
+    for name, agent in agents.items():
+        for streamed in (False, True):
+            samples = [await measure(agent, client, streamed) for _ in range(args.runs)]
+            columns = [statistics.median(column) * 1000 for column in zip(*samples)]
+            mode = "streamed" if streamed else "blocking"
+            print(f"{name:<22}{mode:<10}{columns[0]:>13.0f}{columns[1]:>15.0f}{columns[2]:>16.0f}{columns[3]:>9.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
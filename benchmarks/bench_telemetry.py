@@ -0,0 +1,149 @@
+"""
+Cost of the telemetry hooks, and what one turn records.
+
+    off      TRACING_ENABLED and METRICS_ENABLED unset: every hook is a flag check
+    metrics  Prometheus histograms and counters only
+    tracing  OpenTelemetry spans into an in-memory exporter (needs opentelemetry-sdk)
+    both     metrics and tracing
+
+Turns are scripted MasterAIAgent turns against a fake API with near-zero run
+latency, so the hooks' overhead is not hidden behind run time. Also prints the span
+tree of one turn and a few lines of the /metrics output.
+
+    python benchmarks/bench_telemetry.py --turns 300 --repeats 5
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import FakeAsyncOpenAI, isolate_environment
+
+isolate_environment()
+
+import telemetry
+from assistant_registry import provision_assistants
+from helpers import acreate_thread
+from memory import MemoryManager
+from response_cache import ResponseCache
+from session import Session
+from thread_history import ThreadHistoryCache
+from Agents import master_agent
+from Agents.master_agent import MasterAIAgent
+from scripted_conversation import script, script_responder
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+except ImportError:
+    TracerProvider = None
+
+MODES = {"off": (False, False), "metrics": (False, True), "tracing": (True, False), "both": (True, True)}
+
+
+async def conversation(client, turns):
+    conversation = script(turns)
+    client.responder = script_responder(conversation)
+    master = MasterAIAgent()
+    for agent in [master, *master.agents.values()]:
+        agent.OPENAI_CLIENT = client
+    master_agent.RESPONSE_CACHE = ResponseCache()
+    master_agent.MEMORY = MemoryManager(history=ThreadHistoryCache(OPENAI_CLIENT=client), OPENAI_CLIENT=client)
+    session = Session(thread_id=await acreate_thread(client), user_id="bench", tier="premium")
+    began = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for message, _ in conversation:
+            await master.chat(session, message)
+    return (time.perf_counter() - began) / turns
+
+
+def span_cost(enabled, calls=200_000):
+    """Seconds per span() over a loop entering a prebuilt no-op context."""
+    telemetry.configure(tracing=False, metrics=enabled)
+    bare = contextlib.nullcontext()
+    began = time.perf_counter()
+    for _ in range(calls):
+        with bare:
+            pass
+    loop = time.perf_counter() - began
+    began = time.perf_counter()
+    for _ in range(calls):
+        with telemetry.span("bench.step", thread_id="thread"):
+            pass
+    return (time.perf_counter() - began - loop) / calls
+
+
+def print_tree(spans):
+    by_parent = {}
+    for item in spans:
+        by_parent.setdefault(item.parent.span_id if item.parent else None, []).append(item)
+
+    def walk(parent, depth):
+        for item in sorted(by_parent.get(parent, []), key=lambda s: s.start_time):
+            ms = (item.end_time - item.start_time) / 1e6
+            print(f"  {'  ' * depth}{item.name:<28}{item.attributes.get('agent', ''):<28}{ms:>8.2f} ms")
+            walk(item.context.span_id, depth + 1)
+
+    walk(None, 0)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    exporter = None
+    if TracerProvider is not None:
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        trace.set_tracer_provider(provider)
+    modes = {name: flags for name, flags in MODES.items() if exporter or not flags[0]}
+
+    client = FakeAsyncOpenAI(run_latency=0.0005)
+    await provision_assistants(OPENAI_CLIENT=client)
+
+    print(f"{args.turns} scripted turns per run, median of {args.repeats} runs, runs ~0.5 ms")
+    print(f"{'mode':<10}{'ms/turn':>10}{'overhead':>10}")
+    results = {}
+    for repeat in range(args.repeats):
+        for name, (tracing, metrics) in modes.items():  # interleaved so drift hits every mode alike
+            telemetry.configure(tracing=tracing, metrics=metrics)
+            results.setdefault(name, []).append(await conversation(client, args.turns))
+            if exporter:
+                exporter.clear()
+    baseline = statistics.median(results["off"])
+    for name, samples in results.items():
+        per_turn = statistics.median(samples)
+        print(f"{name:<10}{per_turn * 1000:>10.3f}{(per_turn - baseline) * 1e6:>8.0f}us")
+
+    if exporter:
+        telemetry.configure(tracing=True, metrics=True)
+        await conversation(client, 6)
+        last_turn = [s for s in exporter.get_finished_spans() if s.attributes.get("agent") is not None]
+        roots = [s for s in last_turn if s.parent is None]
+        print("\nspans of one turn (skill gap analysis):")
+        print_tree([s for s in last_turn if s.context.trace_id == roots[-1].context.trace_id])
+    else:
+        print("\nopentelemetry-sdk not installed: tracing modes skipped")
+
+    print("\n/metrics excerpt:")
+    lines = telemetry.render_metrics().splitlines()
+    for line in [line for line in lines if line.startswith("bluetide_step_duration_seconds_count")][:12]:
+        print(f"  {line}")
+
+    print(f"\nspan() per call: off {span_cost(False) * 1e9:.0f} ns, metrics {span_cost(True) * 1e9:.0f} ns")
+    telemetry.configure(tracing=False, metrics=False)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""
+History loads on a long thread: API requests, latency and correctness per read.
+
+    legacy  one messages.list call, as get_all_messages_from_thread used to do
+            (silently stops at the first page)
+    full    aget_all_messages_from_thread: pages through the whole thread every read
+    cached  thread_history.ThreadHistoryCache: pages once, then fetches only the
+            messages added since the last read
+
+Each turn appends a user message and an assistant reply, then reads the history.
+
+    python benchmarks/bench_thread_history.py --messages 5000 --turns 20 --request-latency 0.02
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import FakeAsyncOpenAI, isolate_environment
+
+isolate_environment()
+
+from helpers import acreate_thread, aget_all_messages_from_thread, _format_text_messages
+from thread_history import ThreadHistoryCache
+
+
+async def legacy_read(client, thread_id):
+    page = await client.beta.threads.messages.list(thread_id=thread_id, order="asc")
+    return _format_text_messages(page.data)
+
+
+async def measure(name, read, client, thread_id, turns):
+    samples, requests, counts = [], [], []
+    for turn in range(turns):
+        await client.beta.threads.messages.create(thread_id=thread_id, role="user", content=f"{name} question {turn}")
+        await client.beta.threads.messages.create(thread_id=thread_id, role="assistant", content=f"{name} answer {turn}")
+        before = client.request_count
+        began = time.perf_counter()
+        messages = await read(client, thread_id)
+        samples.append(time.perf_counter() - began)
+        requests.append(client.request_count - before)
+        counts.append(len(messages))
+    # Ground truth straight from the fake server, at the time of the last read
+    complete = [m["id"] for m in messages] == [m.id for m in client._threads[thread_id]]
+    return samples, requests, counts, complete
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=5000, help="messages already on the thread")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--request-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    client = FakeAsyncOpenAI()
+    thread_id = await acreate_thread(client)
+    for n in range(args.messages):
+        role = "user" if n % 2 == 0 else "assistant"
+        await client.beta.threads.messages.create(thread_id=thread_id, role=role, content=f"message {n}")
+    client.request_latency = args.request_latency
+
+    cache = ThreadHistoryCache(OPENAI_CLIENT=client)
+    readers = {
+        "legacy": legacy_read,
+        "full": lambda client, thread_id: aget_all_messages_from_thread(thread_id, client),
+        "cached": lambda client, thread_id: cache.get_messages(thread_id),
+    }
+
+    print(f"thread of {args.messages} messages, {args.turns} turns, {args.request_latency * 1000:.0f} ms per request")
+    print(f"{'reader':<8}{'first read ms':>15}{'later p50 ms':>14}{'first reqs':>12}{'later reqs':>12}{'messages seen':>15}")
+    all_complete = {}
+    for name, read in readers.items():
+        samples, requests, counts, complete = await measure(name, read, client, thread_id, args.turns)
+        all_complete[name] = complete
+        print(
+            f"{name:<8}{samples[0] * 1000:>15.1f}{statistics.median(samples[1:]) * 1000:>14.1f}"
+            f"{requests[0]:>12}{statistics.median(requests[1:]):>12.0f}{counts[-1]:>15}"
+        )
+
+    for name, complete in all_complete.items():
+        print(f"{name}: {'complete and in order' if complete else 'INCOMPLETE'}")
+    if not all_complete["cached"] or not all_complete["full"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
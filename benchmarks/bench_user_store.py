@@ -0,0 +1,168 @@
+"""
+Per-operation latency of the user store under many concurrent writers and readers.
+
+    legacy  the old behaviour: json.dump to fixed user_onboarding_data.json /
+            user_milestones.json and os.path.exists for the phase (every user
+            overwrites every other user, so only the latency is comparable)
+    sqlite  user_store.UserStore, keyed by user id, WAL mode
+
+Writers alternate save_profile / save_milestones for random users; readers do
+get_phase plus get_profile or get_milestones, as a turn of the Master agent would.
+
+    python benchmarks/bench_user_store.py --writers 8 --readers 32 --ops 300 --users 1000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import isolate_environment
+
+isolate_environment()
+
+from user_store import UserStore
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def load_sample(name):
+    with open(os.path.join(ROOT, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class LegacyFiles:
+    """The file-based storage the agents used before the user store."""
+
+    def __init__(self, directory):
+        self.onboarding = os.path.join(directory, "user_onboarding_data.json")
+        self.milestones = os.path.join(directory, "user_milestones.json")
+
+    def _write(self, path, data):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+
+    def _read(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None  # a concurrent writer truncated the file mid-read
+
+    def save_profile(self, user_id, profile):
+        self._write(self.onboarding, profile)
+
+    def save_milestones(self, user_id, milestones):
+        self._write(self.milestones, milestones)
+
+    def get_profile(self, user_id):
+        return self._read(self.onboarding)
+
+    def get_milestones(self, user_id):
+        return self._read(self.milestones)
+
+    def get_phase(self, user_id):
+        if not os.path.exists(self.onboarding):
+            return "onboarding"
+        return "career_coach" if os.path.exists(self.milestones) else "milestones"
+
+
+def run(store, args, profile, milestones):
+    timings = defaultdict(list)
+    lock = threading.Lock()
+    start_gate = threading.Barrier(args.writers + args.readers)
+
+    def record(name, began):
+        elapsed = time.perf_counter() - began
+        with lock:
+            timings[name].append(elapsed)
+
+    def writer(seed):
+        rng = random.Random(seed)
+        start_gate.wait()
+        for i in range(args.ops):
+            user_id = f"user-{rng.randrange(args.users)}"
+            began = time.perf_counter()
+            if i % 2 == 0:
+                store.save_profile(user_id, profile)
+                record("save_profile", began)
+            else:
+                store.save_milestones(user_id, milestones)
+                record("save_milestones", began)
+
+    def reader(seed):
+        rng = random.Random(seed)
+        start_gate.wait()
+        for i in range(args.ops):
+            user_id = f"user-{rng.randrange(args.users)}"
+            began = time.perf_counter()
+            phase = store.get_phase(user_id)
+            record("get_phase", began)
+            began = time.perf_counter()
+            if phase == "career_coach":
+                store.get_milestones(user_id)
+                record("get_milestones", began)
+            else:
+                store.get_profile(user_id)
+                record("get_profile", began)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(1000 + n,)) for n in range(args.readers)]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings, time.perf_counter() - began
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=32)
+    parser.add_argument("--ops", type=int, default=300, help="operations per thread")
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+
+    profile = load_sample("user_onboarding_data.json")
+    milestones = load_sample("user_milestones.json")
+    scratch = tempfile.mkdtemp(prefix="bluetide-store-")
+    stores = {
+        "legacy": LegacyFiles(scratch),
+        "sqlite": UserStore(os.path.join(scratch, "users.db")),
+    }
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.ops} ops each, {args.users} users")
+    print(f"{'store':<8}{'operation':<17}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for name, store in stores.items():
+        # Every user has finished onboarding before the timed run starts
+        for n in range(args.users):
+            store.save_profile(f"user-{n}", profile)
+        timings, wall = run(store, args, profile, milestones)
+        for operation in ("save_profile", "save_milestones", "get_phase", "get_profile", "get_milestones"):
+            values = timings.get(operation)
+            if not values:
+                continue
+            print(
+                f"{name:<8}{operation:<17}{len(values):>7}"
+                f"{statistics.median(values) * 1000:>9.3f}{percentile(values, 0.95) * 1000:>9.3f}"
+                f"{percentile(values, 0.99) * 1000:>9.3f}{max(values) * 1000:>9.3f}"
+            )
+        total = sum(len(values) for values in timings.values())
+        print(f"{name:<8}{'throughput':<17}{total / wall:>7.0f} ops/s")
+
+
+if __name__ == "__main__":
+    main()
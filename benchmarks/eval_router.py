@@ -0,0 +1,55 @@
+"""
+Offline evaluation of the local intent router against recorded LLM routing decisions.
+
+Record decisions by running the app with ROUTING_LOG_FILE=routing_log.jsonl (the
+Master appends {"text", "state", "label"} for every LLM routing run), then:
+
+    python benchmarks/eval_router.py routing_log.jsonl --thresholds 0.6 0.75 0.9
+
+For each confidence threshold it reports the fraction of turns the router would
+answer locally (skipping the Master's LLM run) and how often those local decisions
+agree with the LLM. benchmarks/data/routing_sample.jsonl is a small hand-labelled
+set for smoke-testing the script; it is not a recording of real LLM decisions.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from intent_router import IntentRouter, ROUTER_CONFIDENCE_THRESHOLD
+
+DEFAULT_LOG = os.path.join(os.path.dirname(__file__), "data", "routing_sample.jsonl")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", nargs="?", default=DEFAULT_LOG, help="JSONL of recorded routing decisions")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.6, ROUTER_CONFIDENCE_THRESHOLD, 0.9])
+    args = parser.parse_args()
+
+    with open(args.log, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    router = IntentRouter.from_file()
+    start = time.perf_counter()
+    predictions = [router.predict(record["text"], record.get("state")) for record in records]
+    per_turn_ms = (time.perf_counter() - start) / len(records) * 1000
+
+    overall = sum(label == record["label"] for (label, _), record in zip(predictions, records)) / len(records)
+    print(f"{len(records)} recorded turns, top-1 agreement with LLM {overall:.1%}, {per_turn_ms:.2f} ms/turn\n")
+    print(f"{'threshold':>10}{'skipped':>10}{'agree (skipped)':>18}{'wrong routes':>14}")
+    for threshold in args.thresholds:
+        local = [
+            (label, record) for (label, confidence), record in zip(predictions, records)
+            if label != "respond_directly" and confidence >= threshold
+        ]
+        agreed = sum(label == record["label"] for label, record in local)
+        agreement = agreed / len(local) if local else float("nan")
+        print(f"{threshold:>10.2f}{len(local) / len(records):>10.1%}{agreement:>18.1%}{len(local) - agreed:>14}")
+
+
+if __name__ == "__main__":
+    main()
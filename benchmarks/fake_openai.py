@@ -0,0 +1,353 @@
+"""
+In-process stand-in for the subset of the OpenAI Assistants API used by helpers.py.
+
+FakeAsyncOpenAI mirrors the shape of `openai.AsyncOpenAI().beta` closely enough that
+the async helpers and agents can run against it unchanged. Runs complete after a
+configurable server-side latency, so benchmarks can measure client-side overhead
+(polling, request counts, event-loop blocking) without paying for real runs.
+With first_token_latency set, streamed runs also emit thread.message.delta events,
+evenly spaced from the first token until the run completes. prefill_latency_per_kchar
+adds time proportional to the thread's length, as reading a longer prompt would.
+
+Latencies take a float or a zero-argument callable (see lognormal). error_rate makes
+that share of requests raise FakeAPIError before doing anything, and
+run_failure_rate ends that share of runs in status "failed" without a reply.
+rpm / tpm enforce per-minute limits like the API's: over them a request raises
+FakeRateLimitError, and rate_limit_headers() gives the x-ratelimit-* values.
+Completed runs report usage (about four characters per token).
+fake_server.py serves the same state over HTTP for the real openai client.
+"""
+import asyncio
+import itertools
+import math
+import os
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+
+
+class FakeAPIError(RuntimeError):
+    """An injected server error (see error_rate); fake_server.py answers it with a 500."""
+
+    status_code = 500
+
+
+class FakeRateLimitError(FakeAPIError):
+    """Over the fake's rpm / tpm limit; fake_server.py answers it with a 429."""
+
+    status_code = 429
+
+    def __init__(self, message, retry_after, kind):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.kind = kind  # 'requests' or 'tokens'
+
+
+class _LimitBucket:
+    """Per-minute limit refilled continuously, as the API's limits are."""
+
+    def __init__(self, per_minute):
+        self.limit = per_minute
+        self.level = per_minute
+        self._updated = time.monotonic()
+
+    def remaining(self):
+        now = time.monotonic()
+        self.level = min(self.limit, self.level + (now - self._updated) * self.limit / 60)
+        self._updated = now
+        return self.level
+
+    def reset_seconds(self):
+        return (self.limit - self.remaining()) * 60 / self.limit
+
+
+def lognormal(median, sigma=0.5, rng=None):
+    """
+    A latency sampler: log-normal around `median` seconds. sigma 0.5 puts p95 near
+    2.3x the median, a long tail like real run latencies.
+    """
+    rng = rng or random.Random()
+    return lambda: rng.lognormvariate(math.log(median), sigma)
+
+
+def _sample(latency):
+    return latency() if callable(latency) else latency
+
+
+def isolate_environment():
+    """
+    Points env-configured state at throwaway values so benchmarks never touch the
+    real API key or write fake ids, greetings, users or built indexes into the
+    project's files.
+    Call before importing project modules.
+    """
+    scratch = tempfile.mkdtemp(prefix="bluetide-bench-")
+    os.environ.setdefault("OPENAI_API_KEY", "fake-key-for-benchmarks")
+    os.environ.setdefault("ASSISTANT_REGISTRY_FILE", os.path.join(scratch, "assistant_registry.json"))
+    os.environ.setdefault("GREETING_CACHE_FILE", os.path.join(scratch, "greeting_cache.json"))
+    os.environ.setdefault("USER_STORE_PATH", os.path.join(scratch, "bluetide.db"))
+    os.environ.setdefault("PATH_CATALOGUE_FILE", os.path.join(scratch, "path_catalogue.npy"))
+
+
+def default_responder(thread_messages, assistant_id, instructions):
+    """Echoes the latest user message back; override for schema-shaped answers."""
+    last_user = next(m for m in reversed(thread_messages) if m.role == "user")
+    return f"Thanks! You said: {last_user.content[0].text.value}"
+
+
+def _text_message(message_id, role, text, run_id=None, assistant_id=None):
+    return SimpleNamespace(
+        id=message_id,
+        object="thread.message",
+        role=role,
+        status="completed",
+        created_at=int(time.time()),
+        run_id=run_id,
+        assistant_id=assistant_id,
+        content=[SimpleNamespace(type="text", text=SimpleNamespace(value=text, annotations=[]))],
+    )
+
+
+class FakeAsyncOpenAI:
+    def __init__(self, run_latency=0.5, responder=default_responder, request_latency=0.0,
+                 first_token_latency=None, chunk_chars=4, prefill_latency_per_kchar=0.0,
+                 error_rate=0.0, run_failure_rate=0.0, seed=None, rpm=None, tpm=None):
+        # A float, or a zero-argument callable sampled once per run
+        self.run_latency = run_latency
+        # Seconds until the first streamed delta; None streams no deltas at all
+        self.first_token_latency = first_token_latency
+        # Characters per delta, roughly one token
+        self.chunk_chars = chunk_chars
+        # Extra run time per 1000 characters on the thread when the run starts
+        self.prefill_latency_per_kchar = prefill_latency_per_kchar
+        # Network round trip added to every API request (float or callable)
+        self.request_latency = request_latency
+        # Share of requests that fail, and of runs that end in status "failed"
+        self.error_rate = error_rate
+        self.run_failure_rate = run_failure_rate
+        self._rng = random.Random(seed)
+        self.error_count = 0
+        # Requests and tokens per minute; None is unlimited
+        self._limits = {kind: _LimitBucket(limit) for kind, limit in (("requests", rpm), ("tokens", tpm)) if limit}
+        self.rate_limited_count = 0
+        self.responder = responder
+        self.request_count = 0
+        self._ids = itertools.count(1)
+        self._threads = {}  # thread_id -> list of messages, oldest first
+        self._runs = {}  # run_id -> run object
+        self._thread_runs = {}  # thread_id -> its run ids, dropped with the thread
+        self._active_runs = {}  # thread_id -> run_id; like the API, a thread takes one run at a time
+        self.beta = SimpleNamespace(
+            assistants=_Assistants(self),
+            threads=_Threads(self),
+        )
+
+    def _check_idle(self, thread_id):
+        if thread_id in self._active_runs:
+            raise RuntimeError(
+                f"Can't modify thread {thread_id} while a run {self._active_runs[thread_id]} is active."
+            )
+
+    def _next_id(self, prefix):
+        return f"{prefix}_{next(self._ids):08d}"
+
+    async def _request(self):
+        self.request_count += 1
+        latency = _sample(self.request_latency)
+        if latency:
+            await asyncio.sleep(latency)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.error_count += 1
+            raise FakeAPIError("The server had an error while processing your request.")
+        self._charge("requests", 1)
+
+    def _charge(self, kind, amount):
+        bucket = self._limits.get(kind)
+        if bucket is None:
+            return
+        if bucket.remaining() < min(amount, bucket.limit):
+            self.rate_limited_count += 1
+            retry_after = (min(amount, bucket.limit) - bucket.level) * 60 / bucket.limit
+            raise FakeRateLimitError(f"Rate limit reached for {kind} per min (limit {bucket.limit:g}).", retry_after, kind)
+        bucket.level -= amount
+
+    def rate_limit_headers(self) -> dict:
+        """The x-ratelimit-* headers the API sends with every response."""
+        headers = {}
+        for kind, bucket in self._limits.items():
+            headers[f"x-ratelimit-limit-{kind}"] = str(int(bucket.limit))
+            headers[f"x-ratelimit-remaining-{kind}"] = str(max(0, int(bucket.remaining())))
+            headers[f"x-ratelimit-reset-{kind}"] = f"{bucket.reset_seconds():.3f}s"
+        return headers
+
+
+class _Assistants:
+    def __init__(self, client):
+        self._client = client
+
+    async def create(self, name, instructions, model, tools=None, **kwargs):
+        await self._client._request()
+        return SimpleNamespace(
+            id=self._client._next_id("asst"), name=name, instructions=instructions, model=model, tools=tools or []
+        )
+
+
+class _Threads:
+    def __init__(self, client):
+        self._client = client
+        self.messages = _Messages(client)
+        self.runs = _Runs(client)
+
+    async def create(self, **kwargs):
+        await self._client._request()
+        thread_id = self._client._next_id("thread")
+        self._client._threads[thread_id] = []
+        return SimpleNamespace(id=thread_id, object="thread", created_at=int(time.time()))
+
+    async def retrieve(self, thread_id):
+        await self._client._request()
+        return SimpleNamespace(id=thread_id, object="thread")
+
+    async def delete(self, thread_id):
+        await self._client._request()
+        self._client._threads.pop(thread_id, None)
+        for run_id in self._client._thread_runs.pop(thread_id, ()):
+            self._client._runs.pop(run_id, None)
+        return SimpleNamespace(id=thread_id, object="thread.deleted", deleted=True)
+
+
+class _Messages:
+    def __init__(self, client):
+        self._client = client
+
+    async def create(self, thread_id, role, content, **kwargs):
+        await self._client._request()
+        self._client._check_idle(thread_id)
+        message = _text_message(self._client._next_id("msg"), role, content)
+        self._client._threads[thread_id].append(message)
+        return message
+
+    async def list(self, thread_id, order="desc", limit=20, after=None, run_id=None, **kwargs):
+        await self._client._request()
+        messages = list(self._client._threads[thread_id])
+        if run_id is not None:
+            messages = [m for m in messages if m.run_id == run_id]
+        if order == "desc":
+            messages.reverse()
+        if after is not None:
+            ids = [m.id for m in messages]
+            messages = messages[ids.index(after) + 1:] if after in ids else []
+        page = messages[:limit]
+        return SimpleNamespace(
+            data=page,
+            has_more=len(messages) > limit,
+            first_id=page[0].id if page else None,
+            last_id=page[-1].id if page else None,
+        )
+
+
+class _Runs:
+    def __init__(self, client):
+        self._client = client
+
+    async def create(self, thread_id, assistant_id, instructions=None, stream=False, **kwargs):
+        client = self._client
+        await client._request()
+        client._check_idle(thread_id)
+        reply = client.responder(client._threads[thread_id], assistant_id, instructions)
+        prompt_tokens = sum(len(m.content[0].text.value) for m in client._threads[thread_id]) // 4
+        completion_tokens = len(reply) // 4
+        client._charge("tokens", prompt_tokens + completion_tokens)
+        run = SimpleNamespace(
+            id=client._next_id("run"),
+            object="thread.run",
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            status="queued",
+            created_at=int(time.time()),
+            last_error=None,
+            usage=None,
+        )
+        client._runs[run.id] = run
+        client._thread_runs.setdefault(thread_id, []).append(run.id)
+        client._active_runs[thread_id] = run.id
+        completed = asyncio.Event()
+        fails = client.run_failure_rate and client._rng.random() < client.run_failure_rate
+
+        def start():
+            if run.status == "queued":
+                run.status = "in_progress"
+
+        def complete():
+            if thread_id not in client._threads:
+                run.status = "cancelled"  # the thread was deleted under the run
+            elif fails:
+                run.status = "failed"
+                run.last_error = SimpleNamespace(code="server_error", message="Injected run failure.")
+            else:
+                message = _text_message(client._next_id("msg"), "assistant", reply, run_id=run.id, assistant_id=assistant_id)
+                client._threads[thread_id].append(message)
+                run.status = "completed"
+                run.reply_message = message
+                run.usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                            total_tokens=prompt_tokens + completion_tokens)
+            client._active_runs.pop(thread_id, None)
+            completed.set()
+
+        latency = _sample(client.run_latency)
+        if client.prefill_latency_per_kchar:
+            thread_chars = sum(len(m.content[0].text.value) for m in client._threads[thread_id])
+            latency += client.prefill_latency_per_kchar * thread_chars / 1000
+        loop = asyncio.get_running_loop()
+        loop.call_later(min(0.01, latency / 2), start)
+        loop.call_later(latency, complete)
+        if stream:
+            deltas = []
+            if client.first_token_latency is not None:
+                # (offset from run start, chunk) spread between first token and completion
+                chunks = [reply[i:i + client.chunk_chars] for i in range(0, len(reply), client.chunk_chars)]
+                span = max(latency - client.first_token_latency, 0.0)
+                deltas = [(client.first_token_latency + span * n / len(chunks), chunk) for n, chunk in enumerate(chunks)]
+            return _RunEventStream(run, completed, deltas)
+        return run
+
+    async def retrieve(self, thread_id, run_id):
+        await self._client._request()
+        return self._client._runs[run_id]
+
+
+class _RunEventStream:
+    """Async iterator of server-sent run events, shaped like openai.AsyncStream."""
+
+    def __init__(self, run, completed, deltas=()):
+        self._run = run
+        self._completed = completed
+        self._deltas = deltas
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        yield SimpleNamespace(event="thread.run.created", data=self._run)
+        yield SimpleNamespace(event="thread.run.in_progress", data=self._run)
+        for offset, chunk in self._deltas:
+            delay = started + offset - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            part = SimpleNamespace(index=0, type="text", text=SimpleNamespace(value=chunk, annotations=[]))
+            yield SimpleNamespace(
+                event="thread.message.delta",
+                data=SimpleNamespace(id=f"{self._run.id}_msg", object="thread.message.delta", delta=SimpleNamespace(content=[part])),
+            )
+        await self._completed.wait()
+        if self._run.status in ("failed", "cancelled"):
+            yield SimpleNamespace(event=f"thread.run.{self._run.status}", data=self._run)
+            return
+        yield SimpleNamespace(event="thread.message.completed", data=self._run.reply_message)
+        yield SimpleNamespace(event="thread.run.completed", data=self._run)
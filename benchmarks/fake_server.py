@@ -0,0 +1,180 @@
+"""
+Serves FakeAsyncOpenAI over HTTP, at the paths the openai SDK calls, so the real
+client (connection pool, retries, SSE parsing) can be benchmarked without the API.
+
+Covers what helpers.py uses: assistants.create, threads create / retrieve / delete,
+messages create / list (order, limit, after, run_id), runs create (streamed as
+server-sent events, or not) and runs retrieve. Runs go queued -> in_progress ->
+completed or failed as in the fake. Injected request errors (error_rate) answer 500,
+requests over --rpm / --tpm 429 with retry-after-ms, and a second run on a busy thread
+400, as the API does; the SDK retries the 500s and 429s. Every response carries the
+x-ratelimit-* headers when limits are set.
+
+    python benchmarks/fake_server.py --port 8900 --run-latency 0.5 --error-rate 0.01
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 chainlit run chainlit.py
+
+start_in_thread() runs it next to a benchmark in the same process (see load_driver.py).
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import threading
+from types import SimpleNamespace
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from fake_openai import FakeAPIError, FakeAsyncOpenAI, FakeRateLimitError, lognormal
+
+# Run attributes kept for the fake's own bookkeeping, not part of the API object
+_PRIVATE_FIELDS = {"reply_message"}
+
+
+def _to_json(value):
+    if isinstance(value, SimpleNamespace):
+        return {key: _to_json(item) for key, item in vars(value).items() if key not in _PRIVATE_FIELDS}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    return value
+
+
+def _error(status, message, error_type, code=None, headers=None):
+    return JSONResponse(
+        {"error": {"message": message, "type": error_type, "param": None, "code": code}}, status, headers=headers
+    )
+
+
+def create_app(client: FakeAsyncOpenAI) -> Starlette:
+    """The /v1 routes, backed by `client`'s threads and runs."""
+    beta = client.beta
+
+    def endpoint(handler):
+        async def wrapped(request: Request):
+            try:
+                response = await handler(request, request.path_params)
+            except FakeRateLimitError as e:
+                headers = {**client.rate_limit_headers(), "retry-after-ms": str(int(e.retry_after * 1000))}
+                return _error(429, str(e), e.kind, "rate_limit_exceeded", headers)
+            except FakeAPIError as e:
+                return _error(e.status_code, str(e), "server_error")
+            except KeyError as e:
+                return _error(404, f"No such object: {e}", "invalid_request_error")
+            except RuntimeError as e:  # a message or run on a thread with an active run
+                return _error(400, str(e), "invalid_request_error")
+            response.headers.update(client.rate_limit_headers())
+            return response
+        return wrapped
+
+    async def body(request):
+        raw = await request.body()
+        return json.loads(raw) if raw else {}
+
+    async def create_assistant(request, params):
+        return JSONResponse(_to_json(await beta.assistants.create(**await body(request))))
+
+    async def create_thread(request, params):
+        return JSONResponse(_to_json(await beta.threads.create(**await body(request))))
+
+    async def thread(request, params):
+        thread_id = params["thread_id"]
+        if request.method == "DELETE":
+            return JSONResponse(_to_json(await beta.threads.delete(thread_id)))
+        if thread_id not in client._threads:
+            raise KeyError(thread_id)
+        return JSONResponse(_to_json(await beta.threads.retrieve(thread_id)))
+
+    async def messages(request, params):
+        thread_id = params["thread_id"]
+        if request.method == "POST":
+            payload = await body(request)
+            content = payload.pop("content")
+            if isinstance(content, list):  # content parts; the fake stores plain text
+                content = "".join(part.get("text", "") for part in content)
+            message = await beta.threads.messages.create(thread_id, payload.pop("role"), content, **payload)
+            return JSONResponse(_to_json(message))
+        query = request.query_params
+        page = await beta.threads.messages.list(
+            thread_id,
+            order=query.get("order", "desc"),
+            limit=int(query.get("limit", 20)),
+            after=query.get("after"),
+            run_id=query.get("run_id"),
+        )
+        return JSONResponse({"object": "list", **_to_json(page)})
+
+    async def create_run(request, params):
+        payload = await body(request)
+        stream = payload.pop("stream", False)
+        result = await beta.threads.runs.create(params["thread_id"], stream=stream, **payload)
+        if not stream:
+            return JSONResponse(_to_json(result))
+
+        async def events():
+            async for event in result:
+                yield f"event: {event.event}\ndata: {json.dumps(_to_json(event.data))}\n\n"
+            yield "event: done\ndata: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def run(request, params):
+        return JSONResponse(_to_json(await beta.threads.runs.retrieve(params["thread_id"], params["run_id"])))
+
+    return Starlette(routes=[
+        Route("/v1/assistants", endpoint(create_assistant), methods=["POST"]),
+        Route("/v1/threads", endpoint(create_thread), methods=["POST"]),
+        Route("/v1/threads/{thread_id}", endpoint(thread), methods=["GET", "DELETE"]),
+        Route("/v1/threads/{thread_id}/messages", endpoint(messages), methods=["GET", "POST"]),
+        Route("/v1/threads/{thread_id}/runs", endpoint(create_run), methods=["POST"]),
+        Route("/v1/threads/{thread_id}/runs/{run_id}", endpoint(run), methods=["GET"]),
+    ])
+
+
+def start_in_thread(client: FakeAsyncOpenAI, host: str = "127.0.0.1", port: int = 0) -> str:
+    """
+    Serves `client` from a daemon thread with its own event loop and returns the base
+    URL to use as OPENAI_BASE_URL. port 0 picks a free one.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    server = uvicorn.Server(uvicorn.Config(create_app(client), log_level="warning", access_log=False))
+    threading.Thread(target=lambda: asyncio.run(server.serve(sockets=[sock])), daemon=True).start()
+    while not server.started:
+        threading.Event().wait(0.01)
+    return f"http://{host}:{sock.getsockname()[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--run-latency", type=float, default=0.5, help="median seconds per run")
+    parser.add_argument("--run-sigma", type=float, default=0.5, help="log-normal spread of run latency")
+    parser.add_argument("--first-token", type=float, default=None, help="seconds to the first streamed delta")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 500")
+    parser.add_argument("--run-failure-rate", type=float, default=0.0, help="share of runs ending in status failed")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--rpm", type=int, default=None, help="requests per minute before answering 429")
+    parser.add_argument("--tpm", type=int, default=None, help="tokens per minute before answering 429")
+    args = parser.parse_args()
+
+    client = FakeAsyncOpenAI(
+        run_latency=lognormal(args.run_latency, args.run_sigma, random.Random(args.seed)),
+        first_token_latency=args.first_token,
+        error_rate=args.error_rate,
+        run_failure_rate=args.run_failure_rate,
+        seed=args.seed,
+        rpm=args.rpm,
+        tpm=args.tpm,
+    )
+    print(f"Fake Assistants API on http://{args.host}:{args.port}/v1 (any API key is accepted)")
+    uvicorn.run(create_app(client), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+End-to-end load test: scripted conversations replayed concurrently against a fake
+Assistants API, reporting turn latency percentiles, throughput and API calls per turn.
+
+    --target master    each turn is MasterAIAgent.chat on the conversation's Session
+    --target chainlit  each conversation is on_chat_start, then on_message per turn,
+                       through chainlit.py's handlers in a headless Chainlit context
+
+    --transport inproc the agents call FakeAsyncOpenAI directly
+    --transport http   the agents use the real openai client against fake_server.py,
+                       so connection pooling, retries and SSE parsing are included;
+                       the server runs in a thread of this process and shares its CPU,
+                       which streamed deltas (--first-token) make noticeable
+
+Run latency is log-normal (--run-latency median, --run-sigma spread). --error-rate
+injects request errors (raised in-process, HTTP 500 over http, where the SDK retries
+them) and --run-failure-rate runs that end in status "failed". A turn fails when it
+raises or its agent result has status "error".
+
+Results can be saved and compared with an earlier run; --compare exits 1 when a
+metric regresses by more than --tolerance:
+
+    python benchmarks/load_driver.py --conversations 200 --concurrency 50 --save baseline.json
+    python benchmarks/load_driver.py --conversations 200 --concurrency 50 --compare baseline.json
+"""
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import FakeAsyncOpenAI, isolate_environment, lognormal
+
+isolate_environment()
+
+import helpers
+import run_scheduler
+from assistant_registry import provision_assistants
+from helpers import acreate_thread
+from session import Session
+from scripted_conversation import script, script_responder
+
+APP_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'chainlit.py'))
+
+# metric -> whether a higher value is better, for --compare
+METRICS = {
+    "turn_p50_ms": False,
+    "turn_p95_ms": False,
+    "turn_p99_ms": False,
+    "turns_per_s": True,
+    "api_calls_per_turn": False,
+    "failed_turn_rate": False,
+}
+
+# Results of the agent calls made during the current turn (chainlit target)
+_turn_results = contextvars.ContextVar("turn_results")
+
+
+def conversations(count, turns):
+    """One script per conversation; a suffix keeps messages distinct across them."""
+    return [
+        [(f"{message} (conversation {n})", agent) for message, agent in script(turns)]
+        for n in range(count)
+    ]
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def load_app():
+    """
+    Imports chainlit.py by path: from the repo root `import chainlit` would find the
+    app instead of the package. Agent results are recorded for the turn being timed.
+    """
+    spec = importlib.util.spec_from_file_location("bluetide_app", APP_PATH)
+    app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app)
+    handle = app.handle_agent_response
+
+    async def recording(chat_result, *args, **kwargs):
+        _turn_results.get().append(chat_result.get("status"))
+        return await handle(chat_result, *args, **kwargs)
+
+    app.handle_agent_response = recording
+    return app
+
+
+class MasterTarget:
+    name = "master"
+
+    async def start(self):
+        from Agents.master_agent import MasterAIAgent
+        await provision_assistants()
+        self.master = MasterAIAgent()
+
+    async def open(self, index, tier):
+        return Session(thread_id=await acreate_thread(helpers.get_async_client()), user_id=f"load-{index}", tier=tier)
+
+    async def turn(self, session, message):
+        result = await self.master.chat(session, message)
+        return result.get("status") != "error"
+
+
+class ChainlitTarget:
+    name = "chainlit"
+
+    async def start(self):
+        import chainlit as cl
+        from chainlit.context import init_http_context
+        self.cl, self.init_http_context = cl, init_http_context
+        self.app = load_app()
+        await self.app.on_app_startup()
+
+    async def open(self, index, tier):
+        # A headless context per conversation task: cl.user_session and cl.Message work,
+        # and sends go nowhere
+        self.init_http_context(user=self.cl.User(identifier=f"load-{index}", metadata={"tier": tier}))
+        _turn_results.set([])
+        await self.app.on_chat_start()
+        return self.cl.user_session.get("session")
+
+    async def turn(self, session, message):
+        results = []
+        _turn_results.set(results)
+        await self.app.on_message(self.cl.Message(content=message))
+        return "error" not in results
+
+    async def close(self):
+        await self.app.on_app_shutdown()
+
+
+async def drive(target, scripts, concurrency, tier, think_time, fake):
+    """Runs every conversation, at most `concurrency` at once. Returns per-turn samples."""
+    latencies, failures, starts = [], [], []
+    gate = asyncio.Semaphore(concurrency)
+    rng = random.Random(0)
+
+    async def conversation(index, turns):
+        async with gate:
+            began = time.perf_counter()
+            try:
+                session = await target.open(index, tier)
+            except Exception as e:
+                failures.append(f"start: {e}")
+                return
+            starts.append(time.perf_counter() - began)
+            for message, _ in turns:
+                began = time.perf_counter()
+                try:
+                    ok = await target.turn(session, message)
+                except Exception as e:
+                    ok = False
+                    failures.append(str(e))
+                else:
+                    if not ok:
+                        failures.append("agent returned status error")
+                latencies.append(time.perf_counter() - began)
+                if think_time:
+                    await asyncio.sleep(rng.expovariate(1 / think_time))
+
+    requests_before = fake.request_count
+    began = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # agents and handlers log every step
+        await asyncio.gather(*(
+            asyncio.create_task(conversation(index, turns)) for index, turns in enumerate(scripts)
+        ))
+    wall = time.perf_counter() - began
+    return latencies, failures, starts, wall, fake.request_count - requests_before
+
+
+def compare(metrics, baseline, tolerance):
+    """Prints current against baseline; returns the metrics that regressed."""
+    regressed = []
+    print(f"\n{'metric':<20}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, higher_is_better in METRICS.items():
+        old, new = baseline["metrics"].get(name), metrics[name]
+        if old is None:
+            continue
+        change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+        worse = -change if higher_is_better else change
+        flag = "  REGRESSED" if worse > tolerance and not (old == new == 0) else ""
+        if flag:
+            regressed.append(name)
+        print(f"{name:<20}{old:>12.3f}{new:>12.3f}{change:>+10.1%}{flag}")
+    if baseline.get("config") and baseline["config"] != metrics.get("_config"):
+        print("note: the baseline was recorded with a different configuration")
+    return regressed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["master", "chainlit"], default="master")
+    parser.add_argument("--transport", choices=["inproc", "http"], default="inproc")
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=25)
+    parser.add_argument("--turns", type=int, default=10, help="user messages per conversation")
+    parser.add_argument("--tier", choices=["free", "premium"], default="free")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds between a reply and the next message")
+    parser.add_argument("--run-latency", type=float, default=0.3, help="median seconds per run")
+    parser.add_argument("--run-sigma", type=float, default=0.5, help="log-normal spread of run latency")
+    parser.add_argument("--first-token", type=float, default=0.05,
+                        help="seconds to the first streamed delta; 0 sends each reply whole")
+    parser.add_argument("--request-latency", type=float, default=0.01, help="median seconds per API request")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--run-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="write config and metrics to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier --save to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression per metric")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    scripts = conversations(args.conversations, args.turns)
+    fake = FakeAsyncOpenAI(
+        run_latency=lognormal(args.run_latency, args.run_sigma, rng),
+        request_latency=lognormal(args.request_latency, 0.3, rng) if args.request_latency else 0.0,
+        first_token_latency=args.first_token or None,
+        error_rate=args.error_rate,
+        run_failure_rate=args.run_failure_rate,
+        seed=args.seed,
+    )
+    if args.transport == "http":
+        from fake_server import start_in_thread
+        os.environ["OPENAI_BASE_URL"] = start_in_thread(fake)
+    else:
+        helpers._SHARED_ASYNC_CLIENT = fake  # every agent, pool and cache picks it up
+
+    target = MasterTarget() if args.target == "master" else ChainlitTarget()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await target.start()
+    # Assistant ids exist only now; the responder answers each one in its schema
+    fake.responder = script_responder([turn for turns in scripts for turn in turns])
+
+    latencies, failures, starts, wall, requests = await drive(
+        target, scripts, args.concurrency, args.tier, args.think_time, fake
+    )
+    if hasattr(target, "close"):
+        with contextlib.redirect_stdout(io.StringIO()):
+            await target.close()
+
+    turns = len(latencies)
+    metrics = {
+        "turns": turns,
+        "turn_p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "turn_p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "turn_p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "turn_mean_ms": round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+        "start_p50_ms": round(percentile(starts, 0.50) * 1000, 1),
+        "turns_per_s": round(turns / wall, 2) if wall else 0.0,
+        "api_calls_per_turn": round(requests / turns, 2) if turns else 0.0,
+        "failed_turn_rate": round(len(failures) / max(turns, 1), 4),
+        "injected_request_errors": fake.error_count,
+        "wall_s": round(wall, 2),
+        "scheduler": run_scheduler.RUN_SCHEDULER.stats(),
+    }
+    config = {key: value for key, value in vars(args).items() if key not in ("save", "compare", "tolerance")}
+
+    print(f"{args.conversations} conversations x {args.turns} turns, {args.concurrency} at once, "
+          f"target {args.target} over {args.transport}; runs ~{args.run_latency * 1000:.0f} ms (sigma {args.run_sigma})")
+    print(f"turn latency ms   p50 {metrics['turn_p50_ms']:.0f}   p95 {metrics['turn_p95_ms']:.0f}   "
+          f"p99 {metrics['turn_p99_ms']:.0f}   (chat start p50 {metrics['start_p50_ms']:.0f})")
+    print(f"throughput        {metrics['turns_per_s']:.1f} turns/s over {metrics['wall_s']:.1f} s")
+    print(f"API calls/turn    {metrics['api_calls_per_turn']:.2f}")
+    print(f"failed turns      {len(failures)} of {turns} ({metrics['failed_turn_rate']:.2%}); "
+          f"{fake.error_count} injected request errors")
+    for reason in sorted(set(failures))[:5]:
+        print(f"  {reason}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "config": config,
+                "metrics": metrics,
+            }, f, indent=2)
+        print(f"saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressed = compare({**metrics, "_config": config}, baseline, args.tolerance)
+        if regressed:
+            print(f"regressed beyond {args.tolerance:.0%}: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,158 @@
+"""
+A scripted career-guidance conversation for benchmarks that drive MasterAIAgent.
+
+Each turn names the user message and the specialist the Master should route it to;
+script_responder answers for every assistant in the shape its prompt asks for
+(routing JSON, onboarding profile, milestone plans and regenerations, skill gaps,
+in full or for precomputed gaps).
+"""
+import json
+import re
+
+from assistant_registry import AGENT_SPECS, get_assistant_id
+
+PROFILE = {
+    "career_goals": "I want to be a machine learning engineer.",
+    "roles_to_avoid": "I don't want to work in startups.",
+    "short_long_term_vision": "Short-term: Learning Python. Long-term: Joining DeepMind at Google.",
+    "preferred_work_environment": "It should have a good work-life balance with a friendly team.",
+    "current_skills": "Python and scikit-learn.",
+    "skills_to_improve": "I want to learn Python, TensorFlow, etc.",
+}
+
+OPENING_TURNS = [
+    ("Hi, I'd like some help with my career", "onboarding_agent"),
+    ("I want to become a machine learning engineer at a big lab", "onboarding_agent"),
+    ("Mostly Python and TensorFlow, and I'd rather avoid startups", "onboarding_agent"),
+    ("What career paths would fit me?", "career_coach"),
+    ("I pick Machine Learning Engineer", "milestone_generator"),
+    ("Which skills am I missing for that path?", "skill_gap_analyzer"),
+]
+
+# Cycled after the opening turns to make conversations of any length; {week} keeps
+# every message distinct so no turn is answered from a cache
+FOLLOW_UP_TURNS = [
+    ("Can you regenerate milestone M{n} with more focus on MLOps? (week {week})", "milestone_generator"),
+    ("I feel a bit stuck in week {week}, can we check in?", "reflection_check_in_agent"),
+    ("How should I prepare for interviews at a research lab by week {week}?", "career_coach"),
+    ("Which skills should I prioritise in week {week}?", "skill_gap_analyzer"),
+]
+
+MILESTONE_COUNT = 6
+
+
+def script(turns: int) -> list:
+    """Returns (message, agent) pairs for a conversation of the given length."""
+    conversation = list(OPENING_TURNS[:turns])
+    for index in range(len(conversation), turns):
+        message, agent = FOLLOW_UP_TURNS[(index - len(OPENING_TURNS)) % len(FOLLOW_UP_TURNS)]
+        week = (index - len(OPENING_TURNS)) // len(FOLLOW_UP_TURNS) + 1
+        conversation.append((message.format(n=index % MILESTONE_COUNT + 1, week=week), agent))
+    return conversation
+
+
+def _milestone(number: int, focus: str = "core machine learning engineering") -> dict:
+    return {
+        "id": f"M{number}",
+        "title": f"Milestone {number}: deepen {focus}",
+        "description": f"Build depth in {focus} through a course, a project and a short write-up.",
+        "sub_steps": [
+            f"Finish a structured course on {focus}",
+            "Ship a small portfolio project and document it",
+            "Share a write-up and ask a mentor for feedback",
+        ],
+        "estimated_time_weeks": 4,
+        "status": "pending",
+    }
+
+
+def _skill_gap(name: str) -> dict:
+    return {
+        "skill_name": name,
+        "description": f"{name} comes up in most job descriptions for this path.",
+        "suggested_resources": [{"type": "Course", "name": f"{name} fundamentals", "provider": "Self-Directed",
+                                 "link": None, "notes": "Short, project-based."}],
+    }
+
+
+def _fenced(heading: str, data: dict, intro: str = "") -> str:
+    body = json.dumps(data, indent=2)
+    return f"{intro}\n\n### {heading}\n```json\n{body}\n```"
+
+
+def script_responder(turns: list):
+    """Responder for FakeAsyncOpenAI that follows the given (message, agent) script."""
+    agent_by_assistant = {get_assistant_id(key): key for key in AGENT_SPECS}
+    routes = {message: agent for message, agent in turns}
+
+    def respond(thread_messages, assistant_id, instructions):
+        agent = agent_by_assistant.get(assistant_id)
+        last_user = next(m for m in reversed(thread_messages) if m.role == "user").content[0].text.value
+
+        if agent == "master_ai_agent":
+            quoted = re.search(r"User's Latest Message: '(.*?)'\n", last_user, re.S)
+            message = quoted.group(1) if quoted else last_user
+            decision = {
+                "action": "call_agent",
+                "agent_to_call": routes.get(message, "career_coach"),
+                "message_for_agent": message,
+                "direct_response_message": None,
+                "transition_phase_to": None,
+            }
+            return f"```json\n{json.dumps(decision)}\n```"
+
+        if agent == "onboarding_agent":
+            # Counted per thread, so concurrent conversations don't share progress
+            replies = sum(m.role == "assistant" and m.assistant_id == assistant_id for m in thread_messages)
+            if replies < 2:
+                return "Thanks! What skills would you most like to improve, and which roles would you rather avoid?"
+            return "DONE\n```json\n" + json.dumps(PROFILE, indent=4) + "\n```"
+
+        if agent == "milestone_generator":
+            regenerate = re.search(r"milestone (M\d+)", last_user)
+            if regenerate:
+                number = int(regenerate.group(1)[1:])
+                data = {"type": "milestone_regeneration", "milestone": _milestone(number, "MLOps and deployment")}
+                return _fenced("Regenerated Milestone", data, "Here is the updated milestone.")
+            data = {
+                "type": "initial_generation",
+                "career_path": "Machine Learning Engineer",
+                "milestones": [_milestone(n) for n in range(1, MILESTONE_COUNT + 1)],
+            }
+            return _fenced("Career Milestones Plan", data, "Great choice! Here is your plan.")
+
+        if agent == "skill_gap_analyzer":
+            computed = re.search(r"Computed skill gap analysis: (\{.*\})", last_user)
+            if computed:
+                # Precomputed gaps (skill_taxonomy): only the descriptions and resources are written
+                missing = json.loads(computed.group(1))["missing_skills"]
+                data = {
+                    "skill_gaps_identified": [_skill_gap(name) for name in missing],
+                    "overall_recommendation": f"Start with {missing[0]}." if missing else "You cover this path already.",
+                }
+                return _fenced("Skill Gap Analysis", data, "Here is where you stand.")
+            data = {
+                "career_path_selected": "Machine Learning Engineer",
+                "user_current_skills": ["Python", "scikit-learn"],
+                "required_skills_for_path": ["Python", "scikit-learn", "TensorFlow", "MLOps"],
+                "skill_gaps_identified": [
+                    {"skill_name": "TensorFlow", "description": "Most production models here are deep nets.",
+                     "suggested_resources": [{"type": "Certification", "name": "TensorFlow Developer Certificate",
+                                              "provider": "Google", "link": None, "notes": "Structured path to the exam."}]},
+                    {"skill_name": "MLOps", "description": "Models have to be deployed and monitored.",
+                     "suggested_resources": [{"type": "Course", "name": "Made With ML", "provider": "Self-Directed",
+                                              "link": None, "notes": "Covers testing, serving and monitoring."}]},
+                ],
+                "overall_recommendation": "Start with TensorFlow, then MLOps.",
+            }
+            return _fenced("Skill Gap Analysis", data, "Here is where you stand.")
+
+        if agent == "reflection_check_in_agent":
+            return "That's completely normal. What is one small step you could finish this week?"
+
+        return (
+            "Based on your profile, three paths fit well: Machine Learning Engineer, "
+            "Applied Research Engineer and ML Platform Engineer. Which one appeals most?"
+        )
+
+    return respond
@@ -1,8 +1,10 @@
 import chainlit as cl
+from chainlit.user_session import user_sessions
+from chainlit.chat_context import chat_contexts
+import asyncio
 import json
 import os
 import sys
-import re # Using standard 're' module for regex
 
 # Import your agents - adjust paths if your structure is different
 from Agents.onboarding_agent import OnboardingAgent
@@ -11,9 +13,19 @@ from Agents.career_coach_agent import CareerCoach # Assuming CareerCoach is in A
 # Import your prompts and helpers
 from prompts import (
     ONBOARDING_AGENT_SYSTEM_PROMPT, ONBOARDING_AGENT_INSTRUCTIONS,
-    CAREER_COACH_SYSTEM_PROMPT, CAREER_COACH_INSTRUCTIONS
+    CAREER_COACH_SYSTEM_PROMPT, CAREER_COACH_INSTRUCTIONS, CAREER_COACH_HANDOFF_MESSAGE
 )
-from helpers import create_client, create_thread, contains_json_block # contains_json_block is imported from helpers
+from session import Session
+from path_catalogue import PATH_SHORTLIST_ENABLED, shortlist_note
+from assistant_registry import provision_assistants
+from thread_pool import ThreadPool
+from structured_output import extract_blocks
+from memory import MEMORY
+from run_scheduler import RunCoalesced, RUN_SCHEDULER
+from session_lifecycle import SESSIONS
+import admission
+import telemetry
+from telemetry import traced
 
 # Helper function for JSON extraction with heading (can be in helpers.py or here)
 # This function is used by handle_agent_response if the agent's chat method didn't
@@ -23,67 +35,143 @@ def extract_json_block_with_heading_and_fences(agent_output: str):
     Extracts the first JSON block preceded by a markdown heading and fenced by ```json ... ```.
     Designed for the CareerCoach's milestone output format.
     """
-    pattern = re.compile(
-        r"###\s*(?P<heading>[^\n]+)\s*\n"   # Capture heading
-        r"```json\s*\n"                     # Match ```json and newline
-        r"(?P<json_string>\{[\s\S]*?\})\s*\n" # Capture JSON string (non-greedy, any char)
-        r"```",                             # Match closing ```
-        re.DOTALL | re.MULTILINE
-    )
-    match = pattern.search(agent_output)
-    if match:
-        heading = match.group("heading").strip()
-        json_string = match.group("json_string")
-        try:
-            parsed_json = json.loads(json_string)
-            return {"heading": heading, "data": parsed_json}
-        except json.JSONDecodeError as e:
-            print(f"JSON Decode Error in extract_json_block_with_heading_and_fences: {e}")
-            return None
+    for block in extract_blocks(agent_output):
+        if block.heading and block.language == "json":
+            if block.error:
+                print(f"JSON Decode Error in extract_json_block_with_heading_and_fences: {block.error}")
+                return None
+            return {"heading": block.heading, "data": block.data}
     return None
 
-# Global client and thread initialization (will be used by both agents for a single conversation thread)
-OPENAI_CLIENT = create_client()
-# Create the thread *once* at the very beginning of the application's lifecycle
-# In a multi-user production Chainlit app, you would typically create this inside @cl.on_chat_start
-# and store it in cl.user_session for a unique thread per user.
-# For this example, we'll keep it global as per the user's implicit setup.
-SHARED_THREAD_ID = create_thread(OPENAI_CLIENT=OPENAI_CLIENT)
+def format_milestone(milestone: dict) -> str:
+    """Markdown card for one milestone, shown as soon as the agent has finished writing it."""
+    title = milestone.get("title", "Milestone")
+    if milestone.get("id"):
+        title = f"{milestone['id']}: {title}"
+    if milestone.get("estimated_time_weeks"):
+        title = f"{title} ({milestone['estimated_time_weeks']} weeks)"
+    lines = [f"**{title}**"]
+    if milestone.get("description"):
+        lines.append(milestone["description"])
+    for step in milestone.get("sub_steps") or milestone.get("steps") or []:
+        lines.append(f"- {step}")
+    return "\n".join(lines)
+
+
+async def render_milestone(milestone: dict):
+    await cl.Message(content=format_milestone(milestone)).send()
+
+
+# Fresh threads are handed out from a pool that refills in the background,
+# so every chat gets its own thread without waiting on threads.create
+thread_pool = ThreadPool()
+
+# Agents are stateless and shared by every session; per-conversation state lives in a Session.
+# They are built at startup, once their assistants are known to exist.
+onboarding_agent = None
+career_coach = None
+
+if telemetry.METRICS_ENABLED:
+    from fastapi.responses import PlainTextResponse
+    from chainlit.server import app as chainlit_server
+
+    async def metrics():
+        return PlainTextResponse(telemetry.render_metrics(), media_type=telemetry.CONTENT_TYPE)
+
+    chainlit_server.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+    # Ahead of Chainlit's catch-all UI route, which would otherwise answer /metrics
+    chainlit_server.router.routes.insert(0, chainlit_server.router.routes.pop())
+    telemetry.register_gauge("bluetide_run_scheduler_threads_busy", "Threads with a run in progress.",
+                             lambda: RUN_SCHEDULER.stats()["threads_busy"])
+    telemetry.register_gauge("bluetide_run_scheduler_queued", "Runs and writes waiting for their thread.",
+                             lambda: RUN_SCHEDULER.stats()["queued"])
+    telemetry.register_gauge("bluetide_run_scheduler_wait_p95_seconds", "95th percentile of recent queue waits.",
+                             lambda: RUN_SCHEDULER.stats()["wait_p95_ms"] / 1000)
+    telemetry.register_gauge("bluetide_thread_pool_ready", "Pre-created threads ready for new chats.",
+                             lambda: thread_pool.ready_count())
+    telemetry.register_gauge("bluetide_admission_queued", "Runs waiting for rate-limit capacity.",
+                             lambda: admission.ADMISSION.stats()["queued"])
+    telemetry.register_gauge("bluetide_sessions_live", "Chat sessions held in memory.", lambda: len(SESSIONS))
+    telemetry.register_gauge("bluetide_thread_deletions_pending", "Threads waiting to be deleted.",
+                             lambda: SESSIONS.reaper.pending())
+
+@cl.on_app_startup
+async def on_app_startup():
+    global onboarding_agent, career_coach
+    # Create any assistants whose prompts/tools changed, concurrently, before serving chats
+    await provision_assistants()
+    onboarding_agent = OnboardingAgent()
+    career_coach = CareerCoach()
+    await thread_pool.start()
+    # Idle sessions are saved, dropped from memory and their threads deleted
+    await SESSIONS.start()
+
+@cl.on_app_shutdown
+async def on_app_shutdown():
+    await SESSIONS.close()
+    await thread_pool.close()
+
+
+async def new_session() -> Session:
+    """
+    A Session on a fresh thread for the current chat, registered with the lifecycle
+    manager. Stored profile and milestones are keyed by the authenticated user, or by
+    the chat session when anonymous.
+    """
+    chat_id = cl.user_session.get("id")
+    user = cl.user_session.get("user")
+    user_id = user.identifier if user else chat_id
+    tier = user.metadata.get("tier", "free") if user else "free"
+    session = Session(thread_id=await thread_pool.acquire(), user_id=user_id, tier=tier)
+    cl.user_session.set("session", session)
+    SESSIONS.track(chat_id, session, on_evict=lambda: forget_chat(chat_id))
+    return session
+
+
+def forget_chat(chat_id):
+    """
+    Drops an evicted chat's Session and Chainlit's copy of its messages (unused here).
+    Eviction runs outside any chat context, so Chainlit's stores are edited directly.
+    """
+    user_sessions.get(chat_id, {}).pop("session", None)
+    chat_contexts.pop(chat_id, None)
 
 @cl.on_chat_start
+@traced("chainlit.chat_start")
 async def on_chat_start():
-    # Initialize both agents with the SAME shared thread ID
-    onboarding_agent = OnboardingAgent(
-        thread_id=SHARED_THREAD_ID # Pass the shared thread ID
-    )
-    career_coach = CareerCoach(
-        thread_id=SHARED_THREAD_ID # Pass the shared thread ID
-    )
-
-    # Store both agents and the state variable in the user session
-    cl.user_session.set("onboarding_agent", onboarding_agent)
-    cl.user_session.set("career_coach", career_coach)
-    cl.user_session.set("onboarding_complete", False) # Initial state: onboarding not complete
-
-    print(f"Chat session started. Shared Thread ID: {SHARED_THREAD_ID}")
-    print("Onboarding Agent and Career Coach initialized.")
-
-    # Start the conversation with the Onboarding Agent
-    initial_chat_result = onboarding_agent.chat("Hello, I'm ready to start my career onboarding.")
+    # Each chat gets its own small Session object and its own thread
+    session = await new_session()
+    admission.set_priority(session.tier)  # premium chats' runs are dispatched first
+
+    print(f"Chat session started. Thread ID: {session.thread_id}")
+
+    # Start the conversation with the Onboarding Agent (served from cache when possible)
+    reply = cl.Message(content="")
+    initial_chat_result = await onboarding_agent.start(session, on_token=reply.stream_token)
     # Handle the initial response from the onboarding agent
-    await handle_agent_response(initial_chat_result, agent_type="onboarding")
+    await handle_agent_response(initial_chat_result, agent_type="onboarding", reply=reply)
 
 
-async def handle_agent_response(chat_result, agent_type):
+@traced("chainlit.handle_response")
+async def handle_agent_response(chat_result, agent_type, reply=None):
     """
     Helper function to process and display agent responses based on their status and content.
     Handles JSON extraction if present in the message string.
+    `reply` is the message the agent's tokens were streamed into; its content is
+    replaced by the final text instead of sending a second message.
     """
     message_content = chat_result["message"]
     extracted_data = chat_result.get("data") # Data returned by agent's chat method if parsed
 
+    async def show(content):
+        if reply is None:
+            await cl.Message(content=content).send()
+        else:
+            reply.content = content
+            await reply.send()
+
     if chat_result["status"] == "continue":
-        await cl.Message(content=message_content).send()
+        await show(message_content)
 
     elif chat_result["status"] == "success":
         # Display the agent's main message
@@ -91,10 +179,10 @@ async def handle_agent_response(chat_result, agent_type):
 
         if extracted_data and isinstance(extracted_data, dict):
             # If the agent's chat method already parsed and returned data
-            await cl.Message(
-                content=f"{message_to_display}\n\n"
-                        f"**Structured Data:**\n```json\n{json.dumps(extracted_data, indent=2)}\n```"
-            ).send()
+            await show(
+                f"{message_to_display}\n\n"
+                f"**Structured Data:**\n```json\n{json.dumps(extracted_data, indent=2)}\n```"
+            )
             print(f"Agent ({agent_type}) success with extracted data.")
         else:
             # If agent's chat method signaled success but didn't return specific 'data' field
@@ -103,67 +191,95 @@ async def handle_agent_response(chat_result, agent_type):
             if structured_data_from_message:
                 # Remove the JSON part from the message content for display
                 text_part = message_content.split('```json')[0].strip()
-                await cl.Message(
-                    content=f"**Agent ({agent_type}) says:** {text_part}\n\n"
-                            f"**Extracted Data ({structured_data_from_message['heading']}):**\n```json\n{json.dumps(structured_data_from_message['data'], indent=2)}\n```"
-                ).send()
+                await show(
+                    f"**Agent ({agent_type}) says:** {text_part}\n\n"
+                    f"**Extracted Data ({structured_data_from_message['heading']}):**\n```json\n{json.dumps(structured_data_from_message['data'], indent=2)}\n```"
+                )
                 print(f"Agent ({agent_type}) success: Detected and parsed JSON block under heading: {structured_data_from_message['heading']}")
                 # If it's a milestone plan, you can do further processing here (e.g., save to DB)
                 if "milestones" in structured_data_from_message['data']:
                     print("This is a milestone plan! Update the user's dashboard (placeholder).")
                     # save_milestones_to_db(user_id, structured_data_from_message['data'])
             else:
-                await cl.Message(content=message_content).send() # No structured data, just a text message
+                await show(message_content) # No structured data, just a text message
                 print(f"Agent ({agent_type}) success: Just a regular message.")
 
         # --- Transition Logic (only after onboarding success) ---
         if agent_type == "onboarding" and chat_result["conversation_ended"]:
             print("Onboarding complete! Transitioning to Career Coach.")
-            cl.user_session.set("onboarding_complete", True)
+            session = cl.user_session.get("session")
+            session.phase = "career_coach"
 
             # Retrieve onboarding data for the Career Coach's initial context
             user_onboarding_data = extracted_data # Get data directly from success result
-            cl.user_session.set("user_onboarding_data", user_onboarding_data)
-
-            # Get the CareerCoach instance
-            career_coach = cl.user_session.get("career_coach")
+            session.data["user_onboarding_data"] = user_onboarding_data
 
             await cl.Message(
                 content="***Great! Your onboarding is complete. Now, let's move on to personalized career guidance.***\n\n"
                         "I am your Career Guidance Coach. To start, I will suggest some career paths based on your profile."
             ).send()
 
-            # Send an initial message to the Career Coach with the onboarding data
-            # This primes the CareerCoach with the user's profile context for its first task.
-            initial_coach_message = f"User has completed onboarding. Their data is: {json.dumps(user_onboarding_data)}. Please suggest 3 career paths based on this data, as per your instructions."
-            coach_initial_response = career_coach.chat(initial_coach_message)
-            await handle_agent_response(coach_initial_response, agent_type="career_coach")
+            # Prime the Career Coach for its first task; the profile is already on the thread
+            initial_coach_message = CAREER_COACH_HANDOFF_MESSAGE
+            if PATH_SHORTLIST_ENABLED:
+                initial_coach_message += f"\n\n{await asyncio.to_thread(shortlist_note, user_onboarding_data)}"
+            coach_reply = cl.Message(content="")
+            coach_initial_response = await career_coach.chat(
+                session, initial_coach_message, on_token=coach_reply.stream_token, on_milestone=render_milestone
+            )
+            await handle_agent_response(coach_initial_response, agent_type="career_coach", reply=coach_reply)
 
 
     elif chat_result["status"] == "error":
-        await cl.Message(
-            content=f"An error occurred during {agent_type} phase: {message_content}",
+        await show(
+            f"An error occurred during {agent_type} phase: {message_content}",
             # For debugging, you might include the raw response:
-            # content=f"An error occurred: {message_content}\nRaw response: {chat_result.get('raw_response', 'N/A')}"
-        ).send()
+            # f"An error occurred: {message_content}\nRaw response: {chat_result.get('raw_response', 'N/A')}"
+        )
         print(f"Error during {agent_type} phase: {message_content}")
 
 
+@cl.on_chat_end
+async def on_chat_end():
+    await SESSIONS.end(cl.user_session.get("id"))
+
+
 @cl.on_message
+@traced("chainlit.turn")
 async def on_message(msg: cl.Message):
-    onboarding_complete = cl.user_session.get("onboarding_complete")
-
-    if not onboarding_complete:
-        # If onboarding is not complete, send messages to the Onboarding Agent
-        current_agent = cl.user_session.get("onboarding_agent")
-        chat_result = current_agent.chat(msg.content)
-        await handle_agent_response(chat_result, agent_type="onboarding")
-    else:
-        # If onboarding is complete, use the Career Coach
-        current_agent = cl.user_session.get("career_coach")
-
-        # The user's message is passed directly to the career coach
-        chat_result = current_agent.chat(msg.content)
-
-        # Handle the career coach's response
-        await handle_agent_response(chat_result, agent_type="career_coach")
\ No newline at end of file
+    session = cl.user_session.get("session")
+    if session is None:
+        # Evicted while idle: continue on a new thread from the saved snapshot
+        session = await new_session()
+        await SESSIONS.restore(cl.user_session.get("id"), session)
+    SESSIONS.touch(cl.user_session.get("id"))
+    admission.set_priority(session.tier)
+    telemetry.set_attribute("session.thread_id", session.thread_id)
+    await session.wait_ready()
+    try:
+        # Over its tier's token budget, the conversation continues on a compacted thread
+        await MEMORY.prepare(session)
+    except Exception as e:
+        print(f"Error compacting conversation memory: {e}")
+
+    # Tokens are streamed into this message as the agent writes them. Messages sent
+    # while a reply is still being written are queued on the thread; several queued
+    # ones are answered together, in the reply to the first of them.
+    reply = cl.Message(content="")
+    try:
+        if session.phase == "onboarding":
+            # If onboarding is not complete, send messages to the Onboarding Agent
+            chat_result = await onboarding_agent.chat(session, msg.content, on_token=reply.stream_token, coalesce=True)
+            await handle_agent_response(chat_result, agent_type="onboarding", reply=reply)
+        else:
+            # If onboarding is complete, use the Career Coach
+            # The user's message is passed directly to the career coach; milestones are
+            # rendered one by one as soon as each is complete
+            chat_result = await career_coach.chat(
+                session, msg.content, on_token=reply.stream_token, on_milestone=render_milestone, coalesce=True
+            )
+
+            # Handle the career coach's response
+            await handle_agent_response(chat_result, agent_type="career_coach", reply=reply)
+    except RunCoalesced:
+        pass  # answered in the reply to an earlier queued message; nothing was streamed here
@@ -0,0 +1,245 @@
+"""
+Batch planning for a cohort: career paths and an initial milestone plan for every
+onboarding profile in a JSONL file, before any of its users opens a chat.
+
+    python cohort.py profiles.jsonl plans.jsonl --concurrency 16
+
+Each input line is a profile in the user_onboarding_data.json shape, plus an optional
+"user_id" (defaults to "<file name>:<line>"). Identical profiles are planned once and
+the plan is given to every user who has it. Results are appended to the output as
+they finish, one line per user, and saved to the user store. Re-running the same
+command after a crash skips the users whose plan is already in the output and retries
+the ones that failed; a user's last line is their result.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import hashlib
+
+import admission
+from assistant_registry import get_assistant_id, provision_assistants
+from helpers import get_async_client, acreate_thread, acall_openAI
+from path_catalogue import PATH_SHORTLIST_ENABLED, get_path_catalogue, shortlist_note
+from prompts import COHORT_PATHS_REQUEST, COHORT_SELECTION_MESSAGE
+from response_cache import normalize_text
+from schemas import ONBOARDING_PROFILE, CAREER_PATHS
+from session import Session
+from thread_reaper import THREAD_REAPER
+from user_store import get_user_store
+
+# Profiles planned at once; each holds one thread with at most one run on it
+COHORT_CONCURRENCY = int(os.getenv("COHORT_CONCURRENCY", "8"))
+
+
+def profile_key(profile: dict) -> str:
+    """Same key for profiles that differ only in whitespace, case or key order."""
+    normalized = {key: normalize_text(value) if isinstance(value, str) else value for key, value in profile.items()}
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def load_profiles(path: str):
+    """
+    Reads the input into (groups, rejected): groups maps a profile key to its profile
+    and users, in input order; rejected holds one error record per unusable line.
+    """
+    groups, rejected = {}, []
+    name = os.path.basename(path)
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            user_id = f"{name}:{line_number}"
+            try:
+                profile = json.loads(line)
+                if not isinstance(profile, dict):
+                    raise ValueError("not a JSON object")
+            except ValueError as e:
+                rejected.append({"user_id": user_id, "status": "invalid", "message": f"Line {line_number}: {e}"})
+                continue
+            user_id = str(profile.pop("user_id", user_id))
+            errors = ONBOARDING_PROFILE.validate(profile)
+            if errors:
+                rejected.append({"user_id": user_id, "status": "invalid", "message": "; ".join(errors)})
+                continue
+            group = groups.setdefault(profile_key(profile), {"profile": profile, "users": []})
+            group["users"].append(user_id)
+    return groups, rejected
+
+
+def load_checkpoint(path: str) -> dict:
+    """
+    User id -> last successful record in an earlier run's output. A line cut short by
+    a crash is dropped from the file, so appending resumes on a clean line.
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        content = f.read()
+        end = content.rfind(b"\n") + 1
+        if end < len(content):
+            f.truncate(end)
+    for line in content[:end].decode("utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("status") == "success":
+            done[record["user_id"]] = record
+        else:
+            done.pop(record.get("user_id"), None)
+    return done
+
+
+async def plan_profile(agent, profile: dict, user_id: str, OPENAI_CLIENT=None) -> dict:
+    """
+    Plans one profile on a thread of its own: the Milestone Generator suggests three
+    paths as JSON, the first is selected, and the generator writes its milestones
+    (saved to the store by the agent, and served from its caches when possible).
+    With the path shortlist on, the paths are chosen from the catalogue paths closest
+    to the profile; any other title is dropped, and if none is left the shortlist's
+    own top three are used. Returns the result record without user_id.
+    """
+    OPENAI_CLIENT = OPENAI_CLIENT or get_async_client()
+    session = Session(thread_id=await acreate_thread(OPENAI_CLIENT), user_id=user_id, phase="milestones")
+    session.data["user_onboarding_data"] = profile
+    try:
+        await asyncio.to_thread(get_user_store().save_profile, user_id, profile)
+        request = f"User onboarding data: {json.dumps(profile, ensure_ascii=False)}\n{COHORT_PATHS_REQUEST}"
+        if PATH_SHORTLIST_ENABLED:
+            request += f"\n{await asyncio.to_thread(shortlist_note, profile)}"
+        response = await acall_openAI(
+            thread_id=session.thread_id,
+            assistant_id=get_assistant_id("milestone_generator"),
+            user_input=request,
+            OPENAI_CLIENT=OPENAI_CLIENT,
+        )
+        block, errors = CAREER_PATHS.find(response, heading="Career Paths")
+        if block is None or errors or not block.data["career_paths"]:
+            return {"status": "error", "message": f"Career paths: {'; '.join(errors) or 'none suggested'}"}
+        paths = block.data["career_paths"]
+        if PATH_SHORTLIST_ENABLED:
+            shortlist = await asyncio.to_thread(lambda: get_path_catalogue().shortlist([profile])[0])
+            titles = {normalize_text(path["title"]): path["title"] for path in shortlist}
+            paths = [dict(path, title=titles[normalize_text(path["title"])])
+                     for path in paths if normalize_text(path["title"]) in titles]
+            paths = paths or [{"title": path["title"], "reason": ""} for path in shortlist[:3]]
+
+        result = await agent.chat(session, COHORT_SELECTION_MESSAGE.format(path=paths[0]["title"]), use_cache=True)
+        if result["status"] != "success" or result["data"].get("type") != "initial_generation":
+            return {"status": "error", "career_paths": paths, "message": result["message"][:300]}
+        return {"status": "success", "career_paths": paths, "selected_path": paths[0]["title"], "plan": result["data"]}
+    finally:
+        THREAD_REAPER.schedule(session.thread_id, OPENAI_CLIENT)
+
+
+async def _save_copy(user_id: str, profile: dict, plan: dict):
+    store = get_user_store()
+    await asyncio.to_thread(store.save_profile, user_id, profile)
+    await asyncio.to_thread(store.save_milestones, user_id, plan)
+
+
+async def plan_cohort(input_path: str, output_path: str, concurrency: int = COHORT_CONCURRENCY,
+                      OPENAI_CLIENT=None, on_result=None) -> dict:
+    """
+    Plans every profile of input_path into output_path (see the module docstring) with
+    at most `concurrency` profiles in flight. Runs are dispatched as background work
+    (see admission), behind live chats. on_result, if given, is called with each record
+    written. Returns counts and timings.
+    """
+    from Agents.milestone_generator import MilestoneGeneratorAgent
+
+    admission.set_priority("background")
+    began = time.perf_counter()
+    groups, rejected = load_profiles(input_path)
+    done = load_checkpoint(output_path)
+    await provision_assistants(["milestone_generator"], OPENAI_CLIENT)
+    agent = MilestoneGeneratorAgent()
+    if OPENAI_CLIENT is not None:
+        agent.OPENAI_CLIENT = OPENAI_CLIENT
+    stats = {"users": sum(len(group["users"]) for group in groups.values()) + len(rejected),
+             "profiles": len(groups), "resumed": 0, "planned": 0, "copied": 0, "failed": 0, "invalid": 0}
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        def write(record):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            stats[record.get("outcome", record["status"])] += 1
+            if on_result is not None:
+                on_result(record)
+
+        for record in rejected:
+            write(record)
+
+        queue = asyncio.Queue()
+        for key, group in groups.items():
+            pending = [user_id for user_id in group["users"] if user_id not in done]
+            stats["resumed"] += len(group["users"]) - len(pending)
+            if pending:
+                # A plan written for one of these users in an earlier run serves the rest
+                earlier = next((done[user_id] for user_id in group["users"] if user_id in done), None)
+                queue.put_nowait((key, group["profile"], pending, earlier))
+
+        async def worker():
+            while True:
+                try:
+                    key, profile, users, earlier = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                started = time.perf_counter()
+                if earlier is not None:
+                    result = {field: earlier[field] for field in ("status", "career_paths", "selected_path", "plan")}
+                else:
+                    try:
+                        result = await plan_profile(agent, profile, users[0], OPENAI_CLIENT)
+                    except Exception as e:
+                        print(f"Cohort: Error planning {users[0]}: {e}")
+                        result = {"status": "error", "message": str(e)}
+                seconds = round(time.perf_counter() - started, 3)
+                for index, user_id in enumerate(users):
+                    record = dict(result, user_id=user_id, profile_key=key, seconds=seconds)
+                    if result["status"] != "success":
+                        record["outcome"] = "failed"
+                    elif index == 0 and earlier is None:
+                        record["outcome"] = "planned"
+                    else:
+                        record["outcome"] = "copied"  # same profile as users[0], or as an earlier run's user
+                        try:
+                            await _save_copy(user_id, profile, result["plan"])
+                        except Exception as e:
+                            print(f"Cohort: Error saving the plan of {user_id}: {e}")
+                    write(record)
+
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:  # one failed (e.g. the output could not be written): stop the rest
+                task.cancel()
+    await THREAD_REAPER.close()
+    stats["seconds"] = round(time.perf_counter() - began, 3)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL of onboarding profiles")
+    parser.add_argument("output", help="JSONL of results; appended to, and read back to resume")
+    parser.add_argument("--concurrency", type=int, default=COHORT_CONCURRENCY, help="profiles planned at once")
+    args = parser.parse_args()
+
+    stats = asyncio.run(plan_cohort(args.input, args.output, args.concurrency))
+    planned = stats["planned"] + stats["copied"]
+    print(f"{stats['users']} users, {stats['profiles']} distinct profiles: {stats['planned']} planned, "
+          f"{stats['copied']} copied from an identical profile, {stats['resumed']} already done, "
+          f"{stats['failed']} failed, {stats['invalid']} invalid")
+    print(f"{stats['seconds']:.1f} s, {planned / stats['seconds']:.1f} users/s")
+    return 1 if stats["failed"] or stats["invalid"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import json
+import hashlib
+
+# Profile fields folded into the one-line summary the Master sees
+PROFILE_SUMMARY_FIELDS = ("career_goals", "skills_to_improve", "short_long_term_vision")
+PROFILE_SUMMARY_MAX_CHARS = 240
+
+# Milestone fields the Master needs to route regeneration requests
+MILESTONE_FIELDS = ("id", "title", "status")
+
+
+def _compact(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def summarize_profile(profile: dict) -> str:
+    parts = [str(profile[key]).strip() for key in PROFILE_SUMMARY_FIELDS if profile.get(key)]
+    summary = " | ".join(parts)
+    if len(summary) > PROFILE_SUMMARY_MAX_CHARS:
+        summary = summary[:PROFILE_SUMMARY_MAX_CHARS - 3].rstrip() + "..."
+    return summary
+
+
+class ContextSnapshot:
+    """
+    The Master agent's 'current_context' (see MASTER_AI_AGENT_INSTRUCTIONS), kept
+    materialized per session and updated as agents return data, instead of being
+    rebuilt from storage every turn.
+
+    encode_for_master() returns the full context the first time and afterwards only
+    the fields (and milestones, by id) that changed since the Master last saw it;
+    the Master's thread holds the earlier turns, so it can apply the changes. A turn
+    counts as seen once mark_delivered() is called after the Master's decision.
+    """
+
+    def __init__(self):
+        self.fields = {
+            "user_onboarding_data_exists": False,
+            "selected_career_path": None,
+            "milestones_generated": False,
+            "current_milestones": None,
+            "last_agent_called": None,
+            "user_onboarding_data_summary": None,
+        }
+        self._milestones = {}  # id -> compact milestone, in plan order
+        self._changed_fields = set(self.fields)
+        self._changed_milestones = set()
+        self._sent_once = False
+        self._generation = 0  # bumped by reset_delivery(), so older deliveries are ignored
+        self._fingerprint = None
+
+    @classmethod
+    def from_store(cls, store, user_id: str):
+        """Seeds a snapshot from what the user store already holds (once per session)."""
+        snapshot = cls()
+        profile = store.get_profile(user_id)
+        if profile:
+            snapshot.update_profile(profile)
+        milestones = store.get_milestones(user_id)
+        if milestones:
+            snapshot.update_milestones(milestones)
+        return snapshot
+
+    def _set(self, name, value):
+        if self.fields[name] != value:
+            self.fields[name] = value
+            self._changed_fields.add(name)
+            self._fingerprint = None
+
+    @property
+    def phase(self) -> str:
+        """Same states as UserStore.get_phase, without touching storage."""
+        if not self.fields["user_onboarding_data_exists"]:
+            return "onboarding"
+        return "career_coach" if self.fields["milestones_generated"] else "milestones"
+
+    def update_profile(self, profile: dict):
+        self._set("user_onboarding_data_exists", True)
+        self._set("user_onboarding_data_summary", summarize_profile(profile))
+
+    def update_milestones(self, data: dict):
+        """
+        Applies agent output: a full plan ('milestones' list) replaces the current one,
+        a regeneration ('milestone' object) replaces that milestone only.
+        """
+        path = data.get("career_path") or data.get("career_path_selected")
+        if path:
+            self._set("selected_career_path", path)
+
+        if isinstance(data.get("milestones"), list):
+            plan = {}
+            for index, milestone in enumerate(data["milestones"], start=1):
+                compact = {key: milestone[key] for key in MILESTONE_FIELDS if key in milestone}
+                compact.setdefault("id", f"M{index}")
+                plan[compact["id"]] = compact
+            changed = {mid for mid in plan if self._milestones.get(mid) != plan[mid]}
+            changed |= set(self._milestones) - set(plan)
+            if not changed:
+                return
+            self._changed_milestones |= changed
+            self._milestones = plan
+        elif isinstance(data.get("milestone"), dict):
+            milestone = data["milestone"]
+            compact = {key: milestone[key] for key in MILESTONE_FIELDS if key in milestone}
+            if "id" not in compact or self._milestones.get(compact["id"]) == compact:
+                return
+            self._milestones[compact["id"]] = compact
+            self._changed_milestones.add(compact["id"])
+        else:
+            return
+
+        self._set("milestones_generated", bool(self._milestones))
+        self.fields["current_milestones"] = list(self._milestones.values()) or None
+        self._changed_fields.add("current_milestones")
+        self._fingerprint = None
+
+    def reset_delivery(self):
+        """Sends the full context again on the next turn, e.g. after moving to a new thread."""
+        self._sent_once = False
+        self._changed_fields = set(self.fields)
+        self._changed_milestones.clear()
+        self._generation += 1
+
+    def record_agent(self, agent_name: str):
+        self._set("last_agent_called", agent_name)
+
+    def fingerprint(self) -> str:
+        """Stable digest of the full context, for cache keys; recomputed only after changes."""
+        if self._fingerprint is None:
+            digest = hashlib.sha256(_compact(self.fields).encode("utf-8")).hexdigest()
+            self._fingerprint = digest[:16]
+        return self._fingerprint
+
+    def encode_for_master(self):
+        """
+        Context text for the next Master turn, and the delivery it makes. Nothing is
+        marked as seen until mark_delivered(delivery), so a failed run resends it.
+        """
+        if not self._sent_once:
+            text = f"current_context: {_compact(self.fields)}"
+            names, milestone_ids = set(self.fields), set(self._milestones) | self._changed_milestones
+        elif not self._changed_fields:
+            text = "current_context: unchanged since your last decision."
+            names, milestone_ids = set(), set()
+        else:
+            changes = {}
+            for name in self.fields:
+                if name not in self._changed_fields:
+                    continue
+                if name == "current_milestones":
+                    # Only the milestones that changed, keyed by id; null means removed
+                    changes["current_milestones_changed"] = {
+                        mid: self._milestones.get(mid) for mid in sorted(self._changed_milestones)
+                    }
+                else:
+                    changes[name] = self.fields[name]
+            text = f"current_context changes since your last decision (other fields unchanged): {_compact(changes)}"
+            names, milestone_ids = set(self._changed_fields), set(self._changed_milestones)
+        delivery = (
+            self._generation,
+            {name: self.fields[name] for name in names},
+            {mid: self._milestones.get(mid) for mid in milestone_ids},
+        )
+        return text, delivery
+
+    def mark_delivered(self, delivery):
+        """
+        Marks what encode_for_master() sent as seen by the Master. Anything changed
+        again since then stays pending, as does everything after a reset_delivery().
+        """
+        generation, fields, milestones = delivery
+        if generation != self._generation:
+            return
+        self._sent_once = True
+        self._changed_fields -= {name for name, value in fields.items() if self.fields[name] == value}
+        self._changed_milestones -= {mid for mid, value in milestones.items() if self._milestones.get(mid) == value}
@@ -1,40 +1,84 @@
 import os
 import time
+import asyncio
 from dotenv import load_dotenv
-import openai
-import regex as re
+
+import structured_output
+import telemetry
+from telemetry import span
+from run_scheduler import RUN_SCHEDULER
+from admission import ADMISSION, ADMISSION_RUN_TOKENS, RateLimited, current_priority, on_response
 
 load_dotenv()
 
-# Cache assistant ID (file-based for simplicity)
-ASSISTANT_ID_FILE = ".assistant_id"
+# How call_openAI waits for a run: "stream" consumes the run's server-sent events,
+# "poll" retrieves the run status with an adaptive backoff.
+RUN_MODE = os.getenv("OPENAI_RUN_MODE", "stream")
+POLL_INITIAL_DELAY = 0.05  # seconds
+POLL_BACKOFF = 1.5
+POLL_MAX_DELAY = 1.0
+
+# Connection pool of the shared clients; tune per worker with the env vars below
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+
+_SHARED_CLIENT = None
+_SHARED_ASYNC_CLIENT = None
+
+# Page size for messages.list (the API's maximum); longer threads are paged with cursors
+MESSAGES_PAGE_SIZE = 100
+
+# Encoding used by count_tokens when tiktoken is installed (gpt-4o family)
+TOKEN_ENCODING_NAME = os.getenv("TOKEN_ENCODING_NAME", "o200k_base")
+_TOKEN_ENCODING = None  # resolved on first use; False when tiktoken is unavailable
+
+RUN_FAILED_STATUSES = ["failed", "cancelled", "expired", "incomplete"]
+RUN_FAILED_EVENTS = ["thread.run.failed", "thread.run.cancelled", "thread.run.expired", "thread.run.incomplete"]
 
-ONBOARDING_FILE_PATH = "user_onboarding_data.json"
-MILESTONES_FILE_PATH = "user_milestones.json"
+
+def _connection_limits():
+    import httpx
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+    )
 
 
 def create_client():
+    import openai  # deferred to the first client: the SDK takes about a second to import
     API_KEY = os.getenv("OPENAI_API_KEY")
-    return openai.OpenAI(api_key=API_KEY)
+    return openai.OpenAI(
+        api_key=API_KEY, http_client=openai.DefaultHttpxClient(limits=_connection_limits())
+    )
 
 
-def create_assistant(name, instructions, OPENAI_CLIENT):
-    # Check for cached assistant
-    if os.path.exists(ASSISTANT_ID_FILE):
-        with open(ASSISTANT_ID_FILE, "r") as f:
-            return f.read().strip()
+def create_async_client():
+    import openai  # deferred, as in create_client
+    API_KEY = os.getenv("OPENAI_API_KEY")
+    # Every response's rate-limit headers feed the admission controller
+    http_client = openai.DefaultAsyncHttpxClient(limits=_connection_limits(), event_hooks={"response": [on_response]})
+    return openai.AsyncOpenAI(api_key=API_KEY, http_client=http_client)
 
-    assistant = OPENAI_CLIENT.beta.assistants.create(
-        name=name,
-        instructions=instructions,
-        tools=[{"type": "code_interpreter"}],
-        model="gpt-4o",
-    )
 
-    with open(ASSISTANT_ID_FILE, "w") as f:
-        f.write(assistant.id)
+def get_client():
+    """
+    Returns the process-wide sync client, creating it on first use. Every agent and
+    session shares its connection pool instead of opening one per agent.
+    """
+    global _SHARED_CLIENT
+    if _SHARED_CLIENT is None:
+        _SHARED_CLIENT = create_client()
+    return _SHARED_CLIENT
+
 
-    return assistant.id
+def get_async_client():
+    """Process-wide async counterpart of get_client()."""
+    global _SHARED_ASYNC_CLIENT
+    if _SHARED_ASYNC_CLIENT is None:
+        _SHARED_ASYNC_CLIENT = create_async_client()
+    return _SHARED_ASYNC_CLIENT
 
 
 def create_thread(OPENAI_CLIENT):
@@ -42,53 +86,136 @@ def create_thread(OPENAI_CLIENT):
     return thread.id
 
 
-def call_openAI(thread_id, assistant_id, user_input, instructions, OPENAI_CLIENT):
+def call_openAI(thread_id, assistant_id, user_input, instructions=None, OPENAI_CLIENT=None, run_mode=None):
+    OPENAI_CLIENT = OPENAI_CLIENT or get_client()
     # Add user message to thread
-    OPENAI_CLIENT.beta.threads.messages.create(
-        thread_id=thread_id, role="user", content=user_input
-    )
-
-    # Create a run with instructions
-    run = OPENAI_CLIENT.beta.threads.runs.create(
-        thread_id=thread_id, assistant_id=assistant_id, instructions=instructions
-    )
+    with span("openai.message_create", thread_id=thread_id):
+        OPENAI_CLIENT.beta.threads.messages.create(
+            thread_id=thread_id, role="user", content=user_input
+        )
 
-    # Poll status
-    while True:
-        run_status = OPENAI_CLIENT.beta.threads.runs.retrieve(
-            thread_id=thread_id, run_id=run.id
+    if (run_mode or RUN_MODE) == "stream":
+        # Completion is signalled by the run's own events, no polling needed
+        with span("openai.run_stream", thread_id=thread_id, assistant_id=assistant_id):
+            stream = OPENAI_CLIENT.beta.threads.runs.create(
+                thread_id=thread_id, assistant_id=assistant_id, stream=True, **_run_overrides(instructions)
+            )
+            reply, run_id = None, None
+            for event in stream:
+                run_id, reply = _handle_run_event(event, run_id, reply)
+        if reply is not None:
+            return reply
+        return _fetch_run_reply(thread_id, run_id, OPENAI_CLIENT)
+
+    # Create the run; instructions only override the assistant's when given
+    with span("openai.run_create", thread_id=thread_id, assistant_id=assistant_id):
+        run = OPENAI_CLIENT.beta.threads.runs.create(
+            thread_id=thread_id, assistant_id=assistant_id, **_run_overrides(instructions)
         )
 
-        if run_status.status == "completed":
-            break
-        elif run_status.status in ["failed", "cancelled", "expired"]:
-            raise Exception(f"Run failed with status: {run_status.status}")
+    # Poll status, starting fast and backing off so short runs don't wait a full second
+    delay = POLL_INITIAL_DELAY
+    with span("openai.run_poll", thread_id=thread_id, run_id=run.id) as polling:
+        polls = 0
+        while True:
+            run_status = OPENAI_CLIENT.beta.threads.runs.retrieve(
+                thread_id=thread_id, run_id=run.id
+            )
+            polls += 1
+
+            if run_status.status == "completed":
+                break
+            elif run_status.status in RUN_FAILED_STATUSES:
+                _raise_run_failed(run_status)
+
+            time.sleep(delay)
+            delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+        polling.set("polls", polls)
+
+    return _fetch_run_reply(thread_id, run.id, OPENAI_CLIENT)
+
 
-        time.sleep(1)
+def _run_overrides(instructions):
+    # Assistants carry their instructions (see assistant_registry); only send a
+    # per-run override when a caller explicitly asks for one.
+    return {"instructions": instructions} if instructions else {}
 
-    # Fetch latest assistant message
-    messages = OPENAI_CLIENT.beta.threads.messages.list(thread_id=thread_id)
+
+def _handle_run_event(event, run_id, reply):
+    """
+    Folds one streamed run event into (run_id, reply). Raises if the run ends
+    in a failed state, matching the polling path.
+    """
+    if event.event == "thread.run.created":
+        run_id = event.data.id
+    elif event.event == "thread.message.completed":
+        reply = event.data.content[0].text.value
+    elif event.event in RUN_FAILED_EVENTS:
+        _raise_run_failed(event.data)
+    return run_id, reply
+
+
+def _raise_run_failed(run):
+    # A run the API failed for the account's rate limits pauses admissions like a 429
+    error = getattr(run, "last_error", None)
+    if error is not None and getattr(error, "code", None) == "rate_limit_exceeded":
+        ADMISSION.note_rate_limited()
+        raise RateLimited(f"Run failed: rate limit exceeded ({error.message})")
+    raise Exception(f"Run failed with status: {run.status}")
+
+
+def _run_usage(run):
+    usage = getattr(run, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+
+def _delta_text(event):
+    # thread.message.delta carries a list of content parts; only text is shown
+    for part in event.data.delta.content or []:
+        if part.type == "text" and part.text and part.text.value:
+            yield part.text.value
+
+
+def _fetch_run_reply(thread_id, run_id, OPENAI_CLIENT):
+    # Fetch only the latest message produced by this run, not the whole thread
+    with span("openai.message_list", thread_id=thread_id, run_id=run_id):
+        messages = OPENAI_CLIENT.beta.threads.messages.list(
+            thread_id=thread_id, run_id=run_id, order="desc", limit=1
+        )
     return messages.data[0].content[0].text.value
 
 
+def _format_text_messages(messages):
+    formatted_messages = []
+    for msg in messages:
+        if msg.content and msg.content[0].type == "text":
+            formatted_messages.append(
+                {
+                    "role": msg.role,
+                    "content": msg.content[0].text.value,
+                    "id": msg.id,
+                    "created_at": msg.created_at,
+                }
+            )
+    return formatted_messages
+
+
 def get_all_messages_from_thread(thread_id, OPENAI_CLIENT):
     try:
-        messages = OPENAI_CLIENT.beta.threads.messages.list(
-            thread_id=thread_id,
-            order="asc",  # Fetch messages in ascending order (chronological)
-        )
-        formatted_messages = []
-        for msg in messages.data:
-            if msg.content and msg.content[0].type == "text":
-                formatted_messages.append(
-                    {
-                        "role": msg.role,
-                        "content": msg.content[0].text.value,
-                        "id": msg.id,
-                        "created_at": msg.created_at,
-                    }
-                )
-        return formatted_messages
+        # Page through the whole thread; a single list call stops at one page
+        messages, after = [], None
+        while True:
+            page = OPENAI_CLIENT.beta.threads.messages.list(
+                thread_id=thread_id,
+                order="asc",  # Fetch messages in ascending order (chronological)
+                limit=MESSAGES_PAGE_SIZE,
+                **({"after": after} if after else {}),
+            )
+            messages.extend(page.data)
+            if not page.has_more or not page.data:
+                break
+            after = page.data[-1].id
+        return _format_text_messages(messages)
     except Exception as e:
         print(f"Error retrieving messages: {e}")
         return []
@@ -103,6 +230,184 @@ def delete_thread(thread_id, OPENAI_CLIENT):
         return None
 
 
+async def acreate_thread(OPENAI_CLIENT):
+    """Async variant of create_thread for use with create_async_client()."""
+    thread = await OPENAI_CLIENT.beta.threads.create()
+    return thread.id
+
+
+async def acall_openAI(thread_id, assistant_id, user_input, instructions=None, OPENAI_CLIENT=None, run_mode=None, on_delta=None, coalesce=False):
+    """
+    Async variant of call_openAI. Waiting on the run yields to the event loop,
+    so other sessions served by the same worker keep making progress.
+
+    on_delta, if given, is awaited with each chunk of reply text as it streams in
+    (once with the whole reply when the run is polled). The full reply is still returned.
+
+    Runs are queued per thread by run_scheduler.RUN_SCHEDULER, so a call made while
+    another run is active on the thread waits for it instead of failing. With
+    coalesce=True (user messages), a message still queued behind another one for the
+    same assistant is sent in that run instead, and this call raises RunCoalesced.
+
+    Each run is then admitted by admission.ADMISSION within the account's rate
+    limits, in the order of the caller's class (the session tier set with
+    admission.set_priority, else 'background'). A run refused for rate limits
+    raises RateLimited.
+    """
+    submitted_at = time.perf_counter()
+    priority = current_priority()  # the thread's queue may run this from another task
+
+    async def run(message):
+        telemetry.observe("openai.run_queue", time.perf_counter() - submitted_at)
+        queued_at = time.perf_counter()
+        ticket = await ADMISSION.acquire(
+            priority, count_tokens(message) + count_tokens(instructions or "") + ADMISSION_RUN_TOKENS
+        )
+        telemetry.observe("openai.admission", time.perf_counter() - queued_at)
+        try:
+            return await _arun(thread_id, assistant_id, message, instructions, OPENAI_CLIENT, run_mode, on_delta, ticket)
+        except RateLimited:
+            raise
+        except Exception as e:
+            if getattr(e, "status_code", None) == 429:  # still limited after the SDK's retries
+                raise RateLimited(str(e)) from e
+            raise
+
+    coalesce_key = (assistant_id, instructions) if coalesce else None
+    return await RUN_SCHEDULER.submit(thread_id, run, user_input, coalesce_key)
+
+
+async def _arun(thread_id, assistant_id, user_input, instructions, OPENAI_CLIENT, run_mode, on_delta, ticket=None):
+    OPENAI_CLIENT = OPENAI_CLIENT or get_async_client()
+    # Add user message to thread
+    with span("openai.message_create", thread_id=thread_id):
+        await OPENAI_CLIENT.beta.threads.messages.create(
+            thread_id=thread_id, role="user", content=user_input
+        )
+
+    if (run_mode or RUN_MODE) == "stream":
+        with span("openai.run_stream", thread_id=thread_id, assistant_id=assistant_id) as streaming:
+            stream = await OPENAI_CLIENT.beta.threads.runs.create(
+                thread_id=thread_id, assistant_id=assistant_id, stream=True, **_run_overrides(instructions)
+            )
+            reply, run_id = None, None
+            streamed = False
+            async with stream:  # closes the response when the run fails mid-stream
+                async for event in stream:
+                    if on_delta is not None and event.event == "thread.message.delta":
+                        for text in _delta_text(event):
+                            streamed = True
+                            await on_delta(text)
+                    run_id, reply = _handle_run_event(event, run_id, reply)
+                    if ticket is not None and event.event == "thread.run.completed":
+                        ticket.settle(_run_usage(event.data))
+            streaming.set("run_id", run_id)
+        if reply is None:
+            reply = await _afetch_run_reply(thread_id, run_id, OPENAI_CLIENT)
+        if on_delta is not None and not streamed:
+            await on_delta(reply)
+        return reply
+
+    # Create the run; instructions only override the assistant's when given
+    with span("openai.run_create", thread_id=thread_id, assistant_id=assistant_id):
+        run = await OPENAI_CLIENT.beta.threads.runs.create(
+            thread_id=thread_id, assistant_id=assistant_id, **_run_overrides(instructions)
+        )
+
+    # Poll status with the same adaptive backoff as call_openAI
+    delay = POLL_INITIAL_DELAY
+    with span("openai.run_poll", thread_id=thread_id, run_id=run.id) as polling:
+        polls = 0
+        while True:
+            run_status = await OPENAI_CLIENT.beta.threads.runs.retrieve(
+                thread_id=thread_id, run_id=run.id
+            )
+            polls += 1
+
+            if run_status.status == "completed":
+                if ticket is not None:
+                    ticket.settle(_run_usage(run_status))
+                break
+            elif run_status.status in RUN_FAILED_STATUSES:
+                _raise_run_failed(run_status)
+
+            await asyncio.sleep(delay)
+            delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+        polling.set("polls", polls)
+
+    reply = await _afetch_run_reply(thread_id, run.id, OPENAI_CLIENT)
+    if on_delta is not None:
+        await on_delta(reply)
+    return reply
+
+
+async def _afetch_run_reply(thread_id, run_id, OPENAI_CLIENT):
+    with span("openai.message_list", thread_id=thread_id, run_id=run_id):
+        messages = await OPENAI_CLIENT.beta.threads.messages.list(
+            thread_id=thread_id, run_id=run_id, order="desc", limit=1
+        )
+    return messages.data[0].content[0].text.value
+
+
+async def aappend_exchange(thread_id, user_input, reply, OPENAI_CLIENT=None):
+    """
+    Writes a user message and an assistant reply to the thread without a run, for
+    replies served from a cache. Leaves the thread as a real run would have.
+    """
+    OPENAI_CLIENT = OPENAI_CLIENT or get_async_client()
+
+    async def write(_):
+        with span("openai.append_exchange", thread_id=thread_id):
+            await OPENAI_CLIENT.beta.threads.messages.create(
+                thread_id=thread_id, role="user", content=user_input
+            )
+            await OPENAI_CLIENT.beta.threads.messages.create(
+                thread_id=thread_id, role="assistant", content=reply
+            )
+
+    await RUN_SCHEDULER.submit(thread_id, write)  # never between a run's message and its reply
+
+
+async def afetch_messages_after(thread_id, after=None, OPENAI_CLIENT=None):
+    """
+    Fetches the messages newer than the `after` message id (the whole thread when
+    None), oldest first, paging with the list cursor. Returns the raw messages;
+    the last one's id is the cursor for the next call.
+    """
+    OPENAI_CLIENT = OPENAI_CLIENT or get_async_client()
+    messages = []
+    while True:
+        with span("openai.message_list", thread_id=thread_id):
+            page = await OPENAI_CLIENT.beta.threads.messages.list(
+                thread_id=thread_id,
+                order="asc",
+                limit=MESSAGES_PAGE_SIZE,
+                **({"after": after} if after else {}),
+            )
+        messages.extend(page.data)
+        if not page.has_more or not page.data:
+            return messages
+        after = page.data[-1].id
+
+
+async def aget_all_messages_from_thread(thread_id, OPENAI_CLIENT):
+    """Every text message on the thread, oldest first (see thread_history for a cached view)."""
+    try:
+        return _format_text_messages(await afetch_messages_after(thread_id, None, OPENAI_CLIENT))
+    except Exception as e:
+        print(f"Error retrieving messages: {e}")
+        return []
+
+
+async def adelete_thread(thread_id, OPENAI_CLIENT):
+    try:
+        response = await OPENAI_CLIENT.beta.threads.delete(thread_id)
+        return response
+    except Exception as e:
+        print(f"Error deleting thread {thread_id}: {e}")
+        return None
+
+
 def get_thread_details(thread_id, OPENAI_CLIENT):
     try:
         thread_info = OPENAI_CLIENT.beta.threads.retrieve(thread_id)
@@ -112,41 +417,23 @@ def get_thread_details(thread_id, OPENAI_CLIENT):
         return None
 
 
-def contains_json_block(response_string: str) -> bool:
-    
-    # This regex is simpler because it only needs to check for the presence
-    # of the pattern, not necessarily capture the content for parsing yet.
-    # It looks for ```json followed by any characters (non-greedy) until ```
-    pattern = re.compile(r"```json.*?```", re.DOTALL)
-    return bool(pattern.search(response_string))
-
-
-def check_onboarding_file_present() -> bool:
+def count_tokens(text: str) -> int:
     """
-    Checks if the user_onboarding_data.json file exists.
+    Number of prompt tokens in text. Uses tiktoken when it is installed and its
+    encoding is available, otherwise estimates about four characters per token.
     """
-    return os.path.exists(ONBOARDING_FILE_PATH)
+    global _TOKEN_ENCODING
+    if _TOKEN_ENCODING is None:
+        try:
+            import tiktoken
+            _TOKEN_ENCODING = tiktoken.get_encoding(TOKEN_ENCODING_NAME)
+        except Exception:
+            _TOKEN_ENCODING = False
+    if _TOKEN_ENCODING:
+        return len(_TOKEN_ENCODING.encode(text))
+    return (len(text) + 3) // 4
 
-def check_milestones_file_present() -> bool:
-    """
-    Checks if the user_milestones.json file exists.
-    """
-    return os.path.exists(MILESTONES_FILE_PATH)
-
-def get_current_user_state() -> str:
-    """
-    Determines the current state of the user's journey based on the presence of
-    onboarding and milestones files.
 
-    Returns:
-        str: A string indicating the current state ('onboarding', 'milestones', 'career_coach').
-    """
-    onboarding_present = check_onboarding_file_present()
-    milestones_present = check_milestones_file_present()
-
-    if not onboarding_present:
-        return "onboarding"
-    elif onboarding_present and not milestones_present:
-        return "milestones"
-    else:  # both onboarding and milestones are present
-        return "career_coach"
\ No newline at end of file
+def contains_json_block(response_string: str) -> bool:
+    """Checks for a fenced ```json block; see structured_output for extraction."""
+    return structured_output.contains_json_block(response_string)
@@ -0,0 +1,156 @@
+import os
+import json
+import math
+import random
+import functools
+from collections import Counter
+
+from telemetry import span
+
+# Labelled utterances the router is trained on at startup. Logged LLM routing
+# decisions (see ROUTING_LOG_FILE) can be appended here in the same shape.
+ROUTING_EXAMPLES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "routing_examples.jsonl")
+
+# When set, MasterAIAgent appends every LLM routing decision here for offline evaluation
+ROUTING_LOG_FILE = os.getenv("ROUTING_LOG_FILE")
+
+# Below this probability the Master falls back to the LLM routing run
+ROUTER_CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.75"))
+
+# Routing labels from MASTER_AI_AGENT_INSTRUCTIONS; "respond_directly" stands for
+# out-of-scope messages, which always need the LLM to write the reply.
+ROUTING_LABELS = [
+    "onboarding_agent",
+    "career_coach",
+    "milestone_generator",
+    "skill_gap_analyzer",
+    "reflection_check_in_agent",
+    "respond_directly",
+]
+
+# How much each user state (ContextSnapshot.phase) favours a label
+STATE_PRIORS = {
+    "milestones": {"milestone_generator": 2.0},
+    "career_coach": {},
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _token_pattern():
+    import regex  # imported on first use, not at startup
+    return regex.compile(r"\w+")
+
+
+def tokenize(text: str) -> list:
+    """Lower-cased word unigrams and bigrams."""
+    words = _token_pattern().findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class IntentRouter:
+    """
+    TF-IDF features with a multinomial logistic regression over ROUTING_LABELS,
+    small enough to train in milliseconds at startup. route() returns a decision
+    in the Master's JSON schema plus a confidence, and the Master only calls its
+    LLM when that confidence is below the threshold.
+    """
+
+    def __init__(self, epochs: int = 30, learning_rate: float = 1.0, l2: float = 1e-2):
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.idf = {}
+        self.weights = {label: {} for label in ROUTING_LABELS}
+        self.bias = {label: 0.0 for label in ROUTING_LABELS}
+
+    @classmethod
+    def from_file(cls, path: str = ROUTING_EXAMPLES_FILE, **kwargs):
+        with open(path, "r", encoding="utf-8") as f:
+            examples = [json.loads(line) for line in f if line.strip()]
+        router = cls(**kwargs)
+        router.train(examples)
+        return router
+
+    def vectorize(self, text: str) -> dict:
+        counts = Counter(token for token in tokenize(text) if token in self.idf)
+        vector = {token: (1 + math.log(count)) * self.idf[token] for token, count in counts.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+        return {token: value / norm for token, value in vector.items()}
+
+    def train(self, examples: list):
+        """
+        Fits the model on [{"text": ..., "label": ...}] with stochastic gradient descent.
+        """
+        document_frequency = Counter()
+        for example in examples:
+            document_frequency.update(set(tokenize(example["text"])))
+        total = len(examples)
+        self.idf = {token: math.log((1 + total) / (1 + df)) + 1 for token, df in document_frequency.items()}
+
+        data = [(self.vectorize(example["text"]), example["label"]) for example in examples]
+        rng = random.Random(0)  # deterministic training order
+        for _ in range(self.epochs):
+            rng.shuffle(data)
+            for vector, label in data:
+                probabilities = self._probabilities(vector)
+                for candidate, probability in probabilities.items():
+                    error = probability - (1.0 if candidate == label else 0.0)
+                    self.bias[candidate] -= self.learning_rate * error
+                    weights = self.weights[candidate]
+                    for token, value in vector.items():
+                        weight = weights.get(token, 0.0)
+                        weights[token] = weight - self.learning_rate * (error * value + self.l2 * weight)
+
+    def _probabilities(self, vector: dict) -> dict:
+        scores = {}
+        for label in ROUTING_LABELS:
+            weights = self.weights[label]
+            scores[label] = self.bias[label] + sum(weights.get(token, 0.0) * value for token, value in vector.items())
+        top = max(scores.values())
+        exps = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exps.values())
+        return {label: value / total for label, value in exps.items()}
+
+    def predict(self, text: str, user_state: str | None = None) -> tuple:
+        """
+        Returns (label, probability) for a message, adjusted by the user's state.
+        """
+        if user_state == "onboarding":
+            # Nothing else can run until the profile exists
+            return "onboarding_agent", 1.0
+
+        probabilities = self._probabilities(self.vectorize(text))
+        priors = STATE_PRIORS.get(user_state, {})
+        if priors:
+            probabilities = {label: p * priors.get(label, 1.0) for label, p in probabilities.items()}
+            total = sum(probabilities.values())
+            probabilities = {label: p / total for label, p in probabilities.items()}
+        label = max(probabilities, key=probabilities.get)
+        return label, probabilities[label]
+
+    def route(self, user_input: str, user_state: str | None = None, threshold: float = ROUTER_CONFIDENCE_THRESHOLD):
+        """
+        Returns a routing decision in the Master's schema when the router is confident
+        enough to skip the LLM, otherwise None. Out-of-scope messages always return None
+        because their reply has to be written by the LLM.
+        """
+        label, confidence = self.predict(user_input, user_state)
+        if label == "respond_directly" or confidence < threshold:
+            return None
+        return {
+            "action": "call_agent",
+            "agent_to_call": label,
+            "message_for_agent": user_input,
+            "direct_response_message": None,
+            "transition_phase_to": None,
+            "confidence": confidence,
+        }
+
+
+def log_routing_decision(user_input: str, user_state: str, decision: dict):
+    """Appends an LLM routing decision to ROUTING_LOG_FILE, if logging is enabled."""
+    if not ROUTING_LOG_FILE or decision.get("action") == "call_agents":
+        return  # multi-agent turns have no single label to learn
+    label = decision.get("agent_to_call") if decision.get("action") == "call_agent" else "respond_directly"
+    with span("file.routing_log"), open(ROUTING_LOG_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"text": user_input, "state": user_state, "label": label}) + "\n")
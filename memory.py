@@ -0,0 +1,191 @@
+import os
+import json
+
+from helpers import get_async_client, acreate_thread, count_tokens
+from context_snapshot import summarize_profile
+from structured_output import extract_blocks
+from thread_history import HISTORY_CACHE
+from run_scheduler import RUN_SCHEDULER
+from thread_reaper import THREAD_REAPER
+
+# Tokens a thread may hold before the next turn starts on a compacted copy
+TIER_TOKEN_BUDGETS = {
+    "free": int(os.getenv("MEMORY_BUDGET_FREE", "2000")),
+    "premium": int(os.getenv("MEMORY_BUDGET_PREMIUM", "8000")),
+}
+# Turns kept verbatim after compaction (free users keep their last 3 chats, see
+# CAREER_COACH_INSTRUCTIONS); None keeps as many as fit in half the budget
+TIER_RECENT_TURNS = {"free": 3, "premium": None}
+# Share of the budget the running summary may use; its oldest lines go first
+SUMMARY_BUDGET_SHARE = 0.25
+
+SUMMARY_USER_CHARS = 120
+SUMMARY_REPLY_CHARS = 160
+MASTER_PROMPT_PREFIX = "User's Latest Message: '"
+MEMORY_PREFIX = "Conversation memory"
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+def _user_text(content: str) -> str:
+    # Master routing prompts carry the user's words quoted at the start
+    if content.startswith(MASTER_PROMPT_PREFIX):
+        return content[len(MASTER_PROMPT_PREFIX):].split("'\n", 1)[0]
+    return content
+
+
+def _reply_text(content: str) -> str:
+    headings = [block.heading or block.language or "data" for block in extract_blocks(content)]
+    prose = content.split("```", 1)[0].strip()
+    if headings:
+        prose = f"{prose} [structured output: {', '.join(headings)}]".strip()
+    return prose
+
+
+def split_turns(messages: list) -> list:
+    """Groups formatted thread messages into turns, each starting at a user message."""
+    turns = []
+    for message in messages:
+        if message["role"] == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def summarize_turn(turn: list) -> str:
+    """One extractive summary line: what the user asked and the last reply, clipped."""
+    user = next((m["content"] for m in turn if m["role"] == "user"), "")
+    reply = next((m["content"] for m in reversed(turn) if m["role"] == "assistant"), "")
+    line = f"User: {_clip(_user_text(user), SUMMARY_USER_CHARS)}"
+    if reply:
+        line += f" -> Assistant: {_clip(_reply_text(reply), SUMMARY_REPLY_CHARS)}"
+    return line
+
+
+def memory_message(pinned: dict, summary: list) -> str:
+    """The message a compacted (or restored) thread starts with."""
+    return (
+        f"{MEMORY_PREFIX} (earlier turns were compacted to stay within the context budget).\n"
+        f"Pinned facts: {json.dumps(pinned, ensure_ascii=False)}\n"
+        "Summary of the earlier conversation, oldest first:\n"
+        + "\n".join(f"- {line}" for line in summary)
+    )
+
+
+def pinned_facts(session) -> dict:
+    """Facts that survive every compaction: profile, selected path and milestone ids."""
+    context = session.context
+    if context is not None and context.fields["user_onboarding_data_exists"]:
+        facts = {
+            "profile": context.fields["user_onboarding_data_summary"],
+            "selected_career_path": context.fields["selected_career_path"],
+        }
+        if context.fields["current_milestones"]:
+            facts["milestones"] = [f"{m.get('id')}: {m.get('title', '')}" for m in context.fields["current_milestones"]]
+        return facts
+    profile = session.data.get("user_onboarding_data")
+    return {"profile": summarize_profile(profile)} if profile else {}
+
+
+class ConversationMemory:
+    """Per-session memory state, kept on session.memory."""
+
+    def __init__(self):
+        self.summary = []  # running summary, one line per compacted turn
+        self.counted = 0  # messages of the current thread already counted
+        self.thread_tokens = 0
+
+
+class MemoryManager:
+    """
+    Keeps each session's thread within its tier's token budget. Before a turn,
+    prepare() measures the thread (through the incremental history cache) and, if
+    it is over budget, moves the session to a new thread seeded with the pinned
+    facts, a running summary of older turns and the most recent turns verbatim.
+    Runs then re-read a bounded prompt however long the conversation gets.
+    """
+
+    def __init__(self, budgets: dict = None, recent_turns: dict = None, history=HISTORY_CACHE, OPENAI_CLIENT=None):
+        self.budgets = budgets or TIER_TOKEN_BUDGETS
+        self.recent_turns = recent_turns or TIER_RECENT_TURNS
+        self.history = history
+        self.OPENAI_CLIENT = OPENAI_CLIENT
+        self.compactions = 0
+
+    @staticmethod
+    def _memory(session) -> ConversationMemory:
+        if session.memory is None:
+            session.memory = ConversationMemory()
+        return session.memory
+
+    async def thread_tokens(self, session) -> int:
+        """Tokens currently on the session's thread, counting only new messages."""
+        memory = self._memory(session)
+        messages = await self.history.get_messages(session.thread_id)
+        for message in messages[memory.counted:]:
+            memory.thread_tokens += count_tokens(message["content"])
+        memory.counted = len(messages)
+        return memory.thread_tokens
+
+    async def prepare(self, session) -> bool:
+        """Compacts the session's thread if it is over budget. Returns True if it did."""
+        budget = self.budgets.get(session.tier, self.budgets["free"])
+        if await self.thread_tokens(session) <= budget:
+            return False
+        pinned = pinned_facts(session)
+        if not pinned:
+            return False  # onboarding answers are still needed verbatim
+        async with RUN_SCHEDULER.exclusive(session.thread_id):  # no run may land mid-copy
+            await self._compact(session, budget, pinned)
+        return True
+
+    async def _compact(self, session, budget: int, pinned: dict):
+        memory = self._memory(session)
+        client = self.OPENAI_CLIENT or get_async_client()
+        turns = split_turns(await self.history.get_messages(session.thread_id))
+
+        # Most recent turns stay verbatim: at most the tier's count, within half the budget
+        keep_limit = self.recent_turns.get(session.tier)
+        recent, recent_tokens = [], 0
+        for turn in reversed(turns):
+            if turn[0]["content"].startswith(MEMORY_PREFIX):
+                break  # the previous memory message is rebuilt, never kept verbatim
+            tokens = sum(count_tokens(m["content"]) for m in turn)
+            if (keep_limit is not None and len(recent) >= keep_limit) or recent_tokens + tokens > budget // 2:
+                break
+            recent.insert(0, turn)
+            recent_tokens += tokens
+        older = turns[:len(turns) - len(recent)]
+
+        for turn in older:
+            if turn[0]["content"].startswith(MEMORY_PREFIX):
+                continue  # already summarized into memory.summary
+            memory.summary.append(summarize_turn(turn))
+        summary_budget = int(budget * SUMMARY_BUDGET_SHARE)
+        while len(memory.summary) > 1 and count_tokens("\n".join(memory.summary)) > summary_budget:
+            memory.summary.pop(0)
+
+        seed = memory_message(pinned, memory.summary)
+        old_thread_id = session.thread_id
+        new_thread_id = await acreate_thread(client)
+        await client.beta.threads.messages.create(thread_id=new_thread_id, role="user", content=seed)
+        for turn in recent:
+            for message in turn:
+                await client.beta.threads.messages.create(
+                    thread_id=new_thread_id, role=message["role"], content=message["content"]
+                )
+
+        session.thread_id = new_thread_id
+        if session.context is not None:
+            session.context.reset_delivery()  # the Master's new thread has not seen the context
+        memory.counted = 0
+        memory.thread_tokens = 0
+        self.history.forget(old_thread_id)
+        self.compactions += 1
+        THREAD_REAPER.schedule(old_thread_id, client)
+
+
+MEMORY = MemoryManager()
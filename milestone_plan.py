@@ -0,0 +1,109 @@
+import json
+import re
+
+# Milestones on each side of the target sent with a regeneration request
+REGENERATION_NEIGHBOURS = 1
+
+# A message asking for something to be done over, rather than for a new plan or advice
+_REGENERATION_INTENT = re.compile(r"\b(?:regenerat|re-?do|replac|chang)\w*", re.IGNORECASE)
+
+
+def _compact(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+class MilestonePlan:
+    """
+    A user's milestone plan indexed by milestone id, in plan order.
+
+    apply() takes Milestone Generator / Career Coach output as-is: a full plan
+    ('milestones' list) replaces the plan, a regeneration ('milestone' object)
+    replaces that one milestone in place. Each applied change is one entry of the
+    append-only edit log the user store keeps (see UserStore.append_milestone_edit),
+    so a regeneration writes one milestone rather than the whole plan.
+    """
+
+    def __init__(self):
+        self.milestones = {}  # id -> milestone, in plan order
+        self.header = {}  # every top-level field except the milestones ('type', 'career_path', ...)
+        self.version = 0  # seq of the last edit applied
+
+    @classmethod
+    def from_data(cls, data: dict, version: int = 0):
+        plan = cls()
+        plan.apply(data)
+        plan.version = version
+        return plan
+
+    def apply(self, data: dict) -> list:
+        """Applies a full plan or a single regenerated milestone. Returns the changed ids."""
+        if isinstance(data.get("milestones"), list):
+            milestones = {}
+            for index, milestone in enumerate(data["milestones"], start=1):
+                milestone = dict(milestone)
+                milestone.setdefault("id", f"M{index}")
+                milestones[milestone["id"]] = milestone
+            changed = [mid for mid in milestones if self.milestones.get(mid) != milestones[mid]]
+            changed += [mid for mid in self.milestones if mid not in milestones]
+            self.milestones = milestones
+            self.header = {key: value for key, value in data.items() if key != "milestones"}
+        elif isinstance(data.get("milestone"), dict):
+            milestone = data["milestone"]
+            mid = milestone.get("id")
+            if mid not in self.milestones or self.milestones[mid] == milestone:
+                return []  # regenerations only ever replace an existing milestone
+            self.milestones[mid] = dict(milestone)
+            changed = [mid]
+        else:
+            return []
+        self.version += 1
+        return changed
+
+    def to_data(self) -> dict:
+        """The plan in the Milestone Generator's initial_generation format."""
+        return dict(self.header, milestones=list(self.milestones.values()))
+
+    def find_target(self, text: str):
+        """
+        Id of the first milestone of this plan that the text asks to regenerate, or None.
+        Only this plan's ids count, exactly as written ("M2", not "m2" or "milestone 2"),
+        and only when the text asks to regenerate, redo, replace or change something, so
+        "my M1 MacBook" or a request for a new plan is not taken for a regeneration.
+        """
+        if not self.milestones or not _REGENERATION_INTENT.search(text):
+            return None
+        ids = "|".join(re.escape(mid) for mid in self.milestones)
+        match = re.search(rf"(?<![\w-])(?:{ids})(?![\w-])", text)
+        return match.group(0) if match else None
+
+    def neighbours(self, milestone_id: str, radius: int = REGENERATION_NEIGHBOURS) -> tuple:
+        """The milestones up to `radius` positions before and after the given one."""
+        ids = list(self.milestones)
+        position = ids.index(milestone_id)
+        before = [self.milestones[mid] for mid in ids[max(0, position - radius):position]]
+        after = [self.milestones[mid] for mid in ids[position + 1:position + 1 + radius]]
+        return before, after
+
+    def regeneration_request(self, milestone_id: str, user_input: str, radius: int = REGENERATION_NEIGHBOURS) -> str:
+        """
+        The Milestone Generator message for regenerating one milestone: the user's
+        request, the target milestone in full and its neighbours for sequence, instead
+        of the complete plan.
+        """
+        before, after = self.neighbours(milestone_id, radius)
+        outline = lambda milestones: _compact([
+            {key: m[key] for key in ("id", "title", "estimated_time_weeks") if key in m} for m in milestones
+        ])
+        path = self.header.get("career_path") or self.header.get("career_path_selected")
+        lines = [
+            user_input,
+            "",
+            f"Milestone to regenerate ({milestone_id} of {len(self.milestones)}"
+            + (f", career path '{path}'" if path else "") + "):",
+            _compact(self.milestones[milestone_id]),
+        ]
+        if before:
+            lines.append(f"Comes after: {outline(before)}")
+        if after:
+            lines.append(f"Comes before: {outline(after)}")
+        return "\n".join(lines)
@@ -0,0 +1,227 @@
+"""
+Career-path shortlists from a local vector index.
+
+The catalogue (career_paths.jsonl: title, description, skills) is embedded offline
+into one contiguous float32 matrix, saved as .npy and memory-mapped at load, with
+its titles and descriptions alongside in a .json file:
+
+    python path_catalogue.py build [career_paths.jsonl] [path_catalogue.npy]
+
+get_path_catalogue() builds both files on first use when they are missing or were
+built from a different catalogue. A profile is embedded the same way and scored against every
+row by cosine similarity, chunk by chunk, so the agents suggesting paths choose from
+a shortlist instead of the whole space.
+"""
+import os
+import sys
+import json
+import zlib
+import hashlib
+import functools
+import threading
+
+from prompts import PATH_SHORTLIST_NOTE
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Career paths the index is built from, one JSON object per line
+PATH_CATALOGUE_SOURCE = os.getenv("PATH_CATALOGUE_SOURCE", os.path.join(_ROOT, "career_paths.jsonl"))
+
+# The built matrix; its titles and descriptions go in the .json file of the same name
+PATH_CATALOGUE_FILE = os.getenv("PATH_CATALOGUE_FILE", os.path.join(_ROOT, "path_catalogue.npy"))
+
+# Width of the hashed feature vectors
+PATH_VECTOR_DIM = int(os.getenv("PATH_VECTOR_DIM", "512"))
+
+# Paths offered to the agent to choose from
+PATH_SHORTLIST_SIZE = int(os.getenv("PATH_SHORTLIST_SIZE", "8"))
+
+# How much similarity to the profile's roles_to_avoid counts against a path
+PATH_AVOID_WEIGHT = float(os.getenv("PATH_AVOID_WEIGHT", "0.5"))
+
+# Add the shortlist to path-suggestion requests (false: the model considers every path)
+PATH_SHORTLIST_ENABLED = os.getenv("PATH_SHORTLIST_ENABLED", "true").lower() == "true"
+
+# Rows scored per matrix product; bounds memory on large catalogues
+PATH_SEARCH_CHUNK_ROWS = int(os.getenv("PATH_SEARCH_CHUNK_ROWS", "65536"))
+
+# Profile fields describing what the user wants, and the one saying what they don't
+PROFILE_WANT_FIELDS = ("career_goals", "short_long_term_vision", "skills_to_improve", "preferred_work_environment")
+PROFILE_AVOID_FIELD = "roles_to_avoid"
+
+_STOPWORDS = frozenset(
+    "a an and are as at be become but by can do for from get have i in into is it its like me more my "
+    "no not of on or so some that the their them they this to want which who will with would".split()
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _word_pattern():
+    import regex  # imported on first use, not at startup
+    return regex.compile(r"[\w+#]+")
+
+
+def features(text: str) -> list:
+    """Words, word pairs and 5-letter word stems ('engineer' and 'engineering' share 'engin')."""
+    words = [word for word in _word_pattern().findall(text.lower()) if word not in _STOPWORDS]
+    stems = [f"~{word[:5]}" for word in words if len(word) > 5]
+    return words + stems + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def embed(texts: list, dim: int = PATH_VECTOR_DIM):
+    """
+    One L2-normalized float32 row per text: features hashed into `dim` signed buckets
+    with sublinear counts. Stable across processes (crc32, not hash()).
+    """
+    import numpy as np
+
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        counts = {}
+        for feature in features(text):
+            counts[feature] = counts.get(feature, 0) + 1
+        for feature, count in counts.items():
+            code = zlib.crc32(feature.encode("utf-8"))
+            matrix[row, code % dim] += (1.0 if code & 0x80000000 else -1.0) * (1.0 + np.log(count))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def path_text(entry: dict) -> str:
+    return f"{entry['title']}. {entry.get('description', '')} Skills: {', '.join(entry.get('skills', []))}"
+
+
+def profile_queries(profiles: list, dim: int = PATH_VECTOR_DIM, avoid_weight: float = PATH_AVOID_WEIGHT):
+    """
+    One query row per profile. Cosine similarity is linear in the query, so "like the
+    wanted fields, unlike roles_to_avoid" is the single vector want - weight * avoid.
+    """
+    want = embed([" ".join(str(profile.get(key) or "") for key in PROFILE_WANT_FIELDS) for profile in profiles], dim)
+    avoid = embed([str(profile.get(PROFILE_AVOID_FIELD) or "") for profile in profiles], dim)
+    return want - avoid_weight * avoid
+
+
+class PathCatalogue:
+    """
+    `matrix` is an (entries, dim) float32 array, usually a read-only memmap of the .npy
+    file; `entries` holds each row's title and description. search() is batched over
+    queries and streams the matrix in PATH_SEARCH_CHUNK_ROWS slices, keeping a running
+    top-k per query, so a catalogue larger than memory is read once per batch.
+    """
+
+    def __init__(self, matrix, entries: list):
+        self.matrix = matrix
+        self.entries = entries
+
+    @classmethod
+    def build(cls, source: str = PATH_CATALOGUE_SOURCE, path: str = PATH_CATALOGUE_FILE, dim: int = PATH_VECTOR_DIM):
+        """Embeds the catalogue and writes the matrix and its metadata; returns the loaded catalogue."""
+        import numpy as np
+
+        with open(source, "rb") as f:
+            content = f.read()
+        entries = [json.loads(line) for line in content.decode("utf-8").splitlines() if line.strip()]
+        matrix = embed([path_text(entry) for entry in entries], dim)
+        meta = {
+            "source_sha256": hashlib.sha256(content).hexdigest(),
+            "dim": dim,
+            "entries": [{"title": entry["title"], "description": entry.get("description", "")} for entry in entries],
+        }
+        # Written aside and renamed, so a concurrent reader never maps half a file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        np.save(f"{tmp}.npy", matrix)
+        with open(f"{tmp}.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(f"{tmp}.npy", path)
+        os.replace(f"{tmp}.json", _meta_path(path))
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path: str = PATH_CATALOGUE_FILE):
+        import numpy as np
+
+        with open(_meta_path(path), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(np.load(path, mmap_mode="r"), meta["entries"])
+
+    def search(self, queries, k: int = PATH_SHORTLIST_SIZE, chunk_rows: int = PATH_SEARCH_CHUNK_ROWS):
+        """
+        Top-k rows for each query row, best first: (indices, scores), both (queries, k).
+        Scores are dot products, i.e. cosines for unit-length queries.
+        """
+        import numpy as np
+
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        k = min(k, len(self.matrix))
+        best_index = np.empty((len(queries), 0), dtype=np.int64)
+        best_score = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self.matrix), chunk_rows):
+            scores = queries @ self.matrix[start:start + chunk_rows].T  # (queries, rows)
+            if scores.shape[1] > k:
+                top = np.argpartition(scores, -k, axis=1)[:, -k:]
+                scores = np.take_along_axis(scores, top, axis=1)
+            else:
+                top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            best_index = np.concatenate([best_index, top + start], axis=1)
+            best_score = np.concatenate([best_score, scores], axis=1)
+            if best_index.shape[1] > k:
+                keep = np.argpartition(best_score, -k, axis=1)[:, -k:]
+                best_index = np.take_along_axis(best_index, keep, axis=1)
+                best_score = np.take_along_axis(best_score, keep, axis=1)
+        order = np.argsort(-best_score, axis=1, kind="stable")
+        return np.take_along_axis(best_index, order, axis=1), np.take_along_axis(best_score, order, axis=1)
+
+    def shortlist(self, profiles: list, k: int = PATH_SHORTLIST_SIZE) -> list:
+        """For each profile, its k closest paths as {"title", "description", "score"}, best first."""
+        indices, scores = self.search(profile_queries(profiles, self.matrix.shape[1]), k)
+        return [
+            [dict(self.entries[i], score=round(float(score), 3)) for i, score in zip(row_indices, row_scores)]
+            for row_indices, row_scores in zip(indices, scores)
+        ]
+
+
+def _meta_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+
+def _is_current(source: str, path: str, dim: int) -> bool:
+    if not (os.path.exists(path) and os.path.exists(_meta_path(path))):
+        return False
+    with open(source, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    with open(_meta_path(path), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return meta.get("source_sha256") == digest and meta.get("dim") == dim
+
+
+_shared_catalogue = None
+_shared_catalogue_lock = threading.Lock()  # shortlists run in worker threads; build once
+
+
+def get_path_catalogue() -> PathCatalogue:
+    """Returns the process-wide catalogue, building its index first if it is missing or stale."""
+    global _shared_catalogue
+    if _shared_catalogue is None:
+        with _shared_catalogue_lock:
+            if _shared_catalogue is None and _is_current(PATH_CATALOGUE_SOURCE, PATH_CATALOGUE_FILE, PATH_VECTOR_DIM):
+                _shared_catalogue = PathCatalogue.load(PATH_CATALOGUE_FILE)
+            elif _shared_catalogue is None:
+                print(f"Path catalogue: building {PATH_CATALOGUE_FILE} from {PATH_CATALOGUE_SOURCE}")
+                _shared_catalogue = PathCatalogue.build(PATH_CATALOGUE_SOURCE, PATH_CATALOGUE_FILE, PATH_VECTOR_DIM)
+    return _shared_catalogue
+
+
+def shortlist_note(profile: dict, k: int = PATH_SHORTLIST_SIZE) -> str:
+    """The shortlist for one profile, as the note appended to a path-suggestion request."""
+    paths = get_path_catalogue().shortlist([profile], k)[0]
+    return PATH_SHORTLIST_NOTE.format(paths="\n".join(f"- {path['title']}: {path['description']}" for path in paths))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        sys.exit("usage: python path_catalogue.py build [career_paths.jsonl] [path_catalogue.npy]")
+    source = sys.argv[2] if len(sys.argv) > 2 else PATH_CATALOGUE_SOURCE
+    target = sys.argv[3] if len(sys.argv) > 3 else PATH_CATALOGUE_FILE
+    catalogue = PathCatalogue.build(source, target)
+    print(f"{len(catalogue.entries)} career paths, {catalogue.matrix.shape[1]} dimensions -> {target}")
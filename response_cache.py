@@ -0,0 +1,166 @@
+import os
+import time
+import zlib
+import random
+import functools
+from collections import OrderedDict
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+PROFILE_CACHE_MAX_ENTRIES = int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "512"))
+PROFILE_CACHE_SIMILARITY = float(os.getenv("PROFILE_CACHE_SIMILARITY", "0.8"))
+
+
+@functools.lru_cache(maxsize=None)
+def _pattern(expression: str):
+    import regex  # imported on first use, not at startup
+    return regex.compile(expression)
+
+
+def normalize_text(text: str) -> str:
+    return _pattern(r"\s+").sub(" ", text).strip().lower()
+
+
+class ResponseCache:
+    """
+    Exact-match tier: a bounded LRU with a per-entry TTL, keyed by agent name,
+    instruction version and normalized input.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(agent_name: str, instruction_version: str, user_input: str) -> tuple:
+        return (agent_name.strip().lower(), instruction_version, normalize_text(user_input))
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class NearDuplicateCache:
+    """
+    Near-duplicate tier: MinHash signatures over word shingles with LSH banding, so a
+    new profile finds prior entries whose estimated Jaccard similarity is at least
+    `similarity` without comparing against every entry. Bounded LRU like ResponseCache.
+    """
+
+    _PRIME = (1 << 61) - 1
+
+    def __init__(self, max_entries: int = PROFILE_CACHE_MAX_ENTRIES, similarity: float = PROFILE_CACHE_SIMILARITY,
+                 num_perm: int = 64, bands: int = 16, shingle_size: int = 2):
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = random.Random(1)  # fixed permutations so signatures are stable
+        self._perms = [(rng.randrange(1, self._PRIME), rng.randrange(0, self._PRIME)) for _ in range(num_perm)]
+        self._entries = OrderedDict()  # entry id -> (namespace, signature, value)
+        self._buckets = {}  # (namespace, band, band hash) -> set of entry ids
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _shingles(self, text: str) -> set:
+        words = _pattern(r"\w+").findall(normalize_text(text))
+        if len(words) < self.shingle_size:
+            return {" ".join(words)}
+        return {" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+    def signature(self, text: str) -> tuple:
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in self._shingles(text)]
+        return tuple(min((a * h + b) % self._PRIME for h in hashes) for a, b in self._perms)
+
+    def _band_keys(self, namespace, signature):
+        for band in range(self.bands):
+            yield (namespace, band, hash(signature[band * self.rows:(band + 1) * self.rows]))
+
+    def get(self, namespace, text: str):
+        """Returns the value of the most similar entry at or above the threshold, else None."""
+        signature = self.signature(text)
+        candidates = set()
+        for band_key in self._band_keys(namespace, signature):
+            candidates |= self._buckets.get(band_key, set())
+
+        best_id, best_similarity = None, self.similarity
+        for entry_id in candidates:
+            _, other, _ = self._entries[entry_id]
+            similarity = sum(x == y for x, y in zip(signature, other)) / len(signature)
+            if similarity >= best_similarity:
+                best_id, best_similarity = entry_id, similarity
+
+        if best_id is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(best_id)
+        self.hits += 1
+        return self._entries[best_id][2]
+
+    def set(self, namespace, text: str, value):
+        signature = self.signature(text)
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (namespace, signature, value)
+        for band_key in self._band_keys(namespace, signature):
+            self._buckets.setdefault(band_key, set()).add(entry_id)
+        while len(self._entries) > self.max_entries:
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        entry_id, (namespace, signature, _) = self._entries.popitem(last=False)
+        for band_key in self._band_keys(namespace, signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[band_key]
+        self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# Process-wide caches shared by all agents and sessions
+RESPONSE_CACHE = ResponseCache()
+PROFILE_CACHE = NearDuplicateCache()
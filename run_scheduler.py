@@ -0,0 +1,158 @@
+import time
+import asyncio
+import contextlib
+from collections import deque
+
+# Recent queue waits kept for percentiles
+RUN_SCHEDULER_WAIT_SAMPLES = 2048
+
+
+class RunCoalesced(Exception):
+    """
+    Raised to a submission whose message was folded into the run of an earlier queued
+    one; that earlier caller receives the reply, which answers both messages.
+    """
+
+
+class _Submission:
+    def __init__(self, operation, message, coalesce_key):
+        self.operation = operation
+        self.messages = [message]
+        self.coalesce_key = coalesce_key
+        self.future = asyncio.get_running_loop().create_future()
+        self.submitted_at = time.perf_counter()
+
+
+def _resolve_with(submissions, error: BaseException):
+    """Ends each pending submission with `error`, or cancels it if that is a cancellation."""
+    for submission in submissions:
+        if submission.future.done():
+            continue
+        if isinstance(error, asyncio.CancelledError):
+            submission.future.cancel()
+        else:
+            submission.future.set_exception(error)
+
+
+class RunScheduler:
+    """
+    Serializes everything that needs a thread to itself: one run (or one write that
+    must not land mid-run) per thread at a time, in submission order. The Assistants
+    API rejects a new run or message while a run is active, so concurrent callers on
+    one thread are queued here instead of failing.
+
+    Consecutive queued submissions with the same coalesce_key (user messages to the
+    same assistant) go out as one run with their messages joined; the first caller
+    gets the reply and the others RunCoalesced.
+    """
+
+    def __init__(self, wait_samples: int = RUN_SCHEDULER_WAIT_SAMPLES):
+        self._queues = {}  # thread_id -> deque of _Submission
+        self._workers = {}  # thread_id -> task draining that queue
+        self._running = set()  # threads with a submission in progress
+        self._waits = deque(maxlen=wait_samples)  # seconds from submit to start
+        self.submitted = 0
+        self.started = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+    async def submit(self, thread_id, operation, message=None, coalesce_key=None):
+        """
+        Queues `await operation(message)` on the thread and returns its result. With a
+        coalesce_key, `message` (a string) may be merged with the next queued ones.
+        """
+        submission = _Submission(operation, message, coalesce_key)
+        queue = self._queues.setdefault(thread_id, deque())
+        queue.append(submission)
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, self.depth(thread_id))
+        if thread_id not in self._workers:
+            self._workers[thread_id] = asyncio.create_task(self._drain(thread_id))
+        try:
+            return await asyncio.shield(submission.future)
+        except asyncio.CancelledError:
+            # The run goes on without its caller; consume its outcome so a failure isn't logged as unretrieved
+            submission.future.add_done_callback(lambda future: future.cancelled() or future.exception())
+            raise
+
+    @contextlib.asynccontextmanager
+    async def exclusive(self, thread_id):
+        """Holds the thread's slot for the body, e.g. to write messages between runs."""
+        entered, release = asyncio.Event(), asyncio.Event()
+
+        async def hold(_):
+            entered.set()
+            await release.wait()
+
+        held = asyncio.create_task(self.submit(thread_id, hold))
+        try:
+            await entered.wait()
+            yield
+        finally:
+            release.set()
+            await held
+
+    def depth(self, thread_id) -> int:
+        """Submissions waiting or running on the thread."""
+        return len(self._queues.get(thread_id, ())) + (thread_id in self._running)
+
+    async def _drain(self, thread_id):
+        queue = self._queues[thread_id]
+        try:
+            while queue:
+                head = queue.popleft()
+                followers = []
+                if head.coalesce_key is not None:
+                    while queue and queue[0].coalesce_key == head.coalesce_key:
+                        follower = queue.popleft()
+                        head.messages.append(follower.messages[0])
+                        followers.append(follower)
+                started = time.perf_counter()
+                for submission in [head, *followers]:
+                    self._waits.append(started - submission.submitted_at)
+                self.started += 1
+                self.coalesced += len(followers)
+
+                message = "\n\n".join(head.messages) if followers else head.messages[0]
+                self._running.add(thread_id)
+                try:
+                    result = await head.operation(message)
+                except Exception as e:
+                    _resolve_with([head, *followers], e)
+                    continue
+                except BaseException as e:
+                    # Cancelled (e.g. at shutdown) or worse: no awaiter may be left waiting, queued ones included
+                    _resolve_with([head, *followers, *queue], e)
+                    queue.clear()
+                    raise
+                finally:
+                    self._running.discard(thread_id)
+                if not head.future.done():
+                    head.future.set_result(result)
+                for follower in followers:
+                    if not follower.future.done():
+                        follower.future.set_exception(RunCoalesced(
+                            f"Merged into the run answering the message queued before it on {thread_id}"
+                        ))
+        finally:
+            del self._queues[thread_id]
+            del self._workers[thread_id]
+
+    def stats(self) -> dict:
+        """Queue depth and wait-time figures, e.g. for logs or a metrics endpoint."""
+        waits = sorted(self._waits)
+        percentile = lambda q: round(waits[min(len(waits) - 1, int(q * len(waits)))] * 1000, 2) if waits else 0.0
+        return {
+            "threads_busy": len(self._running),
+            "queued": sum(len(queue) for queue in self._queues.values()),
+            "max_depth": self.max_depth,
+            "submitted": self.submitted,
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "wait_p50_ms": percentile(0.50),
+            "wait_p95_ms": percentile(0.95),
+            "wait_max_ms": round(waits[-1] * 1000, 2) if waits else 0.0,
+        }
+
+
+RUN_SCHEDULER = RunScheduler()
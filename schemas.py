@@ -0,0 +1,310 @@
+import os
+import json
+
+from structured_output import StructuredBlock, find_json_block
+from telemetry import traced
+
+# Send schemas marked strict as the assistant's response_format (JSON schema, strict mode);
+# turn off for models or backends without structured outputs
+STRICT_SCHEMAS = os.getenv("STRICT_SCHEMAS", "true").lower() == "true"
+# Validation errors reported per response; the rest are counted
+SCHEMA_MAX_ERRORS = 5
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+def _nullable(schema: dict) -> bool:
+    types = schema.get("type")
+    return types == "null" or (isinstance(types, list) and "null" in types)
+
+
+def _path(path) -> str:
+    """'$.milestones[2].title' from the (parent, key) chain built while validating."""
+    parts = []
+    while path is not None:
+        path, key = path
+        parts.append(f"[{key}]" if isinstance(key, int) else f".{key}")
+    return "$" + "".join(reversed(parts))
+
+
+def _leaf_types(schema: dict):
+    """Exact Python types of a value that needs no further checks, for an inline type() test; else None."""
+    if any(key in schema for key in ("enum", "properties", "items")) or "type" not in schema:
+        return None
+    types = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+    exact = {"object": (dict,), "array": (list,), "string": (str,), "integer": (int,),
+             "number": (int, float), "boolean": (bool,), "null": (type(None),)}
+    return frozenset(t for name in types for t in exact[name])
+
+
+def _compile(schema: dict):
+    """
+    Turns a JSON Schema (the subset these contracts use: type, enum, properties,
+    required, items, default) into a closure check(value, path, errors) -> value, built
+    once so validating a response is a single walk with no schema interpretation.
+    Values of plain types are checked inline by their parent, and paths are only
+    formatted for errors. The returned value carries the repairs:
+    missing properties filled from their default (or None when nullable), numeric
+    strings where a number is expected.
+    """
+    types = schema.get("type")
+    types = tuple(types) if isinstance(types, list) else (types,) if types else ()
+    python_types = tuple(t for name in types for t in (_TYPES[name] if isinstance(_TYPES[name], tuple) else (_TYPES[name],)))
+    allows_bool = "boolean" in types
+    numeric = "integer" in types or "number" in types
+    enum = frozenset(schema["enum"]) if "enum" in schema else None
+
+    properties = [(name, _compile(sub), _leaf_types(sub)) for name, sub in schema.get("properties", {}).items()]
+    required = frozenset(schema.get("required", ()))
+    fill = {}  # missing optional or nullable property -> value it gets
+    for name, sub in schema.get("properties", {}).items():
+        if "default" in sub:
+            fill[name] = sub["default"]
+        elif _nullable(sub):
+            fill[name] = None
+    items = _compile(schema["items"]) if "items" in schema else None
+    item_types = _leaf_types(schema["items"]) if "items" in schema else None
+
+    def check(value, path, errors):
+        if python_types and (not isinstance(value, python_types) or (value is True or value is False) and not allows_bool):
+            if numeric and isinstance(value, str):
+                try:
+                    number = float(value)
+                except ValueError:
+                    number = None
+                if number is None or not (number.is_integer() or "number" in types):
+                    errors.append(f"{_path(path)}: expected {' or '.join(types)}, got {value!r}")
+                    return value
+                value = int(number) if number.is_integer() else number
+            else:
+                errors.append(f"{_path(path)}: expected {' or '.join(types)}, got {type(value).__name__}")
+                return value
+        if enum is not None and value not in enum:
+            errors.append(f"{_path(path)}: {value!r} is not one of {sorted(enum, key=str)}")
+        if properties and type(value) is dict:
+            for name, check_property, leaf in properties:
+                if name in value:
+                    if leaf is None or type(value[name]) not in leaf:
+                        value[name] = check_property(value[name], (path, name), errors)
+                elif name in fill:
+                    default = fill[name]
+                    value[name] = default.copy() if isinstance(default, (list, dict)) else default
+                elif name in required:
+                    errors.append(f"{_path(path)}: missing '{name}'")
+        elif items is not None and type(value) is list:
+            for index, item in enumerate(value):
+                if item_types is None or type(item) not in item_types:
+                    value[index] = items(item, (path, index), errors)
+        return value
+
+    return check
+
+
+def _without_defaults(schema):
+    if isinstance(schema, dict):
+        return {key: _without_defaults(value) for key, value in schema.items() if key != "default"}
+    if isinstance(schema, list):
+        return [_without_defaults(value) for value in schema]
+    return schema
+
+
+class Schema:
+    """
+    One agent output contract, declared once as JSON Schema and compiled into a
+    validator at import. Properties outside the schema are kept, not reported.
+
+    Attributes:
+        name: Schema name, also the response_format name.
+        schema: The JSON Schema.
+        strict: Declared in the form strict structured outputs accept (every property
+            required, none added), so it can be sent as the assistant's response_format.
+    """
+
+    def __init__(self, name: str, schema: dict, strict: bool = False):
+        self.name = name
+        self.schema = schema
+        self.strict = strict
+        self._check = _compile(schema)
+
+    def validate(self, data) -> list:
+        """Validates and repairs `data` in place. Returns the errors left, empty when valid."""
+        errors = []
+        self._check(data, None, errors)
+        if len(errors) > SCHEMA_MAX_ERRORS:
+            errors = errors[:SCHEMA_MAX_ERRORS] + [f"... and {len(errors) - SCHEMA_MAX_ERRORS} more"]
+        return errors
+
+    @traced("json.validate")
+    def find(self, text: str, heading: str = None, allow_unfenced: bool = False):
+        """
+        The response's JSON block, parsed and validated in one pass. A response that is
+        the JSON value itself (structured outputs) is parsed directly; otherwise the
+        block is found as structured_output.find_json_block does. Returns (block, errors):
+        block is None when the response has no JSON, errors empty when block.data is valid.
+        """
+        stripped = text.strip()
+        block = None
+        if stripped[:1] == "{" and heading is None:
+            try:
+                block = StructuredBlock(None, "", stripped, json.loads(stripped))
+            except json.JSONDecodeError:
+                pass
+        if block is None:
+            block = find_json_block(text, heading=heading, allow_unfenced=allow_unfenced)
+        if block is None:
+            return None, ["no JSON block"]
+        if block.error:
+            return block, [block.error]
+        return block, self.validate(block.data)
+
+    def response_format(self) -> dict:
+        """The schema as a strict json_schema response_format for the Assistants API."""
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": self.name, "schema": _without_defaults(self.schema), "strict": True},
+        }
+
+    def describe(self) -> str:
+        """The schema in the compact notation of the agent instructions: "a" | "b" | null."""
+        return _describe(self.schema, "")
+
+
+def _describe(schema: dict, indent: str) -> str:
+    types = schema.get("type")
+    types = types if isinstance(types, list) else [types]
+    if "enum" in schema:
+        return " | ".join(json.dumps(value) for value in schema["enum"])
+    if "object" in types:
+        inner = indent + "    "
+        fields = ",\n".join(f'{inner}"{name}": {_describe(sub, inner)}' for name, sub in schema["properties"].items())
+        described = f"{{\n{fields}\n{indent}}}"
+    elif "array" in types:
+        described = f"[{_describe(schema['items'], indent)}]" if "items" in schema else "[...]"
+    else:
+        described = " | ".join(f'"{name}"' for name in types if name != "null")
+    return f"{described} | null" if "null" in types else described
+
+
+def _object(properties: dict, required=None, **extra) -> dict:
+    return dict(
+        {"type": "object", "properties": properties, "required": list(properties if required is None else required),
+         "additionalProperties": False},
+        **extra,
+    )
+
+
+_STRING = {"type": "string"}
+_NULLABLE_STRING = {"type": ["string", "null"]}
+
+AGENT_NAMES = ["onboarding_agent", "career_coach", "milestone_generator", "skill_gap_analyzer", "reflection_check_in_agent"]
+PHASES = ["initial_contact", "onboarding", "career_path_selection", "milestone_generation",
+          "career_coaching_active", "skill_gap_analysis", "reflection"]
+
+# Master AI Agent routing decision; the Master answers with nothing else, so it is sent
+# as the assistant's response_format
+MASTER_DECISION = Schema("master_decision", _object({
+    "action": {"type": "string", "enum": ["call_agent", "call_agents", "respond_directly"]},
+    "agent_to_call": {"type": ["string", "null"], "enum": AGENT_NAMES + [None]},
+    "message_for_agent": _NULLABLE_STRING,
+    "agent_calls": {"type": ["array", "null"], "items": _object({
+        "agent_to_call": {"type": "string", "enum": AGENT_NAMES},
+        "message_for_agent": _STRING,
+    })},
+    "direct_response_message": _NULLABLE_STRING,
+    "transition_phase_to": {"type": ["string", "null"], "enum": PHASES + [None]},
+}), strict=True)
+
+# Onboarding Agent's profile, the user_onboarding_data everything downstream reads
+ONBOARDING_PROFILE = Schema("onboarding_profile", _object({
+    "career_goals": _STRING,
+    "roles_to_avoid": _STRING,
+    "short_long_term_vision": _STRING,
+    "preferred_work_environment": _STRING,
+    "current_skills": {"type": ["string", "array"]},
+    "skills_to_improve": {"type": ["string", "array"]},
+}, required=["career_goals", "roles_to_avoid", "short_long_term_vision", "preferred_work_environment",
+             "skills_to_improve"]))
+
+_MILESTONE = _object({
+    "id": _STRING,
+    "title": _STRING,
+    "description": {"type": "string", "default": ""},
+    "sub_steps": {"type": "array", "items": _STRING, "default": []},
+    "estimated_time_weeks": {"type": ["number", "null"]},
+    "status": {"type": "string", "default": "pending"},
+}, required=["title"])
+
+# Milestone Generator, Scenario 2: a full plan (ids default to M1, M2... in MilestonePlan)
+INITIAL_GENERATION = Schema("initial_generation", _object({
+    "type": {"type": "string", "enum": ["initial_generation"], "default": "initial_generation"},
+    "career_path": _STRING,
+    "milestones": {"type": "array", "items": _MILESTONE},
+}, required=["career_path", "milestones"]))
+
+# Milestone Generator, Scenario 3: one milestone replacing the one with the same id
+MILESTONE_REGENERATION = Schema("milestone_regeneration", _object({
+    "type": {"type": "string", "enum": ["milestone_regeneration"], "default": "milestone_regeneration"},
+    "milestone": dict(_MILESTONE, required=["id", "title"]),
+}, required=["milestone"]))
+
+# Career Coach's milestone plan, under "### Career Milestones Plan"
+CAREER_COACH_PLAN = Schema("career_coach_plan", _object({
+    "career_path_selected": _STRING,
+    "milestones": {"type": "array", "items": _object({
+        "title": _STRING,
+        "description": {"type": "string", "default": ""},
+        "steps": {"type": "array", "items": _STRING, "default": []},
+    }, required=["title"])},
+}, required=["milestones"]))
+
+# Skill Gap Analyzer's analysis, under "### Skill Gap Analysis"
+_SKILL_GAPS = {"type": "array", "items": _object({
+    "skill_name": _STRING,
+    "description": {"type": "string", "default": ""},
+    "suggested_resources": {"type": "array", "default": [], "items": _object({
+        "type": _STRING,
+        "name": _STRING,
+        "provider": _NULLABLE_STRING,
+        "link": _NULLABLE_STRING,
+        "notes": _NULLABLE_STRING,
+    }, required=["name"])},
+}, required=["skill_name"])}
+
+SKILL_GAP_ANALYSIS = Schema("skill_gap_analysis", _object({
+    "career_path_selected": _STRING,
+    "user_current_skills": {"type": "array", "items": _STRING, "default": []},
+    "required_skills_for_path": {"type": "array", "items": _STRING, "default": []},
+    "skill_gaps_identified": _SKILL_GAPS,
+    "overall_recommendation": {"type": "string", "default": ""},
+}, required=["career_path_selected", "skill_gaps_identified"]))
+
+# Skill Gap Analyzer, when the gaps were computed from the taxonomy (skill_taxonomy.py)
+# and the model only writes about them
+SKILL_GAP_ENRICHMENT = Schema("skill_gap_enrichment", _object({
+    "skill_gaps_identified": _SKILL_GAPS,
+    "overall_recommendation": {"type": "string", "default": ""},
+}, required=["skill_gaps_identified"]))
+
+
+# Milestone Generator, Scenario 1, when the paths are asked for as JSON (cohort.py)
+CAREER_PATHS = Schema("career_paths", _object({
+    "career_paths": {"type": "array", "items": _object({
+        "title": _STRING,
+        "reason": {"type": "string", "default": ""},
+    }, required=["title"])},
+}))
+
+
+def milestone_schema(data) -> Schema:
+    """The Milestone Generator schema a reply claims to follow: a full plan or one milestone."""
+    if isinstance(data, dict) and (data.get("type") == "milestone_regeneration" or "milestone" in data):
+        return MILESTONE_REGENERATION
+    return INITIAL_GENERATION
@@ -0,0 +1,45 @@
+import asyncio
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Session:
+    """
+    Per-conversation state. Agents are shared, stateless singletons, so everything
+    that belongs to one user's conversation is carried here and passed to chat().
+
+    Attributes:
+        thread_id: The Assistants thread this conversation runs on.
+        user_id: Key of the user's stored profile and milestones (see user_store);
+            defaults to the thread id when the user is anonymous.
+        phase: Where the user is in the journey ('onboarding', 'career_coach', ...).
+        tier: 'free' or 'premium'; sets the thread's token budget (see memory).
+        data: Structured outputs collected so far (e.g. 'user_onboarding_data').
+        context: The Master agent's materialized context (context_snapshot.ContextSnapshot),
+            created on the first routed message.
+        memory: Running summary and token count of the thread (memory.ConversationMemory).
+        plan: The user's milestone plan (milestone_plan.MilestonePlan), loaded from the
+            user store on first use.
+        pending: Background setup of the thread (e.g. attaching a cached greeting)
+            that must finish before the next run on it.
+    """
+
+    thread_id: str
+    user_id: str | None = None
+    phase: str = "onboarding"
+    tier: str = "free"
+    data: dict = field(default_factory=dict)
+    context: object = None
+    memory: object = None
+    plan: object = None
+    pending: asyncio.Task | None = None
+
+    def __post_init__(self):
+        if self.user_id is None:
+            self.user_id = self.thread_id
+
+    async def wait_ready(self):
+        """Waits for any background thread setup started for this session."""
+        if self.pending is not None:
+            task, self.pending = self.pending, None
+            await task
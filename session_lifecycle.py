@@ -0,0 +1,187 @@
+import os
+import time
+import asyncio
+
+from helpers import get_async_client
+from memory import ConversationMemory, memory_message, pinned_facts, split_turns, summarize_turn, MEMORY_PREFIX
+from thread_history import HISTORY_CACHE
+from thread_reaper import THREAD_REAPER
+from run_scheduler import RUN_SCHEDULER
+from user_store import get_user_store
+
+# Seconds without a message after which a session is evicted; 0 keeps idle sessions
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+# Seconds between sweeps for idle sessions
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+# Summary lines of the conversation kept in a session's snapshot
+SESSION_SUMMARY_LINES = int(os.getenv("SESSION_SUMMARY_LINES", "20"))
+
+
+class _Tracked:
+    __slots__ = ("session", "last_active", "on_evict")
+
+    def __init__(self, session, last_active, on_evict):
+        self.session = session
+        self.last_active = last_active
+        self.on_evict = on_evict
+
+
+class SessionLifecycle:
+    """
+    Tracks each live chat session's last activity and reclaims the idle ones. A
+    session idle for longer than idle_ttl, or whose chat ended, is evicted: a small
+    snapshot (phase, tier, collected data and a summary of the conversation) is saved
+    to the user store under the session's key, its cached history and in-memory state
+    are dropped, and its remote thread is handed to THREAD_REAPER for rate-limited
+    deletion. A user who comes back to an evicted chat continues on a new thread
+    seeded from that chat's snapshot (restore()). Sessions with a run queued or in
+    progress are never evicted.
+    """
+
+    def __init__(self, idle_ttl: float = SESSION_IDLE_TTL, sweep_interval: float = SESSION_SWEEP_INTERVAL,
+                 store=None, history=HISTORY_CACHE, reaper=THREAD_REAPER, OPENAI_CLIENT=None, clock=time.monotonic):
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.store = store
+        self.history = history
+        self.reaper = reaper
+        self.OPENAI_CLIENT = OPENAI_CLIENT
+        self.clock = clock
+        self._sessions = {}  # key (e.g. the Chainlit session id) -> _Tracked
+        self._sweeper = None
+        self.evicted = 0
+        self.restored = 0
+
+    def _store(self):
+        return self.store or get_user_store()
+
+    def track(self, key, session, on_evict=None):
+        """Starts tracking a session; on_evict() drops the caller's own reference to it."""
+        self._sessions[key] = _Tracked(session, self.clock(), on_evict)
+
+    def touch(self, key):
+        """Marks the session as active now."""
+        tracked = self._sessions.get(key)
+        if tracked is not None:
+            tracked.last_active = self.clock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _busy(self, session) -> bool:
+        pending = session.pending is not None and not session.pending.done()
+        return pending or RUN_SCHEDULER.depth(session.thread_id) > 0
+
+    async def sweep(self) -> int:
+        """Evicts every session idle for longer than idle_ttl. Returns how many."""
+        if self.idle_ttl <= 0:
+            return 0
+        now = self.clock()
+        idle = [
+            key for key, tracked in self._sessions.items()
+            if now - tracked.last_active > self.idle_ttl and not self._busy(tracked.session)
+        ]
+        for key in idle:
+            await self.evict(key)
+        return len(idle)
+
+    async def end(self, key):
+        """The chat is over (e.g. the browser disconnected): evicts it once idle."""
+        tracked = self._sessions.get(key)
+        if tracked is not None and self._busy(tracked.session):
+            tracked.last_active = self.clock() - self.idle_ttl  # the next sweep takes it
+            return
+        await self.evict(key)
+
+    async def evict(self, key):
+        """Saves the session's snapshot, drops it from memory and queues its thread's deletion."""
+        tracked = self._sessions.pop(key, None)
+        if tracked is None:
+            return
+        session = tracked.session
+        try:
+            await asyncio.to_thread(self._store().save_session, key, session.user_id, self.snapshot(session))
+        except Exception as e:
+            print(f"Session lifecycle: error saving session {key}: {e}")
+        if tracked.on_evict is not None:
+            tracked.on_evict()
+        self.history.forget(session.thread_id)
+        self.reaper.schedule(session.thread_id, self.OPENAI_CLIENT)
+        self.evicted += 1
+
+    def snapshot(self, session) -> dict:
+        """What an evicted session needs to continue: no API calls, only local state."""
+        summary = list(session.memory.summary) if session.memory is not None else []
+        for turn in split_turns(self.history.peek(session.thread_id)):
+            if not turn[0]["content"].startswith(MEMORY_PREFIX):
+                summary.append(summarize_turn(turn))
+        return {
+            "thread_id": session.thread_id,
+            "phase": session.phase,
+            "tier": session.tier,
+            "data": session.data,
+            "summary": summary[-SESSION_SUMMARY_LINES:],
+        }
+
+    async def restore(self, key, session) -> bool:
+        """
+        Continues the evicted conversation `key` on `session` (a new Session on a
+        fresh thread): phase, data and summary come from that chat's snapshot and the
+        thread is seeded with the pinned facts and summary. The profile is the user's,
+        shared by all their chats, so it is read from the store by user_id, also when
+        the chat has no snapshot. Returns False when there is neither.
+        """
+        store = self._store()
+        snapshot = await asyncio.to_thread(store.get_session, key)
+        profile = await asyncio.to_thread(store.get_profile, session.user_id)
+        if snapshot is None and profile is None:
+            return False
+        session.memory = ConversationMemory()
+        if snapshot is not None:
+            session.phase = snapshot["phase"]
+            session.data = snapshot["data"]
+            session.memory.summary = snapshot["summary"]
+        if profile is not None:
+            session.data["user_onboarding_data"] = profile
+            if session.phase == "onboarding":  # onboarded since, e.g. in another chat
+                session.phase = await asyncio.to_thread(store.get_phase, session.user_id)
+        pinned = pinned_facts(session)
+        if pinned or session.memory.summary:
+            client = self.OPENAI_CLIENT or get_async_client()
+            await client.beta.threads.messages.create(
+                thread_id=session.thread_id, role="user", content=memory_message(pinned, session.memory.summary)
+            )
+        self.restored += 1
+        return True
+
+    async def start(self):
+        """Starts the background sweep."""
+        self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Session lifecycle: error sweeping idle sessions: {e}")
+
+    async def close(self):
+        """Stops sweeping, evicts every live session and lets the reaper finish."""
+        if self._sweeper:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+        for key in list(self._sessions):
+            await self.evict(key)
+        await self.reaper.close()
+
+    def stats(self) -> dict:
+        return {"live": len(self._sessions), "evicted": self.evicted, "restored": self.restored,
+                **{f"threads_{name}": value for name, value in self.reaper.stats().items()}}
+
+
+SESSIONS = SessionLifecycle()
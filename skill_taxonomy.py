@@ -0,0 +1,170 @@
+import os
+import json
+import functools
+
+# Skills (aliases, prerequisites) and the skills each career path requires
+SKILL_TAXONOMY_FILE = os.getenv(
+    "SKILL_TAXONOMY_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "skill_taxonomy.json")
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _word_pattern():
+    import regex  # imported on first use, not at startup
+    return regex.compile(r"[\w+#]+")
+
+
+def phrase(text: str) -> tuple:
+    """Lower-cased words, so 'scikit-learn', 'Scikit Learn' and 'scikit learn' compare equal."""
+    return tuple(_word_pattern().findall(text.lower()))
+
+
+class SkillTaxonomy:
+    """
+    The skill graph in index form. Skill i has a name, a prerequisite depth (0 with no
+    prerequisites, else one more than its deepest one) and a bitmask of itself and
+    everything it builds on, so "knows TensorFlow" also covers Python. A career path
+    is the mask of its required skills with their prerequisites, and the same skills
+    as a tuple in learning order (depth, then name).
+
+    Skill and path aliases share one phrase table and scan() takes the longest match,
+    so "Machine Learning Engineer" reads as a path, not as the skill it contains.
+    """
+
+    def __init__(self, data: dict):
+        skill_ids = list(data["skills"])
+        index = {skill_id: i for i, skill_id in enumerate(skill_ids)}
+        self.names = [data["skills"][skill_id]["name"] for skill_id in skill_ids]
+        prerequisites = [self._indices(index, skill["requires"], skill_id) for skill_id, skill in data["skills"].items()]
+
+        self.depths = [0] * len(skill_ids)
+        self.masks = [0] * len(skill_ids)  # skill i and all its prerequisites
+        state = [0] * len(skill_ids)  # 0 unvisited, 1 on the current chain, 2 done
+
+        def visit(i):
+            if state[i] == 2:
+                return
+            if state[i] == 1:
+                raise ValueError(f"Skill taxonomy: prerequisite cycle through '{skill_ids[i]}'")
+            state[i] = 1
+            mask, depth = 1 << i, 0
+            for j in prerequisites[i]:
+                visit(j)
+                mask |= self.masks[j]
+                depth = max(depth, self.depths[j] + 1)
+            self.masks[i], self.depths[i], state[i] = mask, depth, 2
+
+        for i in range(len(skill_ids)):
+            visit(i)
+        self.order = sorted(range(len(skill_ids)), key=lambda i: (self.depths[i], self.names[i].lower()))
+
+        self.path_names, self.path_masks, self.path_skills = [], [], []
+        for path_id, path in data["career_paths"].items():
+            mask = 0
+            for i in self._indices(index, path["requires"], path_id):
+                mask |= self.masks[i]
+            self.path_names.append(path["name"])
+            self.path_masks.append(mask)
+            self.path_skills.append(tuple(i for i in self.order if mask >> i & 1))
+
+        self._phrases = {}  # phrase -> ("skill" | "path", index)
+        for i, skill in enumerate(data["skills"].values()):
+            names = skill["aliases"] + ([skill["name"]] if skill.get("match_name", True) else [])
+            self._add_phrases(names, ("skill", i))
+        for i, path in enumerate(data["career_paths"].values()):
+            self._add_phrases(path["aliases"] + [path["name"]], ("path", i))
+        self._longest = max(len(key) for key in self._phrases)
+
+    @classmethod
+    def from_file(cls, path: str = SKILL_TAXONOMY_FILE):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _indices(index: dict, skill_ids: list, owner: str) -> tuple:
+        try:
+            return tuple(index[skill_id] for skill_id in skill_ids)
+        except KeyError as e:
+            raise ValueError(f"Skill taxonomy: '{owner}' requires unknown skill {e}") from None
+
+    def _add_phrases(self, names: list, entry: tuple):
+        for name in names:
+            if self._phrases.setdefault(phrase(name), entry) != entry:
+                raise ValueError(f"Skill taxonomy: alias '{name}' is used twice")
+
+    def scan(self, text: str):
+        """(paths, skills) mentioned in text, as indices in order of first mention."""
+        words = phrase(text)
+        paths, skills = [], []
+        i = 0
+        while i < len(words):
+            for size in range(min(self._longest, len(words) - i), 0, -1):
+                entry = self._phrases.get(words[i:i + size])
+                if entry is not None:
+                    break
+            else:
+                i += 1
+                continue
+            found = paths if entry[0] == "path" else skills
+            if entry[1] not in found:
+                found.append(entry[1])
+            i += size
+        return paths, skills
+
+    def find_path(self, name: str):
+        """Index of the career path called name (or an alias of it), else None."""
+        entry = self._phrases.get(phrase(name or ""))
+        if entry is not None and entry[0] == "path":
+            return entry[1]
+        paths, _ = self.scan(name or "")
+        return paths[0] if paths else None
+
+    def known_mask(self, skills) -> int:
+        mask = 0
+        for i in skills:
+            mask |= self.masks[i]
+        return mask
+
+    def gap(self, path: int, skills=()) -> dict:
+        """
+        The path's skills against the skills the user has (and so their prerequisites),
+        in the Skill Gap Analysis shape: missing skills come prerequisites first.
+        """
+        required = self.path_skills[path]
+        known = self.known_mask(skills)
+        return {
+            "career_path_selected": self.path_names[path],
+            "user_current_skills": [self.names[i] for i in skills],
+            "required_skills_for_path": [self.names[i] for i in required],
+            "skill_gaps_identified": [{"skill_name": self.names[i]} for i in required if not known >> i & 1],
+        }
+
+    def enrich(self, analysis: dict, reply: dict) -> dict:
+        """
+        The precomputed analysis with the descriptions, resources and recommendation of
+        the model's reply. Which skills are missing, and their order, stay as computed.
+        """
+        written = {}
+        for entry in reply.get("skill_gaps_identified", []):
+            match = self._phrases.get(phrase(entry["skill_name"]))
+            written[self.names[match[1]] if match and match[0] == "skill" else entry["skill_name"]] = entry
+        gaps = []
+        for gap in analysis["skill_gaps_identified"]:
+            entry = written.get(gap["skill_name"], {})
+            gaps.append({
+                "skill_name": gap["skill_name"],
+                "description": entry.get("description", ""),
+                "suggested_resources": entry.get("suggested_resources", []),
+            })
+        return dict(analysis, skill_gaps_identified=gaps, overall_recommendation=reply.get("overall_recommendation", ""))
+
+
+_shared_taxonomy = None
+
+
+def get_skill_taxonomy() -> SkillTaxonomy:
+    """Returns the process-wide taxonomy, loading it on first use."""
+    global _shared_taxonomy
+    if _shared_taxonomy is None:
+        _shared_taxonomy = SkillTaxonomy.from_file()
+    return _shared_taxonomy
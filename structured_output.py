@@ -0,0 +1,311 @@
+import json
+from dataclasses import dataclass
+
+import re
+
+from telemetry import traced
+
+# Headings are only looked for in the prose between blocks, never inside a block body
+_HEADING = re.compile(r"^[ \t]*#{1,6}[ \t]+([^\n]*?)[ \t#]*$", re.MULTILINE)
+_FENCE_LANGUAGE = re.compile(r"[ \t]*([\w+-]*)")
+_NON_SPACE = re.compile(r"\S")
+_FENCE_CLOSE = re.compile(r"\s*```")
+# Characters that matter to a bracket-balanced JSON scan; a fence outside a string ends it
+_STRUCTURAL = re.compile(r'[{}\[\]"\\]|```')
+_BRACES = re.compile(r'[{}"\\]')
+
+
+@dataclass
+class StructuredBlock:
+    """
+    One fenced code block (or unfenced JSON object) found in an agent response.
+
+    Attributes:
+        heading: Text of the closest markdown heading before the block, if any.
+        language: Fence language tag ('json', '' ...).
+        raw: Block body, stripped of surrounding whitespace.
+        data: Parsed JSON, or None when the body is not JSON or fails to parse.
+        error: The JSON decode error message when parsing failed.
+    """
+
+    heading: str | None
+    language: str
+    raw: str
+    data: object = None
+    error: str | None = None
+
+
+def _parse(raw: str):
+    try:
+        return json.loads(raw), None
+    except json.JSONDecodeError as e:
+        return None, str(e)
+
+
+def balanced_end(text: str, start: int) -> int:
+    """
+    Returns the index just past the bracket that closes text[start], or -1 if the value
+    is unbalanced. Stops at a code fence outside a string, so each scan is bounded by
+    its own block and a response is never rescanned from every opening brace.
+    """
+    depth = 0
+    in_string = False
+    escaped = -1
+    for match in _STRUCTURAL.finditer(text, start):
+        index = match.start()
+        token = match.group()
+        if index == escaped:
+            continue
+        if in_string:
+            if token == "\\":
+                escaped = index + 1
+            elif token == '"':
+                in_string = False
+            continue
+        if token == '"':
+            in_string = True
+        elif token in "{[":
+            depth += 1
+        elif token in "}]":
+            depth -= 1
+            if depth == 0:
+                return index + 1
+        elif token == "```":
+            return -1
+    return -1
+
+
+def _last_heading(text: str, start: int, end: int):
+    heading = None
+    for match in _HEADING.finditer(text, start, end):
+        heading = match.group(1).strip()
+    return heading or None
+
+
+def iter_blocks(text: str):
+    """
+    Scans a response once, lazily yielding every fenced block in order with its
+    heading and (for JSON blocks) the parsed value.
+    """
+    position = 0
+    while True:
+        fence = text.find("```", position)
+        if fence == -1:
+            return
+        heading = _last_heading(text, position, fence)
+
+        language_match = _FENCE_LANGUAGE.match(text, fence + 3)
+        language = language_match.group(1).lower()
+        body_start = language_match.end()
+
+        close_index = text.find("```", body_start)
+        body_end = close_index if close_index != -1 else len(text)
+        position = body_end + 3 if close_index != -1 else len(text)
+        raw = text[body_start:body_end].strip()
+        data, error = None, None
+
+        if language == "json" or (language == "" and raw[:1] in ("{", "[")):
+            # Fast path: the body up to the next fence is usually exactly the JSON value
+            data, error = _parse(raw)
+            if error is not None and raw[:1] in ("{", "["):
+                # A fence inside a string or text after the value: take exactly the
+                # bracket-balanced value instead, if a closing fence follows it
+                value_start = _NON_SPACE.search(text, body_start).start()
+                end = balanced_end(text, value_start)
+                close = _FENCE_CLOSE.match(text, end) if end != -1 else None
+                if close is not None:
+                    raw = text[value_start:end]
+                    data, error = _parse(raw)
+                    position = close.end()
+
+        yield StructuredBlock(heading, language, raw, data, error)
+
+
+@traced("json.extract_blocks")
+def extract_blocks(text: str) -> list:
+    """Returns every fenced block in a response, in order (see iter_blocks)."""
+    return list(iter_blocks(text))
+
+
+def iter_unfenced_json(text: str):
+    """
+    Yields top-level JSON objects embedded in free text, in order, using a single
+    bracket-balanced pass instead of backtracking regexes.
+    """
+    stack = []
+    spans = []
+    in_string = False
+    escaped = -1
+    for match in _BRACES.finditer(text):
+        index = match.start()
+        token = match.group()
+        if index == escaped:
+            continue
+        if in_string:
+            if token == "\\":
+                escaped = index + 1
+            elif token == '"':
+                in_string = False
+            continue
+        if token == '"':
+            in_string = bool(stack)
+        elif token == "{":
+            stack.append(index)
+        elif token == "}" and stack:
+            start = stack.pop()
+            while spans and spans[-1][0] > start:
+                spans.pop()  # nested inside this object
+            spans.append((start, index + 1))
+
+    for start, end in spans:
+        raw = text[start:end]
+        data, error = _parse(raw)
+        if error is None:
+            yield StructuredBlock(None, "", raw, data, None)
+
+
+@traced("json.find_block")
+def find_json_block(text: str, heading: str = None, allow_unfenced: bool = False):
+    """
+    Returns the first JSON block in a response, or None.
+
+    Args:
+        heading: Only consider fenced blocks whose heading contains this text (case-insensitive).
+        allow_unfenced: Fall back to a bare JSON object when no fenced block matches.
+    """
+    wanted = heading.lower() if heading else None
+    for block in iter_blocks(text):
+        if block.language != "json" and block.data is None:
+            continue
+        if wanted and (block.heading is None or wanted not in block.heading.lower()):
+            continue
+        return block
+    if allow_unfenced:
+        return next(iter_unfenced_json(text), None)
+    return None
+
+
+def contains_json_block(text: str) -> bool:
+    return any(block.language == "json" for block in iter_blocks(text))
+
+
+# Tokens the streaming parser reacts to; everything else is skipped by the regex engine
+_STREAM_TOKENS = re.compile(r'[{}\[\]":,\\`]')
+
+
+class MilestoneStreamParser:
+    """
+    Incremental parser for streamed agent replies. feed() takes each text delta and
+    returns the milestone objects whose closing brace arrived in it, so a plan can be
+    rendered milestone by milestone while the rest is still being generated.
+
+    Only fenced ```json bodies are tracked. A milestone is any object inside an array
+    under one of `array_keys`, or the object directly under one of `object_keys`
+    (the single milestone of a regeneration reply).
+    """
+
+    def __init__(self, array_keys=("milestones",), object_keys=("milestone",)):
+        self.array_keys = array_keys
+        self.object_keys = object_keys
+        self.text = ""
+        self._position = 0
+        self._in_fence = False
+        self._tracking = False  # inside a ```json (or untagged) fence
+        self._in_string = False
+        self._escaped = -1
+        self._string_start = -1
+        self._last_string = None
+        self._key = None
+        self._stack = []  # ("[", key) or ("{", start, emit)
+
+    def feed(self, delta: str) -> list:
+        self.text += delta
+        text = self.text
+        found = []
+        while True:
+            match = _STREAM_TOKENS.search(text, self._position)
+            if match is None:
+                self._position = len(text)
+                return found
+            index = match.start()
+            token = match.group()
+            self._position = index + 1
+            if index == self._escaped:
+                continue
+
+            if token == "`":
+                if self._in_string:
+                    continue
+                if len(text) < index + 3:
+                    self._position = index  # wait for the rest of a possible fence
+                    return found
+                if text[index:index + 3] != "```":
+                    continue
+                if self._in_fence:
+                    self._in_fence = self._tracking = False
+                    self._stack.clear()
+                    self._position = index + 3
+                    continue
+                newline = text.find("\n", index + 3)
+                if newline == -1:
+                    self._position = index  # wait for the language tag to finish
+                    return found
+                self._in_fence = True
+                self._tracking = text[index + 3:newline].strip().lower() in ("json", "")
+                self._position = newline + 1
+                continue
+
+            if not self._tracking:
+                continue
+            if self._in_string:
+                if token == "\\":
+                    self._escaped = index + 1
+                elif token == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:index]
+                continue
+            if token == '"':
+                self._in_string = True
+                self._string_start = index + 1
+            elif token == ":":
+                if self._stack and self._stack[-1][0] == "{":
+                    self._key = self._last_string
+            elif token == ",":
+                self._key = None
+            elif token == "[":
+                self._stack.append(("[", self._key))
+                self._key = None
+            elif token == "{":
+                parent = self._stack[-1] if self._stack else None
+                emit = parent is not None and (
+                    (parent[0] == "[" and parent[1] in self.array_keys)
+                    or (parent[0] == "{" and self._key in self.object_keys)
+                )
+                self._stack.append(("{", index, emit))
+                self._key = None
+            elif self._stack:
+                entry = self._stack.pop()
+                if token == "}" and entry[0] == "{" and entry[2]:
+                    data, error = _parse(text[entry[1]:index + 1])
+                    if error is None:
+                        found.append(data)
+
+
+def stream_callback(on_token=None, on_milestone=None):
+    """
+    Builds the on_delta callback for helpers.acall_openAI: forwards each text delta to
+    on_token and each completed milestone object to on_milestone. Returns None when
+    neither is given, so the call is not streamed to anyone.
+    """
+    if on_token is None and on_milestone is None:
+        return None
+    parser = MilestoneStreamParser() if on_milestone is not None else None
+
+    async def on_delta(text):
+        if on_token is not None:
+            await on_token(text)
+        if parser is not None:
+            for milestone in parser.feed(text):
+                await on_milestone(milestone)
+
+    return on_delta
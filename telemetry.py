@@ -0,0 +1,260 @@
+import os
+import time
+import bisect
+import inspect
+import functools
+import threading
+import contextvars
+
+from session import Session
+
+# OpenTelemetry spans for every pipeline step; exported by whatever tracer provider is
+# configured (e.g. run under `opentelemetry-instrument`), no-ops without one
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+# Prometheus counters and histograms, served at /metrics by chainlit.py
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+
+# Upper bounds of the step duration histogram, in seconds
+STEP_SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_tracer = None
+# Agent whose chat() the current step belongs to, inherited by the steps it awaits
+_current_agent = contextvars.ContextVar("telemetry_agent", default="")
+
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}  # label values -> count
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{{{_labels(self.label_names, labels)}}} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: tuple, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # label values -> per-bucket counts (not cumulative), then sum and count
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1  # the extra last bucket is +Inf
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                base = _labels(self.label_names, labels)
+                cumulative = 0
+                for bound, count in zip([*self.buckets, "+Inf"], series):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+                lines.append(f"{self.name}_sum{{{base}}} {series[-2]}")
+                lines.append(f"{self.name}_count{{{base}}} {series[-1]}")
+        return lines
+
+
+def _labels(names, values) -> str:
+    return ",".join(f'{name}="{_label_value(value)}"' for name, value in zip(names, values))
+
+
+STEP_SECONDS = Histogram(
+    "bluetide_step_duration_seconds", "Time spent in each step of a turn.", ("step", "agent"), STEP_SECONDS_BUCKETS
+)
+STEP_ERRORS = Counter(
+    "bluetide_step_errors_total", "Steps that raised or returned status error.", ("step", "agent")
+)
+_gauges = []  # (name, help, callable returning the current value)
+
+
+def register_gauge(name: str, help_text: str, read):
+    """Adds a gauge whose value is read when /metrics is scraped, e.g. a queue depth."""
+    _gauges.append((name, help_text, read))
+
+
+def render_metrics() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    lines = STEP_SECONDS.render() + STEP_ERRORS.render()
+    for name, help_text, read in _gauges:
+        try:
+            value = read()
+        except Exception as e:
+            print(f"Telemetry: error reading gauge {name}: {e}")
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def configure(tracing: bool = None, metrics: bool = None):
+    """Turns tracing and/or metrics on or off at runtime (the env vars set the defaults)."""
+    global TRACING_ENABLED, METRICS_ENABLED, _tracer
+    if tracing is not None:
+        TRACING_ENABLED = tracing
+        _tracer = None
+    if metrics is not None:
+        METRICS_ENABLED = metrics
+
+
+def _get_tracer():
+    global _tracer, TRACING_ENABLED
+    if _tracer is None:
+        try:
+            from opentelemetry import trace
+            _tracer = trace.get_tracer("bluetide")
+        except ImportError:
+            print("Telemetry: opentelemetry-api is not installed; tracing disabled.")
+            TRACING_ENABLED = False
+    return _tracer
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, key, value):
+        pass
+
+    def fail(self):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("labels", "attributes", "began", "failed", "_agent", "_context", "_otel", "_agent_token")
+
+    def __init__(self, step, agent, attributes):
+        self.labels = (step, agent or _current_agent.get())
+        self.attributes = attributes
+        self.failed = False
+        self._agent = agent
+        self._context = self._otel = self._agent_token = None
+
+    def __enter__(self):
+        if self._agent:
+            self._agent_token = _current_agent.set(self._agent)
+        if TRACING_ENABLED and _get_tracer():
+            attributes = {key: value for key, value in self.attributes.items() if value is not None}
+            attributes["agent"] = self.labels[1]
+            self._context = _tracer.start_as_current_span(self.labels[0], attributes=attributes)
+            self._otel = self._context.__enter__()
+        self.began = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.began
+        if METRICS_ENABLED:
+            STEP_SECONDS.observe(self.labels, elapsed)
+            if exc_type is not None or self.failed:
+                STEP_ERRORS.inc(self.labels)
+        if self._context is not None:
+            self._context.__exit__(exc_type, exc, tb)
+        if self._agent_token is not None:
+            _current_agent.reset(self._agent_token)
+        return False
+
+    def set(self, key, value):
+        """Adds an attribute to the span, e.g. how a decision was reached."""
+        if self._otel is not None:
+            self._otel.set_attribute(key, value)
+
+    def fail(self):
+        """Counts the step as failed without an exception (a status error result)."""
+        self.failed = True
+        self.set("status", "error")
+
+
+def span(step: str, agent: str = None, **attributes):
+    """
+    Context manager timing one step. `agent` labels it (and the steps nested in it);
+    attributes such as the session's thread id only go on the trace. With tracing and
+    metrics both off it returns a shared no-op object.
+    """
+    if not (TRACING_ENABLED or METRICS_ENABLED):
+        return _NOOP_SPAN
+    return _Span(step, agent, attributes)
+
+
+def _session_attributes(args, kwargs) -> dict:
+    session = kwargs.get("session") or next((arg for arg in args if isinstance(arg, Session)), None)
+    if session is None:
+        return {}
+    return {"session.thread_id": session.thread_id, "session.user_id": session.user_id}
+
+
+def traced(step: str, agent: str = None):
+    """
+    Decorator wrapping a function or coroutine function in span(step). The session
+    among its arguments, if any, tags the span; without `agent` the label is the
+    call's agent_type argument, else the enclosing agent. A dict result with status
+    "error" counts as a failed step.
+    """
+    def decorate(function):
+        def open_span(args, kwargs):
+            return _Span(step, agent or kwargs.get("agent_type"), _session_attributes(args, kwargs))
+
+        def check(result, current):
+            if isinstance(result, dict) and result.get("status") == "error":
+                current.fail()
+            return result
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                if not (TRACING_ENABLED or METRICS_ENABLED):
+                    return await function(*args, **kwargs)
+                with open_span(args, kwargs) as current:
+                    return check(await function(*args, **kwargs), current)
+        else:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not (TRACING_ENABLED or METRICS_ENABLED):
+                    return function(*args, **kwargs)
+                with open_span(args, kwargs) as current:
+                    return check(function(*args, **kwargs), current)
+        return wrapper
+    return decorate
+
+
+def observe(step: str, seconds: float, agent: str = None):
+    """Records a duration measured elsewhere, e.g. time a run spent queued."""
+    if METRICS_ENABLED:
+        STEP_SECONDS.observe((step, agent or _current_agent.get()), seconds)
+
+
+def set_attribute(key, value):
+    """Adds an attribute to the current trace span, if tracing."""
+    if TRACING_ENABLED and _get_tracer():
+        from opentelemetry import trace
+        trace.get_current_span().set_attribute(key, value)
@@ -0,0 +1,10 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+from fake_openai import isolate_environment
+
+# Before any project module is imported: no real key, and scratch files for everything saved
+isolate_environment()
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+from fake_openai import FakeAsyncOpenAI
+from assistant_registry import get_assistant_id, provision_assistants
+from helpers import acall_openAI, acreate_thread
+from session import Session
+from Agents.onboarding_agent import OnboardingAgent
+
+RUN_LATENCY = 0.3
+SESSIONS = 50
+
+
+async def onboarding_agent(client):
+    await provision_assistants(OPENAI_CLIENT=client)
+    agent = OnboardingAgent()
+    agent.OPENAI_CLIENT = client
+    return agent
+
+
+async def timed_sessions(agent, count):
+    sessions = [Session(thread_id=await acreate_thread(agent.OPENAI_CLIENT)) for _ in range(count)]
+    began = time.perf_counter()
+    results = await asyncio.gather(*(
+        agent.chat(session, f"Hello, I'm user {index} and ready to start.") for index, session in enumerate(sessions)
+    ))
+    return time.perf_counter() - began, sessions, results
+
+
+def test_concurrent_sessions_take_about_as_long_as_one():
+    async def scenario():
+        client = FakeAsyncOpenAI(run_latency=RUN_LATENCY)
+        agent = await onboarding_agent(client)
+        single, _, _ = await timed_sessions(agent, 1)
+        concurrent, sessions, results = await timed_sessions(agent, SESSIONS)
+
+        assert all(result["status"] == "continue" for result in results), results
+        assert concurrent < 1.5 * single, (single, concurrent)
+        # Each session got the reply to its own message, on its own thread
+        for index, session in enumerate(sessions):
+            user, reply = [m.content[0].text.value for m in client._threads[session.thread_id]][-2:]
+            assert f"user {index} " in user and f"user {index} " in reply
+
+    asyncio.run(scenario())
+
+
+def test_runs_do_not_block_the_event_loop():
+    async def scenario():
+        client = FakeAsyncOpenAI(run_latency=RUN_LATENCY)
+        await provision_assistants(OPENAI_CLIENT=client)
+        thread_id = await acreate_thread(client)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        try:
+            reply = await acall_openAI(thread_id, get_assistant_id("onboarding_agent"), "ping", OPENAI_CLIENT=client)
+        finally:
+            task.cancel()
+        assert "ping" in reply
+        assert ticks >= RUN_LATENCY / 0.01 / 2  # the loop kept running while the run was in progress
+
+    asyncio.run(scenario())
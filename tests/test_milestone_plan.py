@@ -0,0 +1,54 @@
+import asyncio
+
+from fake_openai import FakeAsyncOpenAI
+from assistant_registry import provision_assistants
+from helpers import acreate_thread
+from milestone_plan import MilestonePlan
+from session import Session
+from Agents.milestone_generator import MilestoneGeneratorAgent
+
+
+def plan(size=3):
+    return MilestonePlan.from_data({
+        "career_path": "Machine Learning Engineer",
+        "milestones": [{"title": f"Milestone {n}"} for n in range(1, size + 1)],
+    })
+
+
+def test_find_target_needs_a_regeneration_request_naming_a_plan_id():
+    assert plan().find_target("Can you regenerate M2 with more focus on MLOps?") == "M2"
+    assert plan().find_target("Please redo M3, it was too hard") == "M3"
+    assert plan(12).find_target("Replace M12 with something shorter") == "M12"
+
+
+def test_find_target_leaves_other_messages_alone():
+    for message in (
+        "I only have an M1 MacBook, can you suggest a different career path?",
+        "Please make me a brand new plan for Data Scientist; milestone 2 was too hard",
+        "Can you change milestone 2 to focus on MLOps?",  # not an id of the plan
+        "Please regenerate m2",  # ids are case-sensitive
+        "Regenerate M7 please",  # not in the plan
+        "How long should M2 take?",  # no regeneration asked for
+    ):
+        assert plan().find_target(message) is None, message
+
+
+def test_only_a_regeneration_request_is_rewritten():
+    async def scenario():
+        client = FakeAsyncOpenAI(run_latency=0.0)
+        await provision_assistants(OPENAI_CLIENT=client)
+        agent = MilestoneGeneratorAgent()
+        agent.OPENAI_CLIENT = client
+        sent = {}
+        for message in ("I only have an M1 MacBook, can you suggest a different career path?",
+                        "Please make me a brand new plan for Data Scientist; milestone 2 was too hard",
+                        "Can you regenerate M2 with more focus on MLOps?"):
+            session = Session(thread_id=await acreate_thread(client), plan=plan())
+            await agent.chat(session, message, use_cache=False)
+            sent[message] = [m.content[0].text.value for m in client._threads[session.thread_id]][0]
+        return sent
+
+    sent = asyncio.run(scenario())
+    *unchanged, regeneration = sent
+    assert all(sent[message] == message for message in unchanged)
+    assert sent[regeneration].startswith(regeneration + "\n\nMilestone to regenerate (M2 of 3")
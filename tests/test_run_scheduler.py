@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from run_scheduler import RunCoalesced, RunScheduler
+
+
+class Abort(BaseException):
+    """Not an Exception, like CancelledError; asyncio lets it end the task."""
+
+
+async def echo(message):
+    await asyncio.sleep(0.001)
+    return message
+
+
+def test_queued_messages_coalesce_into_one_run():
+    async def scenario():
+        scheduler = RunScheduler()
+        calls = []
+
+        async def run(message):
+            calls.append(message)
+            return await echo(message)
+
+        tasks = [asyncio.create_task(scheduler.submit("thread", run, text, coalesce_key="assistant")) for text in "abc"]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert calls == ["a\n\nb\n\nc"]
+        assert results[0] == "a\n\nb\n\nc"
+        assert all(isinstance(result, RunCoalesced) for result in results[1:])
+        assert scheduler.depth("thread") == 0
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("error", [asyncio.CancelledError, Abort])
+def test_base_exception_in_a_run_resolves_every_waiting_submission(error):
+    async def scenario():
+        scheduler = RunScheduler()
+
+        async def fails(message):
+            await asyncio.sleep(0.001)
+            raise error()
+
+        head = asyncio.create_task(scheduler.submit("thread", fails, "a", coalesce_key="assistant"))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(scheduler.submit("thread", echo, "b", coalesce_key="assistant"))
+        queued = asyncio.create_task(scheduler.submit("thread", echo, "c"))
+        worker = scheduler._workers["thread"]
+        results = await asyncio.wait_for(asyncio.gather(head, follower, queued, return_exceptions=True), 1)
+        assert all(isinstance(result, (asyncio.CancelledError, error)) for result in results), results
+        with pytest.raises(error):
+            await worker
+        assert scheduler._queues == {} and scheduler._workers == {}
+        assert await scheduler.submit("thread", echo, "d") == "d"  # the thread is usable again
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_worker_cancels_running_and_queued_submissions():
+    async def scenario():
+        scheduler = RunScheduler()
+        running = asyncio.create_task(scheduler.submit("thread", lambda message: asyncio.sleep(10), "a"))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(scheduler.submit("thread", echo, "b"))
+        await asyncio.sleep(0.01)
+        scheduler._workers["thread"].cancel()
+        results = await asyncio.wait_for(asyncio.gather(running, queued, return_exceptions=True), 1)
+        assert all(isinstance(result, asyncio.CancelledError) for result in results)
+
+    asyncio.run(scenario())
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import tempfile
+
+from fake_openai import FakeAsyncOpenAI
+from helpers import acreate_thread
+from session import Session
+from session_lifecycle import SessionLifecycle
+from thread_history import ThreadHistoryCache
+from thread_reaper import ThreadReaper
+from user_store import UserStore
+
+IDLE_TTL = 10.0
+STEP = 5.0  # seconds of fake time between sweeps
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def lifecycle(client, clock):
+    store = UserStore(os.path.join(tempfile.mkdtemp(prefix="bluetide-test-"), "users.db"))
+    return SessionLifecycle(
+        idle_ttl=IDLE_TTL, store=store, history=ThreadHistoryCache(OPENAI_CLIENT=client),
+        reaper=ThreadReaper(rate=0), OPENAI_CLIENT=client, clock=clock,
+    )
+
+
+async def new_chat(client, sessions, key, user_id, text, dropped=None):
+    session = Session(thread_id=await acreate_thread(client), user_id=user_id)
+    await client.beta.threads.messages.create(thread_id=session.thread_id, role="user", content=text)
+    await client.beta.threads.messages.create(thread_id=session.thread_id, role="assistant", content=f"Re: {text}")
+    await sessions.history.get_messages(session.thread_id)
+    sessions.track(key, session, on_evict=(lambda: dropped.append(key)) if dropped is not None else None)
+    return session
+
+
+def test_soak_keeps_live_sessions_threads_and_histories_bounded():
+    async def scenario():
+        client, clock = FakeAsyncOpenAI(run_latency=0.0), Clock()
+        sessions, dropped = lifecycle(client, clock), []
+        rounds, per_round = 40, 25
+        for round_index in range(rounds):
+            for index in range(per_round):
+                key = f"chat-{round_index}-{index}"
+                await new_chat(client, sessions, key, f"user-{round_index}-{index}", f"hello {key}", dropped)
+            if round_index % 3 == 0:  # some chats stay active and must survive
+                sessions.touch(f"chat-{round_index - 1}-0")
+            clock.now += STEP
+            await sessions.sweep()
+            # Chats idle for more than IDLE_TTL are gone: at most the last two rounds, plus touched ones
+            assert len(sessions) <= 2 * per_round + 1
+            assert len(sessions.history._threads) == len(sessions)
+        await sessions.reaper.close()
+
+        started = rounds * per_round
+        assert sessions.evicted == started - len(sessions) == len(dropped)
+        assert sessions.reaper.stats() == {"pending": 0, "deleted": sessions.evicted, "failed": 0}
+        live_threads = {tracked.session.thread_id for tracked in sessions._sessions.values()}
+        assert set(client._threads) == live_threads
+
+    asyncio.run(scenario())
+
+
+def test_busy_sessions_are_not_evicted():
+    async def scenario():
+        client, clock = FakeAsyncOpenAI(run_latency=0.0), Clock()
+        sessions = lifecycle(client, clock)
+        session = await new_chat(client, sessions, "busy", "alice", "hi")
+        session.pending = asyncio.get_running_loop().create_future()
+        clock.now += 2 * IDLE_TTL
+        assert await sessions.sweep() == 0
+        session.pending.set_result(None)
+        assert await sessions.sweep() == 1
+        await sessions.reaper.close()
+
+    asyncio.run(scenario())
+
+
+def test_each_chat_of_a_user_restores_its_own_snapshot():
+    async def scenario():
+        client, clock = FakeAsyncOpenAI(run_latency=0.0), Clock()
+        sessions = lifecycle(client, clock)
+        first = await new_chat(client, sessions, "chat-a", "alice", "about data science")
+        second = await new_chat(client, sessions, "chat-b", "alice", "about cloud architecture")
+        first.data, second.data = {"topic": "data science"}, {"topic": "cloud"}
+        second.phase = "career_coach"
+        await sessions.evict("chat-a")
+        await sessions.evict("chat-b")
+
+        for key, topic, phase in (("chat-a", "data science", "onboarding"), ("chat-b", "cloud", "career_coach")):
+            session = Session(thread_id=await acreate_thread(client), user_id="alice")
+            assert await sessions.restore(key, session)
+            assert session.data["topic"] == topic and session.phase == phase
+            seed = client._threads[session.thread_id][0].content[0].text.value
+            assert f"about {topic}" in seed
+        await sessions.reaper.close()
+
+    asyncio.run(scenario())
+
+
+def test_profile_comes_from_the_user_when_the_chat_has_no_snapshot():
+    async def scenario():
+        client, clock = FakeAsyncOpenAI(run_latency=0.0), Clock()
+        sessions = lifecycle(client, clock)
+        session = Session(thread_id=await acreate_thread(client), user_id="bob")
+        assert not await sessions.restore("chat-new", session)
+
+        profile = {"career_goals": "Become a data engineer"}
+        sessions.store.save_profile("bob", profile)
+        session = Session(thread_id=await acreate_thread(client), user_id="bob")
+        assert await sessions.restore("chat-new", session)
+        assert session.data["user_onboarding_data"] == profile
+        assert session.phase == "milestones"
+
+    asyncio.run(scenario())
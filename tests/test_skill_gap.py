@@ -0,0 +1,36 @@
+from Agents.skill_gap_analyzer_agent import SkillGapAnalyzerAgent
+from context_snapshot import ContextSnapshot
+from milestone_plan import MilestonePlan
+from session import Session
+
+
+def missing(analysis):
+    return [gap["skill_name"] for gap in analysis["skill_gaps_identified"]]
+
+
+def test_skills_named_in_the_message_are_not_taken_as_held():
+    session = Session(thread_id="t", data={"user_onboarding_data": {"current_skills": "SQL"}})
+    for message in ("Which skills am I missing for Machine Learning Engineer? I do not know Python or TensorFlow yet",
+                    "Should I learn TensorFlow or Python to become a Machine Learning Engineer?"):
+        analysis = SkillGapAnalyzerAgent.precompute(session, message)
+        assert analysis["career_path_selected"] == "Machine Learning Engineer"
+        assert analysis["user_current_skills"] == ["SQL"]
+        assert {"Python", "Deep Learning"} <= set(missing(analysis))
+        assert "SQL" not in missing(analysis)
+
+
+def test_held_skills_come_from_the_profile():
+    profile = {"current_skills": ["Python", "PyTorch"], "skills_to_improve": "PyTorch"}
+    session = Session(thread_id="t", data={"user_onboarding_data": profile})
+    analysis = SkillGapAnalyzerAgent.precompute(session, "What am I missing to become an ML engineer?")
+    assert analysis["user_current_skills"] == ["Python"]
+    assert "Python" not in missing(analysis)
+    assert "PyTorch" in missing(analysis)  # listed under skills_to_improve too, so not held
+
+
+def test_path_falls_back_to_the_plan():
+    session = Session(thread_id="t", context=ContextSnapshot(),
+                      plan=MilestonePlan.from_data({"career_path": "Data Scientist", "milestones": []}))
+    assert SkillGapAnalyzerAgent.precompute(session, "Which skills am I missing?")["career_path_selected"] == "Data Scientist"
+    session.plan = None
+    assert SkillGapAnalyzerAgent.precompute(session, "Which skills am I missing?") is None
@@ -0,0 +1,94 @@
+import asyncio
+from types import SimpleNamespace
+
+from fake_openai import FakeAsyncOpenAI
+from helpers import MESSAGES_PAGE_SIZE, acreate_thread
+from thread_history import ThreadHistoryCache
+
+
+async def add_messages(client, thread_id, count, start=0):
+    for index in range(start, start + count):
+        role = "user" if index % 2 == 0 else "assistant"
+        await client.beta.threads.messages.create(thread_id=thread_id, role=role, content=f"message {index}")
+
+
+def pages(count):
+    """messages.list calls to page through `count` messages (at least one)."""
+    return max(1, -(-count // MESSAGES_PAGE_SIZE))
+
+
+def server_ids(client, thread_id):
+    return [m.id for m in client._threads[thread_id]]
+
+
+def test_incremental_reads_return_exactly_the_new_messages_in_order():
+    async def scenario():
+        client = FakeAsyncOpenAI()
+        thread_id = await acreate_thread(client)
+        await add_messages(client, thread_id, 3000)
+        cache = ThreadHistoryCache(OPENAI_CLIENT=client)
+
+        before = client.request_count
+        messages = await cache.get_messages(thread_id)
+        assert [m["id"] for m in messages] == server_ids(client, thread_id)
+        assert [m["content"] for m in messages[:2]] == ["message 0", "message 1"]
+        assert client.request_count - before == pages(3000)
+
+        for added in (1, 7, MESSAGES_PAGE_SIZE, 2 * MESSAGES_PAGE_SIZE + 3):
+            start = len(client._threads[thread_id])
+            await add_messages(client, thread_id, added, start)
+            fetched_before, requests_before = cache.fetched_messages, client.request_count
+            messages = await cache.get_messages(thread_id)
+            assert cache.fetched_messages - fetched_before == added
+            assert client.request_count - requests_before == pages(added)
+            assert [m["id"] for m in messages] == server_ids(client, thread_id)
+            assert [m["content"] for m in messages[-added:]] == [f"message {i}" for i in range(start, start + added)]
+
+        requests_before = client.request_count
+        assert await cache.get_messages(thread_id) == messages
+        assert client.request_count - requests_before == 1
+
+    asyncio.run(scenario())
+
+
+def test_cursor_stops_before_a_message_still_being_written():
+    async def scenario():
+        client = FakeAsyncOpenAI()
+        thread_id = await acreate_thread(client)
+        await add_messages(client, thread_id, 250)
+        cache = ThreadHistoryCache(OPENAI_CLIENT=client)
+        await cache.get_messages(thread_id)
+
+        # A run is still writing its reply when the next message is read
+        await client.beta.threads.messages.create(thread_id=thread_id, role="user", content="question")
+        reply = SimpleNamespace(
+            id=client._next_id("msg"), object="thread.message", role="assistant", status="in_progress",
+            created_at=0, run_id="run_x", assistant_id="asst_x", content=[],
+        )
+        client._threads[thread_id].append(reply)
+        messages = await cache.get_messages(thread_id)
+        assert messages[-1]["content"] == "question"
+        assert len(messages) == 251
+
+        # Finished, followed by more messages than one page: nothing is skipped
+        reply.status = "completed"
+        reply.content = [SimpleNamespace(type="text", text=SimpleNamespace(value="answer", annotations=[]))]
+        await add_messages(client, thread_id, MESSAGES_PAGE_SIZE + 5, 1000)
+        messages = await cache.get_messages(thread_id)
+        assert [m["id"] for m in messages] == server_ids(client, thread_id)
+        assert [m["content"] for m in messages[250:253]] == ["question", "answer", "message 1000"]
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_reads_fetch_each_message_once():
+    async def scenario():
+        client = FakeAsyncOpenAI(request_latency=0.001)
+        thread_id = await acreate_thread(client)
+        await add_messages(client, thread_id, 1200)
+        cache = ThreadHistoryCache(OPENAI_CLIENT=client)
+        results = await asyncio.gather(*(cache.get_messages(thread_id) for _ in range(10)))
+        assert all([m["id"] for m in result] == server_ids(client, thread_id) for result in results)
+        assert cache.fetched_messages == 1200
+
+    asyncio.run(scenario())
@@ -0,0 +1,79 @@
+import os
+import asyncio
+from collections import OrderedDict
+
+from helpers import get_async_client, afetch_messages_after, _format_text_messages
+
+# Threads whose history is kept in memory; the least recently read are dropped first
+THREAD_HISTORY_MAX_THREADS = int(os.getenv("THREAD_HISTORY_MAX_THREADS", "256"))
+
+
+class _ThreadHistory:
+    def __init__(self):
+        self.messages = []  # formatted text messages, oldest first
+        self.cursor = None  # id of the newest settled message seen, text or not
+        self.lock = asyncio.Lock()
+
+
+def _settled(messages: list) -> list:
+    """The messages up to (not including) the first one whose content may still change."""
+    for index, message in enumerate(messages):
+        if getattr(message, "status", "completed") == "in_progress":
+            return messages[:index]
+    return messages
+
+
+class ThreadHistoryCache:
+    """
+    Local copy of each thread's messages. A read fetches only the messages newer
+    than the last one seen (messages.list with an `after` cursor, paged), so loading
+    history costs O(new messages) round trips instead of re-listing the thread.
+
+    The cursor stops before the first message still being written (status
+    "in_progress", e.g. a reply to a run that is still going), so that message and
+    the ones after it are fetched again, complete, on a later read.
+    """
+
+    def __init__(self, max_threads: int = THREAD_HISTORY_MAX_THREADS, OPENAI_CLIENT=None):
+        self.max_threads = max_threads
+        self.OPENAI_CLIENT = OPENAI_CLIENT
+        self._threads = OrderedDict()  # thread_id -> _ThreadHistory
+        self.fetched_messages = 0
+
+    def _history(self, thread_id) -> _ThreadHistory:
+        history = self._threads.get(thread_id)
+        if history is None:
+            history = self._threads[thread_id] = _ThreadHistory()
+            while len(self._threads) > self.max_threads:
+                self._threads.popitem(last=False)
+        self._threads.move_to_end(thread_id)
+        return history
+
+    async def get_messages(self, thread_id) -> list:
+        """
+        Returns the thread's text messages, oldest first, after catching up with the
+        API. The list is shared with the cache; copy it before modifying.
+        """
+        history = self._history(thread_id)
+        async with history.lock:  # one catch-up per thread at a time
+            new_messages = await afetch_messages_after(
+                thread_id, history.cursor, self.OPENAI_CLIENT or get_async_client()
+            )
+            self.fetched_messages += len(new_messages)
+            settled = _settled(new_messages)
+            if settled:
+                history.cursor = settled[-1].id
+                history.messages.extend(_format_text_messages(settled))
+        return history.messages
+
+    def peek(self, thread_id) -> list:
+        """The thread's cached messages as they are, without calling the API."""
+        history = self._threads.get(thread_id)
+        return history.messages if history is not None else []
+
+    def forget(self, thread_id):
+        """Drops a thread's cached history, e.g. after the thread is deleted."""
+        self._threads.pop(thread_id, None)
+
+
+HISTORY_CACHE = ThreadHistoryCache()
@@ -0,0 +1,74 @@
+import os
+import asyncio
+
+from helpers import get_async_client, acreate_thread, adelete_thread
+
+# Number of empty threads kept ready for new sessions
+THREAD_POOL_SIZE = int(os.getenv("THREAD_POOL_SIZE", "5"))
+
+
+class ThreadPool:
+    """
+    Keeps a few fresh Assistants threads ready so a new chat session never waits on
+    threads.create. A background task tops the pool back up after each acquire().
+    """
+
+    def __init__(self, size: int = THREAD_POOL_SIZE, OPENAI_CLIENT=None):
+        self.size = size
+        self.OPENAI_CLIENT = OPENAI_CLIENT
+        self._ready = asyncio.Queue()
+        self._refill_needed = asyncio.Event()
+        self._refill_task = None
+
+    async def start(self):
+        """Fills the pool and starts the background refill loop."""
+        self.OPENAI_CLIENT = self.OPENAI_CLIENT or get_async_client()
+        self._refill_task = asyncio.create_task(self._refill_loop())
+        self._refill_needed.set()
+
+    async def acquire(self) -> str:
+        """
+        Returns a thread id for a new session, from the pool when one is ready,
+        otherwise by creating it on the spot.
+        """
+        self._refill_needed.set()
+        try:
+            return self._ready.get_nowait()
+        except asyncio.QueueEmpty:
+            return await acreate_thread(self.OPENAI_CLIENT or get_async_client())
+
+    def ready_count(self) -> int:
+        return self._ready.qsize()
+
+    async def close(self):
+        """Stops refilling and deletes the threads nobody picked up."""
+        if self._refill_task:
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+            self._refill_task = None
+        unused = []
+        while not self._ready.empty():
+            unused.append(self._ready.get_nowait())
+        await asyncio.gather(*(adelete_thread(thread_id, self.OPENAI_CLIENT) for thread_id in unused))
+
+    async def _refill_loop(self):
+        while True:
+            await self._refill_needed.wait()
+            self._refill_needed.clear()
+            missing = self.size - self._ready.qsize()
+            if missing <= 0:
+                continue
+            try:
+                thread_ids = await asyncio.gather(
+                    *(acreate_thread(self.OPENAI_CLIENT) for _ in range(missing))
+                )
+            except Exception as e:
+                print(f"Thread pool: error creating threads: {e}")
+                await asyncio.sleep(1)
+                self._refill_needed.set()
+                continue
+            for thread_id in thread_ids:
+                self._ready.put_nowait(thread_id)
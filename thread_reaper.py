@@ -0,0 +1,79 @@
+import os
+import time
+import asyncio
+
+from helpers import get_async_client, adelete_thread
+
+# Remote thread deletions per second, and how many go out together
+THREAD_DELETE_RATE = float(os.getenv("THREAD_DELETE_RATE", "5"))
+THREAD_DELETE_BATCH = int(os.getenv("THREAD_DELETE_BATCH", "10"))
+
+
+class ThreadReaper:
+    """
+    Deletes Assistants threads nobody will use again (compacted, forked or evicted
+    sessions' threads) in the background. Deletions are queued and sent in small
+    concurrent batches paced to THREAD_DELETE_RATE, so a burst of evictions never
+    competes with live runs for the API's rate limit.
+    """
+
+    def __init__(self, rate: float = THREAD_DELETE_RATE, batch: int = THREAD_DELETE_BATCH, OPENAI_CLIENT=None):
+        self.rate = rate
+        self.batch = batch
+        self.OPENAI_CLIENT = OPENAI_CLIENT
+        self._queue = None  # created on first use, inside the running loop
+        self._worker = None
+        self._loop = None
+        self.deleted = 0
+        self.failed = 0
+
+    def schedule(self, thread_id, OPENAI_CLIENT=None):
+        """Queues the thread for deletion; starts the background worker if needed."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:  # first use, or a new event loop (e.g. after asyncio.run)
+            self._loop, self._queue, self._worker = loop, asyncio.Queue(), None
+        self._queue.put_nowait((thread_id, OPENAI_CLIENT))
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._delete_loop())
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _delete_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            began = time.perf_counter()
+            results = await asyncio.gather(*(
+                adelete_thread(thread_id, client or self.OPENAI_CLIENT or get_async_client())
+                for thread_id, client in batch
+            ))
+            for _ in batch:
+                self._queue.task_done()
+            failed = sum(1 for result in results if result is None)  # adelete_thread logs the error
+            self.failed += failed
+            self.deleted += len(batch) - failed
+            if self.rate > 0:
+                await asyncio.sleep(max(0.0, len(batch) / self.rate - (time.perf_counter() - began)))
+
+    async def close(self, timeout: float = 30.0):
+        """Sends what is still queued (up to `timeout` seconds), then stops the worker."""
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Thread reaper: {self.pending()} thread deletions left undone at shutdown")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    def stats(self) -> dict:
+        return {"pending": self.pending(), "deleted": self.deleted, "failed": self.failed}
+
+
+THREAD_REAPER = ThreadReaper()
@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from milestone_plan import MilestonePlan
+from telemetry import span
+
+# One SQLite database for every user; WAL lets readers run alongside a writer
+USER_STORE_PATH = os.getenv("USER_STORE_PATH", "bluetide.db")
+USER_STORE_BUSY_TIMEOUT_MS = int(os.getenv("USER_STORE_BUSY_TIMEOUT_MS", "5000"))
+# Milestone edits replayed on read before the stored plan is rewritten with them folded in
+MILESTONE_CHECKPOINT_EVERY = int(os.getenv("MILESTONE_CHECKPOINT_EVERY", "16"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    phase TEXT NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS profiles (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS milestones (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    log_seq INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS milestone_edits (
+    user_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    milestone_id TEXT,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (user_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sessions (
+    chat_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+_shared_store = None
+
+
+class UserStore:
+    """
+    Per-user profile, milestones and journey phase, keyed by user id.
+
+    Every lookup is a primary-key read and every save updates the data and the phase
+    in one transaction, so a reader never sees a profile without its phase. Regenerated
+    milestones are appended to an edit log; the stored plan is a checkpoint that reads
+    bring up to date by replaying the edits logged since (see MilestonePlan). Each
+    thread gets its own connection. Reads never wait on writers under WAL and are
+    cheap enough to call inline; run saves in a worker thread (asyncio.to_thread)
+    so the event loop never waits on a write lock.
+    """
+
+    def __init__(self, path: str = USER_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+            if columns and "chat_id" not in columns:  # snapshots were keyed by user; they are disposable
+                conn.execute("DROP TABLE sessions")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(milestones)")}
+            if "log_seq" not in columns:  # databases created before the edit log
+                conn.execute("ALTER TABLE milestones ADD COLUMN log_seq INTEGER NOT NULL DEFAULT 0")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=USER_STORE_BUSY_TIMEOUT_MS / 1000)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # With WAL, NORMAL only risks the last commits on power loss, never corruption
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _save(self, table: str, user_id: str, data, phase: str):
+        with span(f"store.{table}"), self._connection() as conn:  # commits, or rolls back on error
+            if table == "milestones":
+                self._checkpoint(conn, user_id, data)  # supersedes every edit logged so far
+            else:
+                conn.execute(
+                    f"INSERT INTO {table} (user_id, data, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                    (user_id, json.dumps(data, ensure_ascii=False), time.time()),
+                )
+            self._set_phase(conn, user_id, phase)
+
+    @staticmethod
+    def _set_phase(conn, user_id: str, phase: str):
+        conn.execute(
+            "INSERT INTO users (user_id, phase, updated_at) VALUES (?, ?, ?) "
+            # The journey only moves forward: re-saving a profile keeps a coached user coached
+            "ON CONFLICT(user_id) DO UPDATE SET "
+            "phase = CASE WHEN users.phase = 'career_coach' THEN users.phase ELSE excluded.phase END, "
+            "updated_at = excluded.updated_at",
+            (user_id, phase, time.time()),
+        )
+
+    @staticmethod
+    def _append_edit(conn, user_id: str, milestone_id, data) -> int:
+        # The seq is taken inside the INSERT, which holds the write lock, so concurrent
+        # writers for the same user cannot pick the same one
+        conn.execute(
+            "INSERT INTO milestone_edits (user_id, seq, milestone_id, data, created_at) "
+            "SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ? FROM milestone_edits WHERE user_id = ?",
+            (user_id, milestone_id, json.dumps(data, ensure_ascii=False), time.time(), user_id),
+        )
+        return conn.execute("SELECT MAX(seq) FROM milestone_edits WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+    @staticmethod
+    def _checkpoint(conn, user_id: str, plan: dict):
+        conn.execute(
+            "INSERT INTO milestones (user_id, data, updated_at, log_seq) "
+            "VALUES (?, ?, ?, (SELECT COALESCE(MAX(seq), 0) FROM milestone_edits WHERE user_id = ?)) "
+            "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at, "
+            "log_seq = excluded.log_seq",
+            (user_id, json.dumps(plan, ensure_ascii=False), time.time(), user_id),
+        )
+
+    @staticmethod
+    def _load_checkpoint(conn, user_id: str):
+        """The stored plan and the edits logged since it, as (data, log_seq, edits)."""
+        row = conn.execute("SELECT data, log_seq FROM milestones WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None, 0, []
+        edits = conn.execute(
+            "SELECT seq, data FROM milestone_edits WHERE user_id = ? AND seq > ? ORDER BY seq", (user_id, row[1])
+        ).fetchall()
+        return json.loads(row[0]), row[1], edits
+
+    @staticmethod
+    def _replay(data: dict, log_seq: int, edits: list) -> MilestonePlan:
+        plan = MilestonePlan.from_data(data, version=log_seq)
+        for seq, edit in edits:
+            plan.apply(json.loads(edit))
+            plan.version = seq
+        return plan
+
+    def _load_plan(self, conn, user_id: str):
+        data, log_seq, edits = self._load_checkpoint(conn, user_id)
+        return self._replay(data, log_seq, edits) if data is not None else None
+
+    def _load(self, table: str, user_id: str):
+        row = self._connection().execute(
+            f"SELECT data FROM {table} WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_profile(self, user_id: str, profile: dict):
+        """Stores the onboarding profile; the user moves on to milestone generation."""
+        self._save("profiles", user_id, profile, "milestones")
+
+    def save_milestones(self, user_id: str, milestones: dict):
+        """Stores the milestone plan; the user moves on to career coaching."""
+        self._save("milestones", user_id, milestones, "career_coach")
+
+    def get_profile(self, user_id: str):
+        return self._load("profiles", user_id)
+
+    def append_milestone_edit(self, user_id: str, edit: dict) -> int:
+        """
+        Logs one regenerated milestone ({'milestone': {...}}) and returns its seq. Writes
+        only that milestone; every MILESTONE_CHECKPOINT_EVERY edits the plan is rewritten
+        with the edits folded in, so reads replay a bounded number of them.
+        """
+        with span("store.milestone_edits"), self._connection() as conn:
+            seq = self._append_edit(conn, user_id, edit["milestone"].get("id"), edit)
+            row = conn.execute("SELECT log_seq FROM milestones WHERE user_id = ?", (user_id,)).fetchone()
+            if row is not None and seq - row[0] >= MILESTONE_CHECKPOINT_EVERY:
+                plan = self._load_plan(conn, user_id)
+                self._checkpoint(conn, user_id, plan.to_data())
+        return seq
+
+    def get_milestones(self, user_id: str):
+        data, log_seq, edits = self._load_checkpoint(self._connection(), user_id)
+        if not edits:
+            return data  # stored as-is, nothing to replay
+        return self._replay(data, log_seq, edits).to_data()
+
+    def get_milestone_plan(self, user_id: str):
+        """The current plan as a MilestonePlan (version = seq of its last edit), or None."""
+        return self._load_plan(self._connection(), user_id)
+
+    def get_milestone_edits(self, user_id: str, after_seq: int = 0) -> list:
+        """The user's milestone edit log from after_seq on, as (seq, milestone_id, data, created_at)."""
+        rows = self._connection().execute(
+            "SELECT seq, milestone_id, data, created_at FROM milestone_edits "
+            "WHERE user_id = ? AND seq > ? ORDER BY seq", (user_id, after_seq)
+        ).fetchall()
+        return [(seq, mid, json.loads(data), created_at) for seq, mid, data, created_at in rows]
+
+    def save_session(self, chat_id: str, user_id: str, snapshot: dict):
+        """
+        Stores what an evicted chat session needs to pick up again (see session_lifecycle),
+        per chat: one user can have several chats open.
+        """
+        with span("store.sessions"), self._connection() as conn:
+            conn.execute(
+                "INSERT INTO sessions (chat_id, user_id, data, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(chat_id) DO UPDATE SET user_id = excluded.user_id, data = excluded.data, "
+                "updated_at = excluded.updated_at",
+                (chat_id, user_id, json.dumps(snapshot, ensure_ascii=False, default=str), time.time()),
+            )
+
+    def get_session(self, chat_id: str):
+        row = self._connection().execute("SELECT data FROM sessions WHERE chat_id = ?", (chat_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_phase(self, user_id: str) -> str:
+        """Returns 'onboarding', 'milestones' or 'career_coach'."""
+        row = self._connection().execute(
+            "SELECT phase FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return row[0] if row else "onboarding"
+
+    def close(self):
+        """Closes the calling thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def get_user_store() -> UserStore:
+    """Returns the process-wide store, opening it on first use."""
+    global _shared_store
+    if _shared_store is None:
+        _shared_store = UserStore()
+    return _shared_store